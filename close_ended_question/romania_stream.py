@@ -0,0 +1,247 @@
+"""Single-pass streaming loader for the Romania COVID JSON feed.
+
+The notebook loads the whole feed with json.loads and then walks
+covid_df.iterrows() to build county_df one small DataFrame per day. This module
+reads the feed in chunks instead, decodes one day of ``covid_romania`` at a
+time and appends it to two column stores, so only the current day is ever held
+as Python objects:
+
+- the national table, the same frame (and out.csv) as the notebook's covid_df
+- the county x date table, one row per county per day, the notebook's county_df
+
+    python romania_stream.py https://www.graphs.ro/json.php --national out.csv --county county.csv
+    python romania_stream.py covid.json --benchmark            # against the iterrows version
+    python romania_stream.py covid.json --benchmark --serve    # same, through a local HTTP server
+"""
+import argparse
+import codecs
+import functools
+import http.server
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+FEED_URL = "https://www.graphs.ro/json.php"
+FEED_KEY = "covid_romania"
+DROPPED_COLUMNS = ["sourceUrl", "county_data"]
+CHUNK_SIZE = 1 << 16
+# (connect, read) seconds for the feed URL; the read timeout applies to every chunk, not the whole body
+REQUEST_TIMEOUT = (10, 60)
+# A decode error this far before the end of the buffer cannot be a token cut off by the chunk boundary
+# (the longest unfinished literal or escape is shorter), so the record itself is malformed
+TRUNCATION_SLACK = 16
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    # Text chunks of a local file or an http(s) URL, never the whole body at once
+    if source.startswith(("http://", "https://")):
+        import requests
+        stream = requests.get(source, stream=True, timeout=REQUEST_TIMEOUT)
+        stream.raise_for_status()
+        chunks = stream.iter_content(chunk_size)
+    else:
+        stream = open(source, "rb")
+        chunks = iter(functools.partial(stream.read, chunk_size), b"")
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with stream:
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_records(chunks, key=FEED_KEY):
+    # Yield the elements of the top-level array under `key` one by one. The buffer
+    # only ever holds the part of the feed that has not been decoded yet
+    decoder = json.JSONDecoder()
+    marker = json.dumps(key)
+    buffer = ""
+    chunks = iter(chunks)
+
+    def fill():
+        nonlocal buffer
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError(f"Feed ended before the end of the {marker} array")
+        buffer += chunk
+
+    # Skip to the opening bracket of the array
+    while True:
+        pos = buffer.find(marker)
+        if pos < 0:
+            # Keep enough of the tail for a marker split across chunks
+            buffer = buffer[-len(marker):]
+            fill()
+            continue
+        buffer = buffer[pos:]
+        rest = buffer[len(marker):].lstrip()
+        if rest.startswith(":"):
+            rest = rest[1:].lstrip()
+            if rest.startswith("["):
+                buffer = rest[1:]
+                break
+        if not rest:
+            fill()
+            continue
+        # The marker was a string value or the key of something else, look past it
+        buffer = buffer[len(marker):]
+
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            # Unterminated strings and errors at the end of the buffer are records cut off at the end of the
+            # chunk: read more and retry. Anything else will not parse however much more is read
+            if not e.msg.startswith("Unterminated string") and e.pos < len(buffer) - TRUNCATION_SLACK:
+                raise json.JSONDecodeError(f"Malformed record in the {marker} array: {e.msg}", e.doc, e.pos) from None
+            fill()
+            continue
+        buffer = buffer[end:]
+        yield record
+
+
+class ColumnStore:
+    # Column-wise accumulator: rows are added as dicts, missing keys are None, and
+    # the columns keep the order in which the keys were first seen
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def append(self, row):
+        for name in row:
+            if name not in self.columns:
+                self.columns[name] = [None] * self.rows
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+        self.rows += 1
+
+    def frame(self):
+        return pd.DataFrame(self.columns, index=pd.RangeIndex(self.rows))
+
+
+def load_feed(source, chunk_size=CHUNK_SIZE):
+    # One pass over the feed -> (national_df, county_df)
+    national = ColumnStore()
+    county = ColumnStore()
+    for record in iter_records(read_chunks(source, chunk_size)):
+        county_data = record.get("county_data")
+        # Some days have no county information
+        if isinstance(county_data, list):
+            for row in county_data:
+                county.append({**row, "reporting_date": record.get("reporting_date")})
+        national.append({k: v for k, v in record.items() if k not in DROPPED_COLUMNS})
+    return national.frame(), county.frame()
+
+
+def load_feed_iterrows(source):
+    # The notebook's version, kept as the benchmark baseline and the reference output
+    if source.startswith(("http://", "https://")):
+        import requests
+        covid_data = json.loads(requests.get(source, timeout=REQUEST_TIMEOUT).content)
+    else:
+        with open(source, "rb") as f:
+            covid_data = json.loads(f.read())
+
+    covid_df = pd.DataFrame(covid_data['covid_romania'])
+
+    covid_county_data_dfs = []
+
+    for i, row in covid_df.iterrows():
+        try:  # some days have no county information
+            county_df = pd.DataFrame(row['county_data'])
+        except:
+            continue
+
+        county_df['reporting_date'] = row['reporting_date']
+        covid_county_data_dfs.append(county_df)
+
+    county_df = pd.concat(covid_county_data_dfs)
+    covid_df = covid_df.drop(['sourceUrl', 'county_data'], axis=1)
+    return covid_df, county_df
+
+
+def _measure(load, source, repeats):
+    # Best wall time over `repeats` runs and the peak traced allocation of one run
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = load(source)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    load(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(times), peak
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _serve(path):
+    # Local stand-in for the feed URL, serving the file's directory on a free port
+    handler = functools.partial(_QuietHandler, directory=os.path.dirname(os.path.abspath(path)))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/{os.path.basename(path)}"
+
+
+def benchmark(source, repeats=3, serve=False):
+    server = None
+    if serve:
+        server, source = _serve(source)
+    try:
+        (stream_national, stream_county), stream_time, stream_peak = _measure(load_feed, source, repeats)
+        (iter_national, iter_county), iter_time, iter_peak = _measure(load_feed_iterrows, source, repeats)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    # Same national frame, and the same county rows up to the per-day index the concat keeps
+    pd.testing.assert_frame_equal(stream_national, iter_national)
+    pd.testing.assert_frame_equal(stream_county, iter_county.reset_index(drop=True))
+
+    print(f"source: {source}")
+    print(f"national rows: {len(stream_national)}, county rows: {len(stream_county)}")
+    print(f"{'':<10} {'seconds':>9} {'peak MiB':>9}")
+    print(f"{'iterrows':<10} {iter_time:9.3f} {iter_peak / 2**20:9.1f}")
+    print(f"{'streaming':<10} {stream_time:9.3f} {stream_peak / 2**20:9.1f}")
+    print(f"speed-up {iter_time / stream_time:.1f}x, peak memory {stream_peak / iter_peak:.0%} of iterrows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream the Romania COVID feed into national and county tables.")
+    parser.add_argument("source", nargs="?", default=FEED_URL, help="local JSON file or http(s) URL")
+    parser.add_argument("--national", help="write the national table to this CSV (same layout as out.csv)")
+    parser.add_argument("--county", help="write the county x date table to this CSV")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="bytes read per chunk")
+    parser.add_argument("--benchmark", action="store_true", help="compare against the notebook's iterrows loader")
+    parser.add_argument("--serve", action="store_true", help="benchmark through a local HTTP server for the file")
+    parser.add_argument("--repeats", type=int, default=3, help="benchmark runs per loader")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.source, args.repeats, args.serve)
+        return
+
+    national_df, county_df = load_feed(args.source, args.chunk_size)
+    print(f"national rows: {len(national_df)}, county rows: {len(county_df)}")
+    if args.national:
+        national_df.to_csv(args.national)
+    if args.county:
+        county_df.to_csv(args.county, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import streamlit as st
+from utils.warmup import start_warmup
 
 # App title and description
 st.title("CS5239 Project 6")
@@ -13,4 +14,29 @@ st.write("""
 4. OxCGRT Index Specific Policy
 5. OxCGRT Economic Support Analysis
 6. Vaccinations Analysis
-""")
\ No newline at end of file
+7. SQL Query
+8. Granger Causality Screen
+9. Case Forecasts
+10. Romania Counties
+""")
+
+# Warm every page's cached datasets in the background while the table of contents is read
+st.subheader("Preparing Pages")
+warmup = start_warmup()
+
+@st.fragment(run_every=1)
+def warmup_progress(warmup):
+    # Polls the warm-up without holding the script thread; the whole page reruns once it is done
+    if warmup.done():
+        st.rerun()
+    st.progress(warmup.fraction(), text=f"Loading and deriving the datasets of every page... "
+                                        f"({warmup.completed}/{warmup.total})")
+
+if warmup.done():
+    st.progress(1.0, text="All pages are ready.")
+    for page, error in warmup.errors.items():
+        st.warning(f"{page} could not be prepared: {error}")
+    # Time until each page has the data for its first chart, before and after the warm-up
+    st.dataframe(warmup.report(), hide_index=True)
+else:
+    warmup_progress(warmup)
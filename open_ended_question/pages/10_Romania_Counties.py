@@ -0,0 +1,44 @@
+import streamlit as st
+from utils import charts
+from utils.counties import county_cube, metrics, threshold_per_1000
+from utils.data import data_version
+from utils.fragments import section
+
+st.header("COVID-19 Cases in Romanian Counties")
+
+cube = county_cube(data_version())
+if cube is None:
+    st.info("The county table has not been written yet. From the repository root, run "
+            "`python close_ended_question/romania_stream.py --county open_ended_question/data/romania_county.csv` "
+            "and reload this page.")
+    st.stop()
+
+st.sidebar.header("Time Range")
+start, end = st.sidebar.slider("Dates", min_value=cube.dates[0].date(), max_value=cube.dates[-1].date(),
+                               value=(cube.dates[0].date(), cube.dates[-1].date()))
+
+# Counties with the most cases per 1,000 persons at the end of the range are shown first
+ranked = list(cube.ranking('cases_per_1000', end)['County'])
+
+@section
+def county_plot(start, end):
+    metric = st.selectbox("Metric", list(metrics), index=list(metrics).index('cases_per_1000'),
+                          format_func=metrics.get)
+    counties = st.multiselect("Counties", ranked, default=ranked[:10])
+    if counties:
+        threshold = threshold_per_1000 if metric == 'cases_per_1000' else None
+        st.plotly_chart(charts.county_lines(cube.series(counties, metric, start, end), metric, metrics[metric],
+                                            threshold))
+    else:
+        st.write("Please select at least one county to display.")
+
+@section
+def county_ranking_plot(end):
+    metric = st.selectbox("Rank by", list(metrics), index=list(metrics).index('new_cases_per_1000_7d'),
+                          format_func=metrics.get)
+    st.plotly_chart(charts.county_ranking(cube.ranking(metric, end), metric, metrics[metric], end))
+
+county_plot(start, end)
+
+st.subheader("County Ranking")
+county_ranking_plot(end)
@@ -0,0 +1,31 @@
+import time
+import streamlit as st
+from utils.sql import example_queries, explain, sql, tables
+
+st.header("Query the OxCGRT and Vaccination Data with SQL")
+
+st.write("The `oxcgrt` table holds every national and state / province row of both OxCGRT extracts, with a "
+         "`Country` column; `vaccinations` holds the vaccination data. Filters, projections and aggregations "
+         "run inside the scan of the underlying Parquet stores, so only the result is loaded.")
+
+# Table and column reference
+with st.expander("Tables and columns"):
+    for table, columns in tables().items():
+        st.write(f"**{table}**: " + ", ".join(f"`{column}` ({dtype})" for column, dtype in columns))
+
+# Start from one of the examples and edit it
+example = st.selectbox("Example query", list(example_queries))
+query = st.text_area("SQL", value=example_queries[example], height=200)
+
+if st.button("Run query", type="primary"):
+    try:
+        start = time.perf_counter()
+        result = sql(query)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        st.error(f"Query failed: {e}")
+    else:
+        st.caption(f"{len(result)} rows in {elapsed * 1000:.1f} ms")
+        st.dataframe(result, hide_index=True)
+        with st.expander("Query plan"):
+            st.code(explain(query))
@@ -0,0 +1,40 @@
+import streamlit as st
+from utils.compute import compute_pool
+from utils.fragments import section
+from utils.granger import classify, default_lag_orders, directions, granger_screen, outcomes
+
+st.header("Granger Causality Screen of the OxCGRT Indices")
+
+st.write("For every index, outcome and jurisdiction, two F-tests ask whether the past of one series improves "
+         "the prediction of the other beyond its own past: whether a policy leads the daily rate (index → "
+         "outcome), reacts to it (outcome → index), both (feedback) or neither. Granger causality is "
+         "precedence, not proof of effect, and with thousands of tests some pairs pass by chance.")
+
+# Every test at every lag order is computed once in the shared compute pool and cached
+with st.spinner("Running the Granger tests for every index, outcome and jurisdiction..."):
+    screen = compute_pool().submit(granger_screen, default_lag_orders).result()
+
+@section
+def ranked_table(screen):
+    col1, col2, col3 = st.columns(3)
+    lags = col1.selectbox("Lag order (days)", default_lag_orders, index=1)
+    outcome = col2.selectbox("Outcome", outcomes)
+    direction = col3.selectbox("Rank by", directions)
+    col1, col2, col3 = st.columns(3)
+    country = col1.selectbox("Country", ["All"] + sorted(screen["Country"].unique()))
+    level = col2.selectbox("Jurisdictions", ["National", "Regions", "All"])
+    alpha = col3.select_slider("Significance level", [0.001, 0.01, 0.05, 0.1], value=0.05)
+
+    df = screen[(screen["Lags"] == lags) & (screen["Outcome"] == outcome)]
+    if country != "All":
+        df = df[df["Country"] == country]
+    if level != "All":
+        df = df[(df["Region"] == "National") == (level == "National")]
+    df = df.assign(Direction=classify(df, alpha)).sort_values(f"p ({direction})")
+    significant = (df[f"p ({direction})"] < alpha).sum()
+    st.caption(f"{significant} of {len(df)} tests significant at α = {alpha} in the {direction} direction")
+    st.dataframe(df.drop(columns=["Outcome", "Lags"]), hide_index=True,
+                 column_config={column: st.column_config.NumberColumn(format="%.2e")
+                                for column in df.columns if column.startswith("p (")})
+
+ranked_table(screen)
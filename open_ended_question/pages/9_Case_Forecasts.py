@@ -0,0 +1,29 @@
+import streamlit as st
+from utils import charts
+from utils.data import REGIONS
+from utils.forecast import fitted_models, forecast_frame, horizon
+from utils.fragments import section
+
+st.header(f"{horizon}-Day Forecasts of Daily COVID-19 Cases Per 100K Population")
+
+st.write("Each nation, state and province has a damped-trend exponential smoothing model of its 7-day average "
+         "daily case rate, fitted to the last four months of data. The shaded bands are 80% and 95% "
+         "prediction intervals.")
+
+# Changing the jurisdiction only redraws the forecast below
+@section
+def forecast_plot():
+    col1, col2 = st.columns(2)
+    country = col1.selectbox("Country", list(REGIONS))
+    names = REGIONS[country]["names"]
+    regions = [region for unit_country, region in fitted_models().units if unit_country == country]
+    region = col2.selectbox("Jurisdiction", sorted(regions, key=lambda code: names.get(code, "")),
+                            format_func=lambda code: names.get(code, "National" if code == "" else code))
+    history, forecast, parameters = forecast_frame(country, region)
+    name = names.get(region, charts.country_titles[country])
+    st.plotly_chart(charts.case_forecast(history, forecast, name, country))
+    st.caption("Fitted level smoothing α = {alpha:.2f}, trend smoothing β = {beta:.2f}, damping φ = {phi:.2f}"
+               .format(**parameters))
+    st.dataframe(forecast.set_index("Date").round(3))
+
+forecast_plot()
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The dashboard imports its modules as utils.* from the open_ended_question directory
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, app_dir)
+
+# Ordinal indicators of the synthetic extracts and their maximum levels
+ordinal_indicators = {
+    'C1E_School closing': 3, 'C2E_Workplace closing': 3, 'C3E_Cancel public events': 2,
+    'C4E_Restrictions on gatherings': 4, 'C5E_Close public transport': 2, 'C6E_Stay at home requirements': 3,
+    'C7E_Restrictions on internal movement': 2, 'C8E_International travel controls': 4, 'E1_Income support': 2,
+    'E2_Debt/contract relief': 2, 'H1_Public information campaigns': 2, 'H2_Testing policy': 3,
+    'H3_Contact tracing': 2, 'H6E_Facial Coverings': 4, 'H7_Vaccination policy': 5,
+    'H8E_Protection of elderly people': 3, 'V1_Vaccine Prioritisation (summary)': 2,
+    'V2A_Vaccine Availability (summary)': 3, 'V3_Vaccine Financial Support (summary)': 5,
+    'V4_Mandatory Vaccination (summary)': 1,
+}
+flagged = ['C1E', 'C2E', 'C3E', 'C4E', 'C5E', 'C6E', 'C7E', 'E1', 'H1', 'H6E', 'H7', 'H8E']
+spending = ['E3_Fiscal measures', 'E4_International support', 'H4_Emergency investment in healthcare',
+            'H5_Investment in vaccines']
+indices = ['GovernmentResponseIndex_WeightedAverage', 'StringencyIndex_WeightedAverage',
+           'ContainmentHealthIndex_WeightedAverage', 'EconomicSupportIndex',
+           'GovernmentResponseIndex_NonVaccinated', 'GovernmentResponseIndex_Vaccinated',
+           'ContainmentHealthIndex_NonVaccinated', 'ContainmentHealthIndex_Vaccinated',
+           'StringencyIndex_NonVaccinated', 'StringencyIndex_Vaccinated']
+
+
+def _extract(rng, dates, code, name, regions):
+    # NAT_TOTAL and STATE_TOTAL rows of one country in the layout of the OxCGRT extracts
+    frames = []
+    prefix = "US" if code == "USA" else code
+    for region_code, region, jurisdiction in [(None, None, 'NAT_TOTAL')] + \
+            [(f"{prefix}_{r}", r, 'STATE_TOTAL') for r in regions]:
+        df = {'CountryName': name, 'CountryCode': code, 'RegionName': region, 'RegionCode': region_code,
+              'Jurisdiction': jurisdiction, 'Date': dates.strftime('%Y%m%d').astype(int)}
+        for column, maximum in ordinal_indicators.items():
+            df[column] = np.clip(np.round(np.cumsum(rng.normal(0, .05, len(dates))) + maximum / 2), 0, maximum)
+        for flag in flagged:
+            df[f"{flag}_Flag"] = rng.integers(0, 2, len(dates)).astype(float)
+        for column in spending:
+            df[column] = np.where(rng.random(len(dates)) < .02, rng.random(len(dates)) * 1e9, 0.0)
+        new = np.abs(rng.normal(1000, 500, len(dates))) * (1 + np.sin(np.arange(len(dates)) / 60))
+        df['ConfirmedCases'] = np.cumsum(new).round()
+        df['ConfirmedDeaths'] = np.cumsum(new / 100).round()
+        df['ConfirmedCases'][:20] = np.nan
+        for column in indices:
+            df[column] = np.clip(50 + np.cumsum(rng.normal(0, 1, len(dates))), 0, 100)
+        frames.append(pd.DataFrame(df))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture(scope="session")
+def synthetic_data(tmp_path_factory):
+    # Directory with a data/ of random OxCGRT extracts and vaccinations in the layout of the real files;
+    # the dashboard reads ./data, so tests run the pages from here
+    root = tmp_path_factory.mktemp("dashboard")
+    data = root / "data"
+    data.mkdir()
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-01", "2021-12-31")
+    _extract(rng, dates, 'USA', 'United States', ['CA', 'NY', 'TX']).to_csv(
+        data / "OxCGRT_fullwithnotes_USA_v1.csv", index=False)
+    _extract(rng, dates, 'CAN', 'Canada', ['ON', 'QC']).to_csv(data / "OxCGRT_fullwithnotes_CAN_v1.csv", index=False)
+    vaccination_dates = pd.date_range("2020-12-01", "2021-12-31")
+    rows = []
+    for iso_code in ['USA', 'CAN']:
+        daily = np.abs(rng.normal(1e5, 3e4, len(vaccination_dates)))
+        rows.append(pd.DataFrame({'location': iso_code, 'iso_code': iso_code,
+                                  'date': vaccination_dates.strftime('%Y-%m-%d'),
+                                  'total_vaccinations': np.cumsum(daily * 2), 'people_vaccinated': np.cumsum(daily),
+                                  'people_fully_vaccinated': np.cumsum(daily * .8), 'daily_vaccinations': daily * 2,
+                                  'daily_people_vaccinated': daily, 'daily_vaccinations_per_million': daily / 10,
+                                  'total_boosters': np.nan}))
+    vaccinations = pd.concat(rows, ignore_index=True)
+    # Some days lack the totals, as in the OWID file
+    vaccinations.loc[vaccinations.index % 7 == 3, ['total_vaccinations', 'people_fully_vaccinated']] = np.nan
+    vaccinations.to_csv(data / "vaccinations.csv", index=False)
+    return root
@@ -0,0 +1,45 @@
+"""The HTTP API answers every request, with a JSON error body when the request fails."""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils import api
+
+
+@pytest.fixture
+def base_url():
+    server = api.serve(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    # (status, JSON body) of a GET, errors included
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_bad_request(base_url):
+    status, body = get(f"{base_url}/series/national?country=Mexico")
+    assert status == 400 and "Mexico" in body["error"]
+
+
+def test_failing_loader_is_a_500(base_url, monkeypatch):
+    def load(country):
+        raise KeyError("people_fully_vaccinated")
+
+    monkeypatch.setitem(api.DATASETS["national"], "load", load)
+    status, body = get(f"{base_url}/series/national?country=US")
+    assert status == 500
+    assert body["error"] == "Internal error: KeyError: 'people_fully_vaccinated'"
+    # The server keeps serving
+    assert get(f"{base_url}/datasets")[0] == 200
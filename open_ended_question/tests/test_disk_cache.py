@@ -0,0 +1,34 @@
+"""Disk cache keys follow the code behind a result, and unreadable entries are misses."""
+import pickle
+import sys
+import zlib
+
+from utils.disk_cache import DiskCache, code_hash
+
+
+def test_key_covers_imported_helpers(tmp_path, monkeypatch):
+    # correlation_bands gets its bands from utils.bootstrap: editing it must change the key
+    import utils.correlation  # noqa: F401
+    before = code_hash("utils.correlation")
+    edited = tmp_path / "bootstrap.py"
+    with open(sys.modules["utils.bootstrap"].__file__) as f:
+        edited.write_text(f.read() + "\n# edited\n")
+    monkeypatch.setattr(sys.modules["utils.bootstrap"], "__file__", str(edited))
+    assert code_hash("utils.correlation") != before
+
+
+class Moved:
+    pass
+
+
+def test_entry_of_a_moved_class_is_a_miss(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path))
+    cache.put("ab" + "0" * 62, Moved())
+    # The same entry as pickled by a module that has since been removed
+    gone = pickle.dumps(Moved(), protocol=0).replace(Moved.__module__.encode(), b"no_such_module")
+    (tmp_path / "cd").mkdir()
+    with open(cache._path("cd" + "0" * 62), "wb") as f:
+        f.write(zlib.compress(gone))
+    monkeypatch.delattr(sys.modules[Moved.__module__], "Moved")
+    assert cache.get("ab" + "0" * 62) == (False, None)
+    assert cache.get("cd" + "0" * 62) == (False, None)
@@ -0,0 +1,60 @@
+"""Banded DTW, its LB_Keogh bound and the pruned k-medoids against brute force."""
+import numpy as np
+import pytest
+
+from utils.dtw import PrunedDistances, dtw_batch, envelopes, k_medoids, lb_keogh
+
+
+def naive_dtw(a, b, band):
+    # Squared DTW distance with |i - j| <= band, one cell at a time
+    n = len(a)
+    total = np.full((n + 1, n + 1), np.inf)
+    total[0, 0] = 0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - band), min(n, i + band) + 1):
+            cost = ((a[i - 1] - b[j - 1]) ** 2).sum()
+            total[i, j] = cost + min(total[i - 1, j], total[i, j - 1], total[i - 1, j - 1])
+    return total[n, n]
+
+
+@pytest.fixture
+def trajectories():
+    # (regions, days, indicators) random walks in 0-1, like the scaled policy trajectories
+    rng = np.random.default_rng(0)
+    return np.clip(0.5 + np.cumsum(rng.normal(0, 0.1, size=(14, 40, 3)), axis=1), 0, 1)
+
+
+@pytest.mark.parametrize("band", [0, 3, 10])
+def test_dtw_batch_is_exact(trajectories, band):
+    pairs = np.array([(a, b) for a in range(len(trajectories)) for b in range(len(trajectories))])
+    expected = [naive_dtw(trajectories[a], trajectories[b], band) for a, b in pairs]
+    np.testing.assert_allclose(dtw_batch(trajectories, pairs, band), expected, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("band", [0, 3, 10])
+def test_lb_keogh_never_exceeds_dtw(trajectories, band):
+    n = len(trajectories)
+    pairs = np.array([(a, b) for a in range(n) for b in range(n)])
+    exact = dtw_batch(trajectories, pairs, band).reshape(n, n)
+    bound = lb_keogh(trajectories, *envelopes(trajectories, band))
+    assert (bound <= exact + 1e-9).all()
+
+
+def test_k_medoids_matches_brute_force(trajectories):
+    band = 3
+    n = len(trajectories)
+    pairs = np.array([(a, b) for a in range(n) for b in range(n)])
+    full = dtw_batch(trajectories, pairs, band).reshape(n, n)
+    distances = PrunedDistances(trajectories, band, workers=1)
+    medoids, labels, nearest = k_medoids(distances, 3)
+    # Every region is assigned to its nearest medoid, at its exact distance
+    np.testing.assert_array_equal(labels, full[:, medoids].argmin(axis=1))
+    np.testing.assert_allclose(nearest, full[np.arange(n), medoids[labels]])
+    # and every medoid is the member with the smallest total distance to its cluster
+    for c, medoid in enumerate(medoids):
+        members = np.flatnonzero(labels == c)
+        assert full[np.ix_(members, members)].sum(axis=1).min() == pytest.approx(full[medoid, members].sum())
+    # The distances that were computed are exact, and not all of them were needed
+    known = ~np.isnan(distances.exact)
+    np.testing.assert_allclose(distances.exact[known], full[known], rtol=1e-9, atol=1e-12)
+    assert distances.computed_fraction() < 1
@@ -0,0 +1,46 @@
+"""The batched Granger F-tests agree with ordinary least squares fitted one regression at a time."""
+import numpy as np
+import pytest
+
+from utils.granger import granger_tests, index_columns, outcomes
+
+
+def lagged(series, p):
+    # (n, p) lags x[t - p] .. x[t - 1] of every fitted day t
+    n = len(series) - p
+    return np.column_stack([series[s:s + n] for s in range(p)])
+
+
+def rss(y, *blocks):
+    # Residual sum of squares of y on an intercept and the blocks
+    x = np.column_stack([np.ones(len(y)), *blocks])
+    residuals = y - x @ np.linalg.lstsq(x, y, rcond=None)[0]
+    return residuals @ residuals
+
+
+def f_statistic(target, other, p):
+    # F test of whether p lags of other improve the AR(p) fit of target
+    y = target[p:]
+    restricted, full = rss(y, lagged(target, p)), rss(y, lagged(target, p), lagged(other, p))
+    df = len(y) - 2 * p - 1
+    return ((restricted - full) / p) / (full / df)
+
+
+@pytest.mark.parametrize("p", [2, 5])
+def test_matches_ols(p):
+    rng = np.random.default_rng(p)
+    k = len(index_columns)
+    units, days = 2, 160
+    # Indices as random walks, outcomes driven by the first index so some tests reject
+    series = np.cumsum(rng.normal(size=(units, k + len(outcomes), days)), axis=-1)
+    series[:, k:] = rng.normal(size=(units, len(outcomes), days))
+    series[:, k:, 3:] += 0.5 * series[:, :1, :-3]
+    f, df = granger_tests(series, p)
+    assert df == days - p - 2 * p - 1
+    assert f.shape == (units, len(outcomes), k, 2)
+    for u in range(units):
+        for o in range(len(outcomes)):
+            for i in range(k):
+                index, outcome = series[u, i], series[u, k + o]
+                np.testing.assert_allclose(f[u, o, i], [f_statistic(outcome, index, p),
+                                                        f_statistic(index, outcome, p)], rtol=1e-6)
@@ -0,0 +1,49 @@
+"""Import-time regression tests: no page or util may load one of utils.lazy.deferred_modules on import."""
+import glob
+import os
+
+import pytest
+
+from utils.profile_imports import baseline_imports, page_imports, profile
+
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a page's imports may add on top of streamlit, pandas and numpy; generous, since CI machines vary
+budget = 3.0
+
+pages = ["Home.py"] + sorted(os.path.join("pages", os.path.basename(path))
+                             for path in glob.glob(os.path.join(app_dir, "pages", "*.py")))
+util_modules = sorted(f"utils.{os.path.splitext(os.path.basename(path))[0]}"
+                      for path in glob.glob(os.path.join(app_dir, "utils", "*.py"))
+                      if not path.endswith("__init__.py"))
+
+
+@pytest.fixture(autouse=True)
+def in_app_dir(monkeypatch):
+    monkeypatch.chdir(app_dir)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    # (seconds, modules, loaded deferred modules) of a bare streamlit, pandas and numpy import
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        return profile(baseline_imports)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.mark.parametrize("path", pages)
+def test_page_defers_heavy_imports(path, baseline):
+    baseline_total, _, already_loaded = baseline
+    total, _, loaded = profile(baseline_imports + "\n" + page_imports(path))
+    assert not set(loaded) - set(already_loaded), f"{path} imports {sorted(set(loaded) - set(already_loaded))}"
+    assert total - baseline_total < budget
+
+
+@pytest.mark.parametrize("module", util_modules)
+def test_util_defers_heavy_imports(module, baseline):
+    _, _, already_loaded = baseline
+    _, _, loaded = profile(f"import {module}")
+    assert not set(loaded) - set(already_loaded), f"{module} imports {sorted(set(loaded) - set(already_loaded))}"
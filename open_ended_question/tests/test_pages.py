@@ -0,0 +1,45 @@
+"""Pages that submit to the compute pool, run end to end with streamlit.testing on the synthetic data.
+
+Streamlit runs a page as sys.modules["__main__"], so these catch pool workers that start by running the page.
+"""
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a cold run may take, page 5's bootstrap bands included
+timeout = 600
+
+
+@pytest.fixture(autouse=True)
+def in_data_dir(monkeypatch, synthetic_data):
+    monkeypatch.chdir(synthetic_data)
+
+
+# Page and the element its pool results are drawn as, with how many
+@pytest.mark.parametrize("path, element, count", [("pages/5_OxCGRT_Economic_Support_Analysis.py", "plotly_chart", 16),
+                                                  ("pages/8_Granger_Causality_Screen.py", "dataframe", 1)])
+def test_compute_pool_page(path, element, count):
+    at = AppTest.from_file(os.path.join(app_dir, path), default_timeout=timeout).run()
+    assert not at.exception, [e.value for e in at.exception]
+    assert len(at.get(element)) == count
+    # A rerun is served by the same pool
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+
+
+def test_home_does_not_wait_for_the_warmup():
+    # The first run returns with the warm-up still going, and a run after it ends shows the report
+    from utils.warmup import start_warmup
+
+    at = AppTest.from_file(os.path.join(app_dir, "Home.py"), default_timeout=timeout).run()
+    assert not at.exception, [e.value for e in at.exception]
+    warmup = start_warmup()
+    assert not at.dataframe or warmup.done()
+    warmup.wait()
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    assert at.dataframe[0].value["Page"].tolist() == list(warmup.tasks)
+    assert warmup.report() is warmup.report()
@@ -0,0 +1,28 @@
+"""Typed arrays of compact figures decode to the values they were given."""
+import base64
+
+import numpy as np
+import pytest
+
+from utils.payload import _numbers
+
+
+def decode(typed):
+    return np.frombuffer(base64.b64decode(typed["bdata"]), dtype=typed["dtype"])
+
+
+@pytest.mark.parametrize("values, dtype", [
+    (np.arange(20) * 3.0, "i4"),                          # small integers
+    (np.linspace(0, 1, 20), "f4"),                        # rates
+    (np.arange(20) * 0.5 + 103_456_789, "f8"),            # large counts with fractions
+    (np.r_[np.nan, np.arange(19) * 1e7 + 0.5], "f8"),     # gaps
+    (np.arange(20) * 1.0 + 2 ** 40, "f8"),                # large integers
+])
+def test_values_round_trip(values, dtype):
+    typed = _numbers(values)
+    assert typed["dtype"] == dtype
+    decoded = decode(typed)
+    if dtype == "f4":
+        np.testing.assert_allclose(decoded, values, rtol=1e-7)
+    else:
+        np.testing.assert_array_equal(decoded, values)
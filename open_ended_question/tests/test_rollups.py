@@ -0,0 +1,36 @@
+"""Weekly and monthly rollups keep every listed column, and refuse the ones they cannot aggregate."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data import replace_trailing_zeros_with_last_nonzero, vaccination_df
+from utils.rollups import rollup
+
+
+def daily_vaccinations():
+    dates = pd.date_range("2021-01-01", "2021-03-31")
+    return pd.DataFrame({"iso_code": "USA", "date": dates, "people_fully_vaccinated": np.arange(len(dates)) * 10.0,
+                         "daily_vaccinations": np.ones(len(dates))})
+
+
+def test_listed_columns_are_rolled_up_by_name():
+    weekly = rollup(daily_vaccinations(), "weekly", "date", ["iso_code"])
+    assert weekly["people_fully_vaccinated"].iloc[-1] == (len(daily_vaccinations()) - 1) * 10
+    assert weekly["daily_vaccinations"].sum() == len(daily_vaccinations())
+
+
+def test_listed_column_that_is_not_numeric_raises():
+    df = daily_vaccinations().astype({"people_fully_vaccinated": object})
+    with pytest.raises(TypeError, match="people_fully_vaccinated"):
+        rollup(df, "weekly", "date", ["iso_code"])
+
+
+def test_vaccination_totals_stay_numeric(synthetic_data, monkeypatch):
+    # Missing totals are read as 0 and carried forward, which replace(0, pd.NA) leaves as object
+    monkeypatch.chdir(synthetic_data)
+    df = replace_trailing_zeros_with_last_nonzero(pd.DataFrame({"a": [1.0, 0.0, 3.0, 0.0]}), "a")
+    assert df["a"].tolist() == [1.0, 1.0, 3.0, 3.0]
+    vaccinations = vaccination_df.__wrapped__("USA")
+    assert vaccinations[["people_fully_vaccinated", "total_vaccinations"]].dtypes.eq("float64").all()
+    weekly = rollup(vaccinations, "weekly", "date", ["iso_code"])
+    assert {"people_fully_vaccinated", "percent_people_fully_vaccinated", "total_vaccinations"} <= set(weekly)
@@ -0,0 +1,45 @@
+"""Rt of exponential growth matches the renewal equation; daily cases from cumulative reports."""
+import numpy as np
+import pytest
+
+from utils.rt import daily_incidence, estimate_rt, serial_interval, window_days
+
+
+@pytest.mark.parametrize("growth", [-0.05, 0.0, 0.08, 0.2])
+def test_exponential_growth(growth):
+    # I_t = I_0 e^{rt} gives Lambda_t = I_t sum_s w_s e^{-rs}, so Rt = 1 / sum_s w_s e^{-rs} exactly
+    w = serial_interval()
+    days = np.arange(120)
+    incidence = 1e9 * np.exp(growth * days)[None, :]
+    expected = 1 / np.sum(w * np.exp(-growth * np.arange(1, len(w) + 1)))
+    mean, intervals = estimate_rt(incidence, w)
+
+    assert np.isnan(mean[:, :window_days]).all()
+    # Once every window sees a full serial interval of earlier days (the cases before day 0 are unknown)
+    steady = slice(len(w) + window_days, None)
+    np.testing.assert_allclose(mean[:, steady], expected, rtol=1e-6)
+    for lower, upper in intervals.values():
+        assert (lower[:, steady] < expected).all() and (expected < upper[:, steady]).all()
+    (lower50, upper50), (lower95, upper95) = intervals[50], intervals[95]
+    assert (lower95[:, steady] <= lower50[:, steady]).all() and (upper50[:, steady] <= upper95[:, steady]).all()
+
+
+def test_few_cases_are_left_out():
+    w = serial_interval()
+    incidence = np.ones((1, 60))
+    mean, _ = estimate_rt(incidence, w)
+    # 7 cases a window are fewer than min_cases
+    assert np.isnan(mean).all()
+
+
+def test_daily_incidence():
+    cumulative = np.array([
+        [0, 0, 50, 60, 75],      # first report after days of zeros
+        [100, 110, 130, 160, 170],   # already reporting on the first day
+        [10, 20, 18, 25, 25],    # downward correction, then growth from the corrected total
+    ], dtype=float)
+    np.testing.assert_array_equal(daily_incidence(cumulative), [
+        [0, 0, 0, 10, 15],
+        [0, 10, 20, 30, 10],
+        [0, 10, 0, 7, 0],
+    ])
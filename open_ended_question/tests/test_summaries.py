@@ -0,0 +1,76 @@
+"""box_summary agrees with plotly.js's own box statistics and thins outliers evenly."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import summaries
+from utils.summaries import box_summary
+
+
+def plotly_interp(values, p):
+    # Lib.interp of plotly.js, which box traces use for quartilemethod "linear"
+    n = p * len(values) - 0.5
+    if n < 0:
+        return values[0]
+    if n > len(values) - 1:
+        return values[-1]
+    frac = n % 1
+    return frac * values[math.ceil(n)] + (1 - frac) * values[math.floor(n)]
+
+
+def plotly_box(values):
+    values = sorted(values)
+    q1, med, q3 = (plotly_interp(values, p) for p in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    # Whiskers end at the furthest data points within 1.5 IQR of the box
+    lower = min(v for v in values if v >= q1 - 1.5 * iqr)
+    upper = max(v for v in values if v <= q3 + 1.5 * iqr)
+    outliers = [v for v in values if v < lower or v > upper]
+    return {"Count": len(values), "Min": values[0], "Q1": q1, "Median": med, "Q3": q3, "Max": values[-1],
+            "LowerFence": lower, "UpperFence": upper}, outliers
+
+
+def test_matches_plotly_linear_quartiles():
+    rng = np.random.default_rng(3)
+    groups = {
+        ("US", 2020): rng.normal(size=1),
+        ("US", 2021): rng.normal(size=2),
+        ("Canada", 2020): rng.integers(0, 5, size=7).astype(float),   # ties
+        ("Canada", 2021): np.r_[rng.normal(size=40), 30, -25],        # outliers on both sides
+        ("World", 2020): rng.lognormal(size=501),
+    }
+    df = pd.concat([pd.DataFrame({"Country": c, "Year": y, "Value": v}) for (c, y), v in groups.items()])
+    df = pd.concat([df, pd.DataFrame({"Country": ["US"], "Year": [2020], "Value": [np.nan]})])
+    summary, outliers = box_summary(df.sample(frac=1, random_state=0), "Value", ["Country", "Year"])
+
+    assert len(summary) == len(groups)
+    for row in summary.itertuples(index=False):
+        expected, expected_outliers = plotly_box(groups[row.Country, row.Year])
+        for column, value in expected.items():
+            assert getattr(row, column) == pytest.approx(value, rel=1e-12), column
+        got = outliers.loc[(outliers["Country"] == row.Country) & (outliers["Year"] == row.Year), "Value"]
+        assert sorted(got) == pytest.approx(expected_outliers)
+
+
+def test_outlier_thinning_keeps_both_extremes(monkeypatch):
+    monkeypatch.setattr(summaries, "max_outliers", 20)
+    rng = np.random.default_rng(5)
+    heavy = np.r_[rng.normal(size=2000), rng.standard_cauchy(500) * 100]
+    light = np.r_[rng.normal(size=200), 40, -40]
+    df = pd.concat([pd.DataFrame({"Group": "heavy", "Value": heavy}),
+                    pd.DataFrame({"Group": "light", "Value": light})])
+    summary, outliers = box_summary(df, "Value", "Group")
+
+    kept = outliers[outliers["Group"] == "heavy"]["Value"]
+    expected = plotly_box(heavy)[1]
+    assert len(expected) > 20
+    assert len(kept) == 20
+    assert kept.min() == heavy.min() and kept.max() == heavy.max()
+    assert set(kept) <= set(expected)
+    # Evenly spaced in rank: no gap between kept outliers is much more than the average one
+    ranks = np.searchsorted(expected, np.sort(kept))
+    assert np.diff(ranks).max() <= math.ceil((len(expected) - 1) / 19)
+    # Groups with few outliers keep them all
+    assert sorted(outliers[outliers["Group"] == "light"]["Value"]) == plotly_box(light)[1]
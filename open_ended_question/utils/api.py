@@ -0,0 +1,268 @@
+"""Local HTTP API for the derived series behind the dashboard.
+
+Serves the same cached frames the pages draw from, filtered by country,
+region, date range and column list, as paginated JSON or as a streamed Arrow
+IPC response. level=weekly or monthly serves the rollups instead of the daily
+rows, and level=auto the coarsest with at least min_points periods in the range. Run from the open_ended_question directory:
+
+    python -m utils.api --port 8600          # serve
+    python -m utils.api --benchmark          # throughput of full pulls, JSON vs Arrow
+
+    GET /datasets
+    GET /series/national?country=US&start=2020-03-01&end=2020-12-31&columns=DailyCaseRate,DailyDeathRate
+    GET /series/regional.arrow?country=Canada&region=ON,QC&columns=CasesPer100K
+    GET /series/vaccinations?country=US&page=2&page_size=500
+    GET /series/national?country=Canada&columns=DailyCaseRate&level=auto&min_points=30
+"""
+import argparse
+import http.server
+import json
+import math
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import pandas as pd
+from streamlit import logger
+
+from utils.data import (COUNTRIES, index_to_scale, national_df, regional_df, vaccination_df,
+                        vaccination_iso_codes)
+from utils.lazy import lazy_import
+from utils.rollups import (choose_level, default_min_points, levels, national_rollups, regional_rollups,
+                           vaccination_rollups)
+
+pa = lazy_import("pyarrow")
+log = logger.get_logger(__name__)
+
+# Dataset -> loader for one country, the date column, the id columns always returned
+# and the derived columns that can be requested
+DATASETS = {
+    "national": {
+        "load": national_df,
+        "rollups": national_rollups,
+        "date": "Date",
+        "ids": ["Country"],
+        "columns": ["CasesPerCapita", "DeathsPerCapita", "DailyCaseRate", "DailyDeathRate"]
+                   + [idx + " Per 100K Population" for idx in index_to_scale],
+    },
+    "regional": {
+        "load": regional_df,
+        "rollups": regional_rollups,
+        "date": "Date",
+        "ids": ["RegionCode"],
+        "columns": ["CasesPer100K", "DeathsPer100K"],
+    },
+    "vaccinations": {
+        "load": lambda country: vaccination_df(vaccination_iso_codes[country]),
+        "rollups": lambda country: vaccination_rollups(vaccination_iso_codes[country]),
+        "date": "date",
+        "ids": ["iso_code"],
+        "columns": ["percent_people_vaccinated", "percent_people_fully_vaccinated",
+                    "vaccine_administered_per_people", "daily_vaccinations_per_million"],
+    },
+}
+
+default_page_size = 1000
+max_page_size = 50_000
+arrow_batch_size = 64 * 1024
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _list(value):
+    return [item for item in value.split(",") if item] if value else []
+
+
+def select(dataset, country, region=None, start=None, end=None, columns=None, level="daily",
+           min_points=default_min_points):
+    # Filtered frame of one dataset: date, id columns and the requested (default: all) derived columns, at a
+    # rollup level ("auto" picks it from the date range); rolled up rows also have the Days they cover
+    if dataset not in DATASETS:
+        raise BadRequest(404, f"Unknown dataset {dataset!r}, expected one of {sorted(DATASETS)}")
+    spec = DATASETS[dataset]
+    if country not in COUNTRIES:
+        raise BadRequest(400, f"Unknown country {country!r}, expected one of {sorted(COUNTRIES)}")
+    columns = columns or spec["columns"]
+    unknown = [column for column in columns if column not in spec["columns"]]
+    if unknown:
+        raise BadRequest(400, f"Unknown columns {unknown} for {dataset}, expected some of {spec['columns']}")
+
+    if level not in [*levels, "auto"]:
+        raise BadRequest(400, f"Unknown level {level!r}, expected one of {[*levels, 'auto']}")
+
+    df = spec["load"](country)
+    try:
+        first = pd.Timestamp(start) if start else df[spec["date"]].min()
+        last = pd.Timestamp(end) if end else df[spec["date"]].max()
+    except ValueError as e:
+        raise BadRequest(400, f"Bad date: {e}")
+    if level == "auto":
+        level = choose_level(first, last, min_points)
+    extra = []
+    if level != "daily":
+        df = spec["rollups"](country)[level]
+        # A period is kept if it overlaps the range
+        first = first.to_period(levels[level]).start_time
+        extra = ["Days"]
+    mask = (df[spec["date"]] >= first) & (df[spec["date"]] <= last)
+    if region:
+        if dataset != "regional":
+            raise BadRequest(400, "region only applies to the regional dataset")
+        mask &= df["RegionCode"].isin(region)
+    return df.loc[mask, [spec["date"]] + spec["ids"] + extra + list(columns)].reset_index(drop=True)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # Set once a status line is sent; after that an error can only close the connection
+    responded = False
+
+    def log_message(self, *args):
+        pass
+
+    def send_response(self, *args):
+        self.responded = True
+        super().send_response(*args)
+
+    def _send_json(self, status, body):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if url.path == "/datasets":
+                self._send_json(200, {name: {"date": spec["date"], "ids": spec["ids"], "columns": spec["columns"]}
+                                      for name, spec in DATASETS.items()} | {"countries": list(COUNTRIES)})
+                return
+            if not url.path.startswith("/series/"):
+                raise BadRequest(404, f"Unknown path {url.path}")
+            dataset = url.path[len("/series/"):]
+            arrow = dataset.endswith(".arrow")
+            try:
+                min_points = int(query.get("min_points", default_min_points))
+            except ValueError:
+                raise BadRequest(400, "min_points must be an integer")
+            df = select(dataset.removesuffix(".arrow"), query.get("country", ""), _list(query.get("region")),
+                        query.get("start"), query.get("end"), _list(query.get("columns")),
+                        query.get("level", "daily"), min_points)
+            if arrow:
+                self._send_arrow(df)
+            else:
+                self._send_page(df, query)
+        except BadRequest as e:
+            self._send_json(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away
+        except Exception as e:
+            # Loader, rollup or encoding failures: the client gets a 500 rather than a dropped connection
+            log.exception("GET %s failed", self.path)
+            if not self.responded:
+                self._send_json(500, {"error": f"Internal error: {type(e).__name__}: {e}"})
+
+    def _send_page(self, df, query):
+        try:
+            page = int(query.get("page", 1))
+            page_size = int(query.get("page_size", default_page_size))
+        except ValueError:
+            raise BadRequest(400, "page and page_size must be integers")
+        if page < 1 or not 1 <= page_size <= max_page_size:
+            raise BadRequest(400, f"page must be >= 1 and page_size between 1 and {max_page_size}")
+        part = df.iloc[(page - 1) * page_size: page * page_size]
+        meta = {"columns": list(df.columns), "page": page, "page_size": page_size,
+                "total_rows": len(df), "pages": math.ceil(len(df) / page_size)}
+        # The rows are already JSON from pandas, so they are spliced in rather than parsed and re-encoded
+        rows = part.to_json(orient="records", date_format="iso")
+        self._send_json(200, json.dumps(meta)[:-1] + ', "rows": ' + rows + "}")
+
+    def _send_arrow(self, df):
+        # Streamed in record batches; the end of the response is marked by closing the connection
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.apache.arrow.stream")
+        self.end_headers()
+        with pa.ipc.new_stream(self.wfile, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=arrow_batch_size):
+                writer.write_batch(batch)
+
+
+def serve(port=8600, host="127.0.0.1"):
+    return http.server.ThreadingHTTPServer((host, port), Handler)
+
+
+def _pull_json(base, dataset, country, page_size):
+    rows, size, page, pages = 0, 0, 1, 1
+    while page <= pages:
+        with urllib.request.urlopen(f"{base}/series/{dataset}?country={country}&page={page}"
+                                    f"&page_size={page_size}") as response:
+            data = response.read()
+        body = json.loads(data)
+        rows += len(body["rows"])
+        size += len(data)
+        pages = body["pages"]
+        page += 1
+    return rows, size
+
+
+def _pull_arrow(base, dataset, country):
+    with urllib.request.urlopen(f"{base}/series/{dataset}.arrow?country={country}") as response:
+        data = response.read()
+    return pa.ipc.open_stream(data).read_all().num_rows, len(data)
+
+
+def benchmark(page_size, repeats):
+    server = serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    rows = []
+    try:
+        for dataset in DATASETS:
+            for country in COUNTRIES:
+                # First pull fills the caches, so the timed pulls measure serving rather than loading
+                _pull_arrow(base, dataset, country)
+                for fmt, pull in [("json", lambda: _pull_json(base, dataset, country, page_size)),
+                                  ("arrow", lambda: _pull_arrow(base, dataset, country))]:
+                    times = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        n, size = pull()
+                        times.append(time.perf_counter() - start)
+                    best = min(times)
+                    rows.append({"Dataset": dataset, "Country": country, "Format": fmt, "Rows": n,
+                                 "MB": round(size / 1e6, 2), "Seconds": round(best, 4),
+                                 "Rows/s": int(n / best), "MB/s": round(size / 1e6 / best, 1)})
+    finally:
+        server.shutdown()
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard's derived series over HTTP.")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--benchmark", action="store_true", help="measure full pulls of every dataset and exit")
+    parser.add_argument("--page-size", type=int, default=default_page_size, help="JSON page size when benchmarking")
+    parser.add_argument("--repeats", type=int, default=3, help="timed pulls per dataset and format")
+    args = parser.parse_args()
+
+    # The cached loaders warn about the missing Streamlit runtime on every call
+    logger.set_log_level("error")
+    if args.benchmark:
+        benchmark(args.page_size, args.repeats)
+        return
+    server = serve(args.port, args.host)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.lazy import lazy_import
+
+stats = lazy_import("scipy.stats")
+
+
+def block_bootstrap_indices(n, block_length, n_resamples, seed=None):
+    # Moving-block bootstrap: every resample is a run of randomly placed blocks
+    # of consecutive days, cut to length n, so autocorrelation within a block is kept
+    rng = np.random.default_rng(seed)
+    block_length = max(1, min(int(block_length), n))
+    n_blocks = -(-n // block_length)
+    starts = rng.integers(0, n - block_length + 1, size=(n_resamples, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_length)
+    return idx.reshape(n_resamples, -1)[:, :n]
+
+
+def _rowwise_pearson(a, b):
+    a = a - a.mean(axis=1, keepdims=True)
+    b = b - b.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (a * b).sum(axis=1) / np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+
+
+def batched_spearman(x, y, idx):
+    # Ranks of every resample at once, then a row-wise Pearson on the ranks
+    return _rowwise_pearson(stats.rankdata(x[idx], axis=1), stats.rankdata(y[idx], axis=1))
+
+
+def _resample_counts(idx, n):
+    # How many times each original observation appears in each resample
+    offsets = np.arange(idx.shape[0])[:, None] * n
+    return np.bincount((idx + offsets).ravel(), minlength=idx.shape[0] * n).reshape(idx.shape[0], n).astype(float)
+
+
+def _weighted_dcov2(w, a, b, ab, n):
+    # V-statistic of the squared distance covariance for a sample that repeats
+    # observation i w[i] times, written as matrix products over the original data
+    wa = w @ a
+    wb = w @ b
+    t1 = np.einsum("ri,ri->r", w @ ab, w) / n**2
+    t2 = np.einsum("ri,ri,ri->r", w, wa, wb) / n**3
+    t3 = (w * wa).sum(axis=1) * (w * wb).sum(axis=1) / n**4
+    return t1 - 2 * t2 + t3
+
+
+def batched_distance_correlation(x, y, idx):
+    # Same estimator as dcor.distance_correlation, evaluated for all resamples
+    # with a handful of (resamples x n) @ (n x n) products instead of one call each
+    n = len(x)
+    a = np.abs(x[:, None] - x[None, :])
+    b = np.abs(y[:, None] - y[None, :])
+    w = _resample_counts(idx, n)
+    dcov_xy = _weighted_dcov2(w, a, b, a * b, n)
+    dvar_x = _weighted_dcov2(w, a, a, a * a, n)
+    dvar_y = _weighted_dcov2(w, b, b, b * b, n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dcor2 = dcov_xy / np.sqrt(dvar_x * dvar_y)
+    return np.sqrt(np.clip(dcor2, 0, None))
+
+
+batched_statistics = {
+    "spearman": batched_spearman,
+    "dcor": batched_distance_correlation,
+}
+
+
+def _aligned_pair(x, y, lag):
+    # Pair x[t] with y[t + lag] and drop missing pairs, as the page's shift/dropna does; a lag past the end
+    # leaves no pairs, and _lag_band gives NaN bounds
+    x = x[: max(len(x) - lag, 0)] if lag > 0 else x
+    y = y[lag:]
+    mask = np.isfinite(x) & np.isfinite(y)
+    return x[mask], y[mask]
+
+
+def _lag_band(x, y, lag, method, n_resamples, block_length, alpha, seed):
+    x, y = _aligned_pair(x, y, lag)
+    n = len(x)
+    if n < 3:
+        return lag, np.nan, np.nan
+    length = block_length if block_length else max(1, round(n ** (1 / 3)))
+    idx = block_bootstrap_indices(n, length, n_resamples, seed=seed)
+    stats = batched_statistics[method](x, y, idx)
+    lower, upper = np.nanpercentile(stats, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+    return lag, lower, upper
+
+
+def lag_confidence_bands(df1, df2, lags, method="spearman", n_resamples=1000, block_length=None,
+                         alpha=0.05, workers=None, seed=0):
+    x = np.asarray(df1, dtype=float)
+    y = np.asarray(df2, dtype=float)
+    workers = workers or os.cpu_count() or 1
+
+    # The NumPy kernels release the GIL, so a thread pool spreads lags across cores
+    # without copying the series into worker processes
+    args = [(x, y, lag, method, n_resamples, block_length, alpha, seed + i) for i, lag in enumerate(lags)]
+    if workers == 1:
+        rows = [_lag_band(*a) for a in args]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(lambda a: _lag_band(*a), args))
+
+    return pd.DataFrame(rows, columns=["Lag", "Lower", "Upper"])
@@ -0,0 +1,447 @@
+import numpy as np
+
+from utils.lazy import lazy_import
+from utils.payload import compact
+from utils.summaries import box_summary
+
+# Plotly is imported on the first chart that needs it
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+subplots = lazy_import("plotly.subplots")
+
+COUNTRIES = ['US', 'Canada']
+
+# ------------------ Deaths and Cases Overall ------------------
+
+cumulative_charts = {
+    'CasesPerCapita': ('Confirmed COVID-19 Cases Per 100K Population Over Time: U.S. vs Canada',
+                       'Cases Per 100K Population'),
+    'DeathsPerCapita': ('COVID-19 Deaths Per 100K Population Over Time: U.S. vs Canada',
+                        'Deaths Per 100K Population'),
+}
+
+daily_charts = {
+    'DailyCaseRate': ('Daily COVID-19 Case Count Per 100K Population: U.S. vs Canada',
+                      'Boxplot of Daily COVID-19 Case Count Per 100K Population: U.S. vs Canada',
+                      'Daily Case Count Per 100K Population'),
+    'DailyDeathRate': ('Daily COVID-19 Death Count Per 100K Population: U.S. vs Canada',
+                       'Boxplot of Daily COVID-19 Death Count Per 100K Population: U.S. vs Canada',
+                       'Daily Death Count Per 100K Population'),
+}
+
+
+def cumulative_line(combined_df, column):
+    title, label = cumulative_charts[column]
+    return compact(px.line(combined_df, x='Date', y=column, color='Country', title=title, labels={column: label}))
+
+
+def daily_scatter(combined_df, column):
+    title, _, label = daily_charts[column]
+    return compact(px.scatter(combined_df, x='Date', y=column, color='Country', title=title,
+                              labels={column: label}))
+
+
+def daily_box(combined_df, column):
+    _, title, label = daily_charts[column]
+    return summary_box(*box_summary(combined_df, column, 'Country'), 'Country', column, title, label)
+
+
+def summary_box(summary, outliers, x, value, title, label):
+    # Box plot drawn from box_summary statistics: one precomputed box per group and its outliers as markers,
+    # styled as px.box would draw the raw rows
+    color = px.colors.qualitative.Plotly[0]
+    fig = go.Figure()
+    fig.add_trace(go.Box(
+        x=summary[x], q1=summary['Q1'], median=summary['Median'], q3=summary['Q3'],
+        lowerfence=summary['LowerFence'], upperfence=summary['UpperFence'],
+        boxpoints=False, marker_color=color, showlegend=False, name='',
+    ))
+    fig.add_trace(go.Scatter(
+        x=outliers[x], y=outliers[value], mode='markers', marker_color=color, showlegend=False, name='',
+        hovertemplate=f"{x}=%{{x}}<br>{label}=%{{y}}<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=label, xaxis_type='category')
+    return compact(fig)
+
+
+# ------------------ Deaths and Cases Regionwise ------------------
+
+map_settings = {
+    'US': {'locations': 'StateName', 'featureidkey': 'properties.StateName', 'zoom': 1.85,
+           'center': {'lat': 55, 'lon': -120}},
+    'Canada': {'locations': 'ProvinceName', 'featureidkey': 'properties.ProvinceName', 'zoom': 1.25,
+               'center': {'lat': 72, 'lon': -97}},
+}
+
+map_metrics = {
+    'CasesPer100K': ('Cases Per 100K', (0, 40000)),
+    'DeathsPer100K': ('Deaths Per 100K', (0, 500)),
+}
+
+
+def region_map(region_df, geojson, country, column):
+    settings = map_settings[country]
+    label, range_color = map_metrics[column]
+    fig = px.choropleth_mapbox(
+        region_df,
+        geojson=geojson,
+        locations=settings['locations'],
+        featureidkey=settings['featureidkey'],
+        color=column,
+        color_continuous_scale='Viridis',
+        mapbox_style='carto-positron',
+        zoom=settings['zoom'],
+        center=settings['center'],
+        opacity=0.5,
+        labels={column: label},
+        range_color=range_color,
+    )
+    fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
+    return fig
+
+
+def cluster_map(cluster_df, geojson, country):
+    # States / provinces coloured by their policy trajectory cluster
+    settings = map_settings[country]
+    fig = px.choropleth_mapbox(
+        cluster_df,
+        geojson=geojson,
+        locations=settings['locations'],
+        featureidkey=settings['featureidkey'],
+        color='Cluster',
+        category_orders={'Cluster': sorted(cluster_df['Cluster'].unique(), key=int)},
+        mapbox_style='carto-positron',
+        zoom=settings['zoom'],
+        center=settings['center'],
+        opacity=0.5,
+        hover_data=['DTW distance to medoid'],
+    )
+    fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
+    return fig
+
+
+def cluster_trajectories(trajectory_df):
+    return px.line(
+        trajectory_df,
+        x='Date',
+        y='Mean policy level',
+        color='Cluster',
+        title='Mean C1E-H8E Policy Level of Each Cluster Over Time',
+        labels={'Mean policy level': 'Mean Policy Level (each indicator scaled to 0-1)'},
+    )
+
+
+group_measures = {
+    'CasesPer100K': 'Cases Per 100K',
+    'DeathsPer100K': 'Deaths Per 100K',
+    'DailyCaseRate': 'Daily Case Count Per 100K',
+    'DailyDeathRate': 'Daily Death Count Per 100K',
+    'StringencyIndex_WeightedAverage': 'Population-Weighted Stringency Index',
+    'GovernmentResponseIndex_WeightedAverage': 'Population-Weighted Government Response Index',
+}
+
+
+def group_lines(group_df, column):
+    # One line per group of states / provinces
+    label = group_measures[column]
+    return compact(px.line(group_df, x='Date', y=column, color='Group', title=f"{label} of Each Group Over Time",
+                           labels={column: label}))
+
+
+# ------------------ OxCGRT Index Overall / Specific Policy ------------------
+
+rate_axes = {
+    'DailyCaseRate': 'Case',
+    'DailyDeathRate': 'Death',
+}
+
+index_names = {
+    'StringencyIndex_WeightedAverage': 'Stringency Index',
+    'ContainmentHealthIndex_WeightedAverage': 'Containment Health Index',
+    'EconomicSupportIndex': 'Economic Support Index'
+}
+
+
+def rate_with_indexes(combined_df, rate, rate_name, indexes, title, rate_title, index_title, legend_y):
+    # Daily rate as markers on the primary axis, one line per index on the secondary axis
+    fig = subplots.make_subplots(specs=[[{"secondary_y": True}]])
+    for country in COUNTRIES:
+        country_data = combined_df[combined_df['Country'] == country]
+        fig.add_trace(
+            go.Scatter(
+                x=country_data['Date'],
+                y=country_data[rate],
+                mode='markers',
+                name=f"{country} {rate_name}"
+            ),
+            secondary_y=False
+        )
+        for index, index_name in indexes.items():
+            fig.add_trace(
+                go.Scatter(
+                    x=country_data['Date'],
+                    y=country_data[index],
+                    mode='lines',
+                    name=f"{country} {index_name}"
+                ),
+                secondary_y=True
+            )
+
+    fig.update_xaxes(title_text="Date")
+    fig.update_yaxes(title_text=rate_title, secondary_y=False)
+    fig.update_yaxes(title_text=index_title, secondary_y=True)
+    fig.update_layout(
+        title_text=title,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=legend_y,
+            xanchor="center",
+            x=0.5
+        ),
+        margin=dict(b=150),
+        height=600
+    )
+    return compact(fig)
+
+
+def rate_with_government_response(combined_df, rate):
+    kind = rate_axes[rate]
+    return rate_with_indexes(
+        combined_df, rate, f"Daily {kind} Count",
+        {'GovernmentResponseIndex_WeightedAverage': 'Government Response Index'},
+        title=f"Daily COVID-19 {kind} Count and Government Response Index Over Time",
+        rate_title=f"Daily {kind} Count per 100K",
+        index_title="Government Response Index",
+        legend_y=-0.3,
+    )
+
+
+def rate_with_selected_indexes(combined_df, rate, selected_indexes):
+    kind = rate_axes[rate]
+    return rate_with_indexes(
+        combined_df, rate, f"Daily {kind} Rate",
+        {index: index_names[index] for index in selected_indexes},
+        title=f"Daily COVID-19 {kind} Rate and Selected Indexes Over Time",
+        rate_title=f"Daily {kind} Rate per 100K",
+        index_title="Index Value",
+        legend_y=-0.4,
+    )
+
+
+def rate_with_policy(combined_df, rate, selected_index):
+    kind = rate_axes[rate]
+    return rate_with_indexes(
+        combined_df, rate, f"Daily {kind} Count",
+        {selected_index: selected_index},
+        title=f"Daily COVID-19 {kind} Count and Selected Index Over Time",
+        rate_title=f"Daily {kind} Count per 100K",
+        index_title="Index Value",
+        legend_y=-0.4,
+    )
+
+
+def index_box(combined_df, index, index_name):
+    return summary_box(*box_summary(combined_df, index, 'Country'), 'Country', index,
+                       f'Boxplot of {index_name}: U.S. vs Canada', index_name)
+
+
+def index_scenario(scenario_df, index, index_name, description):
+    # Recomputed index of each country as a solid line and under the scenario as a dashed line
+    fig = go.Figure()
+    for country in COUNTRIES:
+        country_data = scenario_df[scenario_df['Country'] == country]
+        for column, dash, suffix in [(index, 'solid', ''), (f"{index} Scenario", 'dash', ' (scenario)')]:
+            fig.add_trace(go.Scatter(x=country_data['Date'], y=country_data[column], mode='lines',
+                                     line=dict(color=country_colors[country], dash=dash),
+                                     name=f"{country} {index_name}{suffix}"))
+    fig.update_layout(title=f"{index_name} Recomputed With and Without: {description}", xaxis_title="Date",
+                      yaxis_title=index_name)
+    return compact(fig)
+
+
+def interval_band(x, lower, upper):
+    # Outline of a band over each run of days with defined bounds: along the upper bound and back along the
+    # lower one, runs separated by gaps, so fill='toself' does not bridge the days without an estimate
+    x, lower, upper = np.asarray(x), np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    defined = np.concatenate([[False], np.isfinite(lower) & np.isfinite(upper), [False]])
+    edges = np.flatnonzero(np.diff(defined.astype(int)))
+    xs, ys = [], []
+    for first, last in zip(edges[::2], edges[1::2]):
+        xs += [*x[first:last], *x[first:last][::-1], None]
+        ys += [*upper[first:last], *lower[first:last][::-1], None]
+    return xs[:-1], ys[:-1]
+
+
+def rt_with_index(rt_df, index_df, index, index_name):
+    # Rt of each country with its 95% posterior interval on the primary axis and the index on the secondary axis
+    fig = subplots.make_subplots(specs=[[{"secondary_y": True}]])
+    for country in COUNTRIES:
+        rt = rt_df[rt_df['Country'] == country]
+        x, y = interval_band(rt['Date'], rt['Lower 95%'], rt['Upper 95%'])
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line=dict(width=0), fill='toself',
+                                 fillcolor=band_colors[country], hoverinfo='skip',
+                                 name=f"{country} Rt 95% interval"), secondary_y=False)
+        fig.add_trace(go.Scatter(x=rt['Date'], y=rt['Rt'], mode='lines', line=dict(color=country_colors[country]),
+                                 name=f"{country} Rt"), secondary_y=False)
+        country_data = index_df[index_df['Country'] == country]
+        fig.add_trace(go.Scatter(x=country_data['Date'], y=country_data[index], mode='lines',
+                                 line=dict(color=country_colors[country], dash='dot'),
+                                 name=f"{country} {index_name}"), secondary_y=True)
+    fig.add_hline(y=1, line_dash='dash', line_color='black', secondary_y=False)
+    fig.update_xaxes(title_text="Date")
+    fig.update_yaxes(title_text="Effective Reproduction Number (Rt)", secondary_y=False)
+    fig.update_yaxes(title_text=index_name, secondary_y=True)
+    fig.update_layout(title_text=f"Effective Reproduction Number and {index_name} Over Time",
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.4, xanchor="center", x=0.5),
+                      margin=dict(b=150), height=600)
+    return compact(fig)
+
+
+# ------------------ OxCGRT Economic Support Analysis ------------------
+
+country_colors = {"US": "#636EFA", "Canada": "#EF553B"}
+band_colors = {"US": "rgba(99, 110, 250, 0.2)", "Canada": "rgba(239, 85, 59, 0.2)"}
+
+correlation_names = {
+    "spearman": "Spearman Correlation",
+    "dcor": "Distance Correlation",
+    "ksg": "Mutual Information (nats)",
+}
+
+
+def lag_correlation(method, selected_index, rate, curves, bands=None):
+    # curves / bands map a country to its Lag/Correlation and Lag/Lower/Upper frames
+    fig = go.Figure()
+    for country, band in (bands or {}).items():
+        # Upper edge first, then the lower edge filled up to it
+        fig.add_trace(go.Scatter(x=band["Lag"], y=band["Upper"], mode="lines", line=dict(width=0),
+                                 showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=band["Lag"], y=band["Lower"], mode="lines", line=dict(width=0),
+                                 fill="tonexty", fillcolor=band_colors[country], name=f"{country} 95% CI"))
+    for country, curve in curves.items():
+        fig.add_trace(go.Scatter(x=curve["Lag"], y=curve["Correlation"], name=country,
+                                 line=dict(color=country_colors[country])))
+    name = correlation_names[method]
+    fig.update_layout(title=f"{name} of {selected_index} and Lagged Daily {rate_axes[rate]} Count",
+                      xaxis_title="Lag (days)",
+                      yaxis_title=name,
+                      )
+    return fig
+
+
+# ------------------ Vaccinations Analysis ------------------
+
+vaccination_charts = {
+    "percent_people_vaccinated": ("Percentage of the Population Vaccinated Over Time in the US and Canada",
+                                  "Percentage of Population Vaccinated"),
+    "percent_people_fully_vaccinated": (
+        "Percentage of the Population Fully Vaccinated Over Time in the US and Canada",
+        "Percentage of Populations Fully Vaccinated"),
+    "vaccine_administered_per_people": ("Vaccine Administered per Person in the US and Canada",
+                                        "Vaccine Administered per Person"),
+    "daily_vaccinations_per_million": (
+        "Daily Number of People Vaccinated Over Time in the US and Canada per 1M Population",
+        "Daily People Vaccinated (per 1M pops)"),
+}
+
+vaccination_status_charts = {
+    "government_response_index": ("Government Response Index", "Government Response Index Value"),
+    "containment_health_index": ("Containment and Health Index", "Containment and Health Index Value"),
+}
+
+country_titles = {"US": "USA", "Canada": "Canada"}
+
+
+def vaccination_line(combined_vac_df, column):
+    title, label = vaccination_charts[column]
+    return px.line(
+        combined_vac_df,
+        x="date",
+        y=column,
+        color="iso_code",
+        title=title,
+        labels={"iso_code": "Country", "date": "Date", column: label},
+    )
+
+
+def vaccination_status_line(status_df, country, column):
+    name, label = vaccination_status_charts[column]
+    return px.line(
+        status_df,
+        x="date",
+        y=column,
+        color="vaccination_status",
+        title=f"{name} for Vaccinated vs. Non-Vaccinated, {country_titles[country]}",
+        labels={
+            "vaccination_status": "Vaccination Status",
+            "date": "Date",
+            column: label,
+        },
+    )
+
+
+index_gap_charts = {
+    "GovernmentResponseIndex": "Government Response Index",
+    "ContainmentHealthIndex": "Containment and Health Index",
+}
+
+
+def index_gap_vs_coverage(gap_df, index):
+    name = index_gap_charts[index]
+    return px.scatter(
+        gap_df,
+        x="percent_people_fully_vaccinated",
+        y=f"{index}_Gap",
+        color="Country",
+        title=f"{name} Gap (Vaccinated - Non-Vaccinated) vs. Percentage Fully Vaccinated",
+        labels={
+            "percent_people_fully_vaccinated": "Percentage of Population Fully Vaccinated",
+            f"{index}_Gap": f"{name} Gap",
+        },
+    )
+
+
+# ------------------ Case Forecasts ------------------
+
+def case_forecast(history, forecast, name, country):
+    # 7-day average case rate with the forecast and its 80% / 95% prediction intervals
+    fig = go.Figure()
+    for level, opacity in [(95, 0.15), (80, 0.3)]:
+        fig.add_trace(go.Scatter(x=forecast["Date"], y=forecast[f"Upper {level}%"], mode="lines",
+                                 line=dict(width=0), showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=forecast["Date"], y=forecast[f"Lower {level}%"], mode="lines",
+                                 line=dict(width=0), fill="tonexty", name=f"{level}% prediction interval",
+                                 fillcolor=band_colors[country].replace("0.2)", f"{opacity})")))
+    fig.add_trace(go.Scatter(x=history["Date"], y=history["DailyCaseRate"], name="7-day average",
+                             line=dict(color=country_colors[country])))
+    fig.add_trace(go.Scatter(x=forecast["Date"], y=forecast["Forecast"], name="Forecast",
+                             line=dict(color=country_colors[country], dash="dash")))
+    fig.update_layout(title=f"{len(forecast)}-Day Forecast of the Daily COVID-19 Case Count Per 100K "
+                            f"Population: {name}",
+                      xaxis_title="Date",
+                      yaxis_title="Daily Case Count Per 100K Population (7-day average)",
+                      )
+    return fig
+
+
+# ------------------ Romania Counties ------------------
+
+def county_lines(series_df, metric, metric_name, threshold=None):
+    # One line per county; with a threshold, a dashed line at it and the days at or above it in red,
+    # as the close-ended question asks
+    fig = px.line(series_df, x='Date', y=metric, color='County', title=f"{metric_name} by County",
+                  labels={metric: metric_name})
+    if threshold is not None:
+        above = series_df[series_df[metric] >= threshold]
+        fig.add_trace(go.Scatter(x=above['Date'], y=above[metric], mode='markers', marker=dict(color='red', size=3),
+                                 name=f"At or above {threshold}", customdata=above['County'],
+                                 hovertemplate="%{customdata}<br>%{x}<br>%{y}<extra></extra>"))
+        fig.add_hline(y=threshold, line_dash='dash', line_color='black')
+    return compact(fig)
+
+
+def county_ranking(ranking_df, metric, metric_name, date):
+    return px.bar(ranking_df, x=metric, y='County', orientation='h',
+                  title=f"Counties Ranked by {metric_name} on {date:%Y-%m-%d}", labels={metric: metric_name},
+                  height=max(400, 20 * len(ranking_df))).update_yaxes(autorange='reversed')
@@ -0,0 +1,128 @@
+"""Out-of-process compute pool with single-flight request coalescing.
+
+Expensive analytics are submitted as jobs instead of being run in the Streamlit
+script thread. A job is keyed by (function, arguments, data version): while a
+job is running, every identical request gets the same future, so twenty
+sessions opening the same page cost one computation. Finished results are kept
+(up to ``max_results``) so the polling reruns of a page find them.
+
+Functions are sent to the workers by module and name, so st.cache_data
+loaders can be submitted as they are; each worker keeps its own caches.
+
+While a page runs, Streamlit installs it as sys.modules["__main__"], and a
+spawned process runs its parent's __main__ again on start-up. Workers are
+therefore started with a neutral __main__, so they never run a page (or
+Home.py's warm-up) themselves. A pool whose workers died is replaced on the
+next request.
+"""
+import importlib
+import multiprocessing
+import sys
+import threading
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+from utils.correlation import default_workers
+from utils.data import data_version
+
+_worker_version = None
+
+
+def _init_worker():
+    # Workers run the loaders in bare mode, which warns on every cached call
+    from streamlit import logger
+    logger.set_log_level("error")
+
+
+# Module a worker sees as its parent's __main__: no __file__ or __spec__, so nothing is run on start-up
+_neutral_main = types.ModuleType("__main__")
+_main_lock = threading.Lock()
+
+
+class _WorkerProcess(multiprocessing.get_context("spawn").Process):
+    def start(self):
+        with _main_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = _neutral_main
+            try:
+                super().start()
+            finally:
+                # Unless a script run installed its own page meanwhile
+                if sys.modules["__main__"] is _neutral_main:
+                    sys.modules["__main__"] = main
+
+
+class _WorkerContext(type(multiprocessing.get_context("spawn"))):
+    Process = _WorkerProcess
+
+
+def _call(module, name, args, version):
+    # Runs in the worker: drop the cached datasets if the data files changed since the last job
+    global _worker_version
+    if version != _worker_version:
+        st.cache_data.clear()
+        _worker_version = version
+    return getattr(importlib.import_module(module), name)(*args)
+
+
+class ComputePool:
+    def __init__(self, workers=None, max_results=256):
+        self.max_results = max_results
+        self.requests = 0
+        self.computations = 0
+        self._inflight = {}
+        self._results = OrderedDict()
+        # Re-entrant: a job that is already done runs its callback inside submit
+        self._lock = threading.RLock()
+        self._workers = workers or default_workers
+        self._pool = self._executor()
+
+    def _executor(self):
+        # Spawned rather than forked workers: numba (pulled in by dcor) can deadlock after a fork
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=_WorkerContext(),
+                                   initializer=_init_worker)
+
+    def submit(self, func, *args):
+        # Future of func(*args); joins the identical in-flight job or returns a finished one if there is one
+        version = data_version()
+        key = (func.__module__, func.__qualname__, args, version)
+        with self._lock:
+            self.requests += 1
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+            if key in self._inflight:
+                return self._inflight[key]
+            self.computations += 1
+            try:
+                future = self._pool.submit(_call, func.__module__, func.__qualname__, args, version)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory): its jobs have failed, later ones get a new pool
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._executor()
+                future = self._pool.submit(_call, func.__module__, func.__qualname__, args, version)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f, key=key: self._finish(key, f))
+        return future
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Failed jobs are not kept, the next request retries them
+            if future.exception() is None:
+                self._results[key] = future
+                while len(self._results) > self.max_results:
+                    self._results.popitem(last=False)
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+@st.cache_resource
+def compute_pool():
+    # One pool per server process, shared by every session
+    return ComputePool()
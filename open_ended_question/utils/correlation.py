@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from utils.bootstrap import lag_confidence_bands
+from utils.data import national_df
+from utils.disk_cache import disk_cache
+from utils.lazy import lazy_import
+from utils.mutual_information import lagged_mutual_information
+
+# dcor pulls in numba and is by far the slowest import, so both are deferred to the first correlation
+dcor = lazy_import("dcor")
+stats = lazy_import("scipy.stats")
+
+
+@disk_cache
+def spearmanr_correlation(df1, df2, lags):
+    corrs = []
+    for lag in lags:
+        # Shift df2 without modifying it in place
+        shifted_df2 = df2.shift(-lag)
+
+        # Combine df1 and shifted_df2 into a single DataFrame
+        combined = pd.concat([df1, shifted_df2], axis=1)
+        combined.columns = ['df1', 'df2']
+
+        # Drop rows with NaN values
+        combined = combined.dropna()
+
+        corr, _ = stats.spearmanr(combined['df1'], combined['df2'])
+        corrs.append(corr)
+
+    return corrs
+
+
+@disk_cache
+def dcor_correlation(df1, df2, lags):
+    corrs = []
+    for lag in lags:
+        # Shift df2 without modifying it in place
+        shifted_df2 = df2.shift(-lag)
+
+        # Combine df1 and shifted_df2 into a single DataFrame
+        combined = pd.concat([df1, shifted_df2], axis=1)
+        combined.columns = ['df1', 'df2']
+
+        # Drop rows with NaN values
+        combined = combined.dropna()
+
+        corr = dcor.distance_correlation(combined['df1'], combined['df2'])
+        corrs.append(corr)
+
+    return corrs
+
+
+def ksg_mutual_information(df1, df2, lags):
+    # Nonlinear dependence for every lag in O(n log n) each, rather than dcor's O(n^2)
+    return lagged_mutual_information(df1, df2, list(lags))
+
+
+# Indicators analysed on the economic support page, with the measure used for each
+lag_analyses = [
+    ("spearman", "E1_Income support"),
+    ("spearman", "E2_Debt/contract relief"),
+    ("dcor", "E3_Fiscal measures Per 100K Population"),
+    ("dcor", "E4_International support Per 100K Population"),
+]
+default_lags = tuple(range(0, 481, 60))
+default_resamples = 1000
+default_block_length = 28
+default_workers = os.cpu_count() or 1
+
+# Indicators whose mutual information with the lagged outcomes is plotted, over a finer grid of lags
+information_analyses = [index for _, index in lag_analyses]
+information_lags = tuple(range(0, 481, 5))
+
+correlation_methods = {
+    "spearman": spearmanr_correlation,
+    "dcor": dcor_correlation,
+    "ksg": ksg_mutual_information,
+}
+
+
+@st.cache_data
+def lagged_correlations(country, selected_index, outcome, lags, method):
+    df = national_df(country)
+    corrs = correlation_methods[method](df[selected_index], df[outcome], list(lags))
+    return pd.DataFrame({"Lag": list(lags), "Correlation": corrs})
+
+
+@st.cache_data
+@disk_cache
+def correlation_bands(country, selected_index, outcome, lags, method, n_resamples, block_length, workers):
+    df = national_df(country)
+    return lag_confidence_bands(df[selected_index], df[outcome], list(lags), method=method,
+                                n_resamples=n_resamples, block_length=block_length, workers=workers)
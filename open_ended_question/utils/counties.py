@@ -0,0 +1,110 @@
+"""Romanian counties as a precomputed county x date x metric cube.
+
+The county table of the Romania feed (close_ended_question/romania_stream.py
+--county) has one row per county and reporting day. The cube is built from it
+once per data version: every county and every day of the feed on one axis each,
+cumulative cases carried over days a county did not report, and every metric
+derived for all counties at once as whole-array operations. Selecting counties,
+changing the date range or ranking the counties are then slices and one sort of
+the cube, not filtered copies of the table. Write the county table into data/
+from the repository root:
+
+    python close_ended_question/romania_stream.py --county open_ended_question/data/romania_county.csv
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import DATA_DIR
+
+county_file = "romania_county.csv"
+rolling_days = 7
+# Cases per 1,000 persons the close-ended question marks
+threshold_per_1000 = 3
+
+# Metric -> display name
+metrics = {
+    "total_cases": "Total Cases",
+    "new_cases": "New Cases",
+    "new_cases_7d": f"New Cases ({rolling_days}-Day Average)",
+    "cases_per_1000": "Cases per 1,000 Persons",
+    "new_cases_per_1000": "New Cases per 1,000 Persons",
+    "new_cases_per_1000_7d": f"New Cases per 1,000 Persons ({rolling_days}-Day Average)",
+}
+
+
+def _rolling_mean(values):
+    # Trailing rolling_days mean along the date axis (1) of a (counties, dates) array
+    total = np.cumsum(values, axis=1)
+    total[:, rolling_days:] = total[:, rolling_days:] - total[:, :-rolling_days]
+    return total / np.minimum(np.arange(1, values.shape[1] + 1), rolling_days)
+
+
+class CountyCube:
+    # counties (names), population and dates, with values a (counties, dates, metrics) array in the order of metrics
+
+    def __init__(self, county_df):
+        df = county_df.dropna(subset=['county_name', 'reporting_date'])
+        county_codes, self.counties = pd.factorize(df['county_name'], sort=True)
+        dates = pd.to_datetime(df['reporting_date'])
+        self.dates = pd.date_range(dates.min(), dates.max())
+        date_codes = (dates - self.dates[0]).dt.days.to_numpy()
+        self.population = df.groupby(county_codes)['county_population'].max() \
+            .reindex(range(len(self.counties))).to_numpy(dtype=float)
+
+        total = np.full((len(self.counties), len(self.dates)), np.nan)
+        total[county_codes, date_codes] = pd.to_numeric(df['total_cases'], errors='coerce').to_numpy()
+        # Carry each county's last report over the days it is missing, 0 before its first
+        reported = ~np.isnan(total)
+        filled = np.where(reported, np.arange(len(self.dates)), 0)
+        np.maximum.accumulate(filled, axis=1, out=filled)
+        total = np.nan_to_num(np.take_along_axis(total, filled, axis=1))
+        # A county's first report is its total so far, not one day's cases, so it counts as 0 new cases, as in
+        # rt.daily_incidence; corrections are clipped to 0
+        new = np.diff(total, axis=1, prepend=total[:, :1]).clip(min=0)
+        new[np.arange(len(self.counties)), reported.argmax(axis=1)] = 0
+        # Counties without a known population get NaN rates rather than inf
+        known = np.isfinite(self.population) & (self.population > 0)
+        per_1000 = np.where(known, 1000 / np.where(known, self.population, 1), np.nan)[:, None]
+        columns = {
+            "total_cases": total,
+            "new_cases": new,
+            "new_cases_7d": _rolling_mean(new),
+            "cases_per_1000": total * per_1000,
+            "new_cases_per_1000": new * per_1000,
+            "new_cases_per_1000_7d": _rolling_mean(new) * per_1000,
+        }
+        self.values = np.stack([columns[metric] for metric in metrics], axis=-1).astype(np.float32)
+
+    def _date_slice(self, start=None, end=None):
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return slice(first, last)
+
+    def series(self, counties, metric, start=None, end=None):
+        # Long frame of County, Date and the metric for the counties over start..end
+        rows = self.counties.get_indexer(counties)
+        days = self._date_slice(start, end)
+        values = self.values[rows, days, list(metrics).index(metric)]
+        return pd.DataFrame({"County": np.repeat(self.counties[rows], values.shape[1]),
+                             "Date": np.tile(self.dates[days], len(rows)),
+                             metric: values.ravel()})
+
+    def ranking(self, metric, date=None):
+        # Every county's metric on a date (the last one by default), highest first
+        day = len(self.dates) - 1 if date is None else self._date_slice(None, date).stop - 1
+        values = self.values[:, day, list(metrics).index(metric)]
+        order = np.argsort(-values, kind="stable")
+        return pd.DataFrame({"County": self.counties[order], metric: values[order]})
+
+
+@st.cache_resource
+def county_cube(version):
+    # Cube of the county table in data/, or None if it has not been written. Keyed by the data version,
+    # so a new county table builds a new cube.
+    path = os.path.join(DATA_DIR, county_file)
+    if not os.path.isfile(path):
+        return None
+    return CountyCube(pd.read_csv(path))
@@ -0,0 +1,266 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.disk_cache import disk_cache
+from utils.lazy import lazy_import
+
+requests = lazy_import("requests")
+
+DATA_DIR = "./data"
+
+# National extracts and the population used to scale them per 100K
+COUNTRIES = {
+    "US": {"file": "OxCGRT_fullwithnotes_USA_v1.csv", "population": 331_000_000},
+    "Canada": {"file": "OxCGRT_fullwithnotes_CAN_v1.csv", "population": 38_000_000},
+}
+
+# Columns that must be present for a day to be kept on the overall and index pages
+national_case_columns = ('Date', 'ConfirmedCases', 'ConfirmedDeaths')
+national_index_columns = national_case_columns + ('GovernmentResponseIndex_WeightedAverage',
+                                                  'StringencyIndex_WeightedAverage',
+                                                  'ContainmentHealthIndex_WeightedAverage', 'EconomicSupportIndex')
+
+# Spending indicators that are reported in USD and scaled to per 100K population
+index_to_scale = [
+    "E3_Fiscal measures",
+    "E4_International support",
+    "H4_Emergency investment in healthcare",
+    "H5_Investment in vaccines"
+]
+
+# Population data for each U.S. state
+state_population = {
+    'AL': 5024279, 'AK': 733391, 'AZ': 7151502, 'AR': 3011524, 'CA': 39538223,
+    'CO': 5773714, 'CT': 3605944, 'DE': 989948, 'FL': 21538187, 'GA': 10711908,
+    'HI': 1455271, 'ID': 1839106, 'IL': 12812508, 'IN': 6785528, 'IA': 3190369,
+    'KS': 2937880, 'KY': 4505836, 'LA': 4657757, 'ME': 1362359, 'MD': 6177224,
+    'MA': 7029917, 'MI': 10077331, 'MN': 5706494, 'MS': 2961279, 'MO': 6154913,
+    'MT': 1084225, 'NE': 1961504, 'NV': 3104614, 'NH': 1377529, 'NJ': 9288994,
+    'NM': 2117522, 'NY': 20201249, 'NC': 10439388, 'ND': 779094, 'OH': 11799448,
+    'OK': 3959353, 'OR': 4237256, 'PA': 13002700, 'RI': 1097379, 'SC': 5118425,
+    'SD': 886667, 'TN': 6910840, 'TX': 29145505, 'UT': 3271616, 'VT': 643077,
+    'VA': 8631393, 'WA': 7693612, 'WV': 1793716, 'WI': 5893718, 'WY': 576851
+}
+
+# Map state codes to state names
+state_codes = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
+
+# Population data for Canadian provinces (estimates)
+province_population = {
+    'AB': 4413146, 'BC': 5110917, 'MB': 1377517, 'NB': 789225, 'NL': 521365,
+    'NS': 979351, 'NT': 45161, 'NU': 39097, 'ON': 14734014, 'PE': 164318,
+    'QC': 8537674, 'SK': 1177884, 'YT': 42176
+}
+
+# Map province codes to province names
+province_codes = {
+    'AB': 'Alberta',
+    'BC': 'British Columbia',
+    'MB': 'Manitoba',
+    'NB': 'New Brunswick',
+    'NL': 'Newfoundland and Labrador',
+    'NS': 'Nova Scotia',
+    'NT': 'Northwest Territories',
+    'NU': 'Nunavut',
+    'ON': 'Ontario',
+    'PE': 'Prince Edward Island',
+    'QC': 'Quebec',
+    'SK': 'Saskatchewan',
+    'YT': 'Yukon'
+}
+
+# Regional extracts: code prefix to strip, populations, display names and map column
+REGIONS = {
+    "US": {"prefix": "US_", "population": state_population, "names": state_codes, "name_column": "StateName"},
+    "Canada": {"prefix": "CAN_", "population": province_population, "names": province_codes,
+               "name_column": "ProvinceName"},
+}
+
+us_geojson_url = 'https://raw.githubusercontent.com/PublicaMundi/MappingAPI/master/data/geojson/us-states.json'
+canada_geojson_url = 'https://raw.githubusercontent.com/codeforgermany/click_that_hood/main/public/data/canada.geojson'
+
+# Populations used by the vaccination analysis, and the iso_code of each country in vaccinations.csv
+VACCINATION_POPULATION = {"USA": 346000000, "CAN": 41000000}
+vaccination_iso_codes = {"US": "USA", "Canada": "CAN"}
+vaccination_cutoff_date = pd.to_datetime("2023-05-09 00:00:00")
+
+
+def data_version():
+    # Size and modification time of every data file, so results computed from replaced files are not reused
+    versions = []
+    for name in sorted(os.listdir(DATA_DIR)):
+        path = os.path.join(DATA_DIR, name)
+        # Directories hold derived stores (data/parquet), not source data
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            versions.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(versions)
+
+
+@st.cache_data
+def read_oxcgrt(country):
+    return pd.read_csv(os.path.join(DATA_DIR, COUNTRIES[country]["file"]))
+
+
+@st.cache_data
+def read_vaccinations():
+    return pd.read_csv(os.path.join(DATA_DIR, "vaccinations.csv"))
+
+
+def add_daily_rates(df, population):
+    # Daily increments of the cumulative counts, negatives (data corrections) clipped to 0
+    df['DailyCaseRate'] = df['ConfirmedCases'].diff().fillna(0).clip(lower=0) / population * 100_000
+    df['DailyDeathRate'] = df['ConfirmedDeaths'].diff().fillna(0).clip(lower=0) / population * 100_000
+    return df
+
+
+@st.cache_data
+def national_df(country, dropna_columns=None):
+    # NAT_TOTAL rows of one country, with per 100K cumulative counts, daily rates and scaled spending.
+    # dropna_columns drops incomplete days before the daily rates are taken, as each page did.
+    population = COUNTRIES[country]["population"]
+    df = read_oxcgrt(country)
+    df = df[df['Jurisdiction'] == "NAT_TOTAL"]
+    if dropna_columns:
+        df = df.dropna(subset=list(dropna_columns))
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+    df['CasesPerCapita'] = df['ConfirmedCases'] / population * 100_000
+    df['DeathsPerCapita'] = df['ConfirmedDeaths'] / population * 100_000
+    df['Country'] = country
+    df = add_daily_rates(df, population)
+    for idx in index_to_scale:
+        df[idx + " Per 100K Population"] = df[idx] / population * 100_000
+    return df
+
+
+def combined_national(dropna_columns=None, labels=None):
+    # U.S. and Canada national frames stacked, optionally relabelling the Country column
+    labels = labels or {}
+    frames = [national_df(country, dropna_columns).assign(Country=labels.get(country, country))
+              for country in COUNTRIES]
+    return pd.concat(frames)
+
+
+@st.cache_data
+@disk_cache
+def regional_df(country):
+    # State / province rows with cumulative counts per 100K of the region's population
+    info = REGIONS[country]
+    df = read_oxcgrt(country)
+    df = df[['RegionCode', 'Date', 'ConfirmedCases', 'ConfirmedDeaths']].dropna()
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+    df['RegionCode'] = df['RegionCode'].str[len(info["prefix"]):]
+    population = df['RegionCode'].map(info["population"]).fillna(1)
+    df['CasesPer100K'] = df['ConfirmedCases'] / population * 100000
+    df['DeathsPer100K'] = df['ConfirmedDeaths'] / population * 100000
+    df[info["name_column"]] = df['RegionCode'].map(info["names"])
+    return df
+
+
+@st.cache_data
+def jurisdiction_df(country):
+    # National and state / province rows of one country, each with its own population: region codes without
+    # the country prefix ("" for the nation), daily rates and scaled spending per 100K of that jurisdiction
+    info = REGIONS[country]
+    df = read_oxcgrt(country)
+    df = df[df['Jurisdiction'].isin(["NAT_TOTAL", "STATE_TOTAL"])].copy()
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y%m%d')
+    df['Country'] = country
+    df['RegionCode'] = df['RegionCode'].str[len(info["prefix"]):].fillna("")
+    df['Population'] = np.where(df['Jurisdiction'] == "NAT_TOTAL", COUNTRIES[country]["population"],
+                                df['RegionCode'].map(info["population"]))
+    df = df.sort_values(['RegionCode', 'Date'], kind="stable")
+    grouped = df.groupby('RegionCode', sort=False)
+    # Daily increments per jurisdiction, negatives clipped to 0 as in add_daily_rates
+    df['DailyCaseRate'] = grouped['ConfirmedCases'].diff().fillna(0).clip(lower=0) / df['Population'] * 100_000
+    df['DailyDeathRate'] = grouped['ConfirmedDeaths'].diff().fillna(0).clip(lower=0) / df['Population'] * 100_000
+    for idx in index_to_scale:
+        df[idx + " Per 100K Population"] = df[idx] / df['Population'] * 100_000
+    return df.reset_index(drop=True)
+
+
+@st.cache_data
+def us_geojson():
+    geojson = requests.get(us_geojson_url).json()
+    for feature in geojson['features']:
+        feature['properties']['StateName'] = feature['properties']['name']
+    return geojson
+
+
+@st.cache_data
+def canada_geojson():
+    geojson = requests.get(canada_geojson_url).json()
+    for feature in geojson['features']:
+        feature['properties']['ProvinceName'] = feature['properties']['name']
+    return geojson
+
+
+def replace_trailing_zeros_with_last_nonzero(df, column):
+    last_nonzero = df[column].replace(0, pd.NA).ffill().iloc[-1]
+    df[column] = df[column].replace(0, pd.NA).ffill().fillna(last_nonzero)
+    return df
+
+
+@st.cache_data
+def vaccination_df(iso_code):
+    population = VACCINATION_POPULATION[iso_code]
+    all_vaccinations_data_df = read_vaccinations()
+    df = all_vaccinations_data_df[all_vaccinations_data_df["iso_code"] == iso_code].copy()
+    df.reset_index(inplace=True, drop=True)
+    df.fillna(0, inplace=True)
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    df = df.loc[df["date"] < vaccination_cutoff_date]
+    df = replace_trailing_zeros_with_last_nonzero(df, "people_fully_vaccinated")
+    df = replace_trailing_zeros_with_last_nonzero(df, "total_vaccinations")
+    # replace(0, pd.NA) leaves object columns, which the rollups and charts cannot aggregate
+    df = df.astype({"people_fully_vaccinated": "float64", "total_vaccinations": "float64"})
+    df["cumulative_people_vaccinated"] = df["daily_people_vaccinated"].cumsum()
+    df["percent_people_vaccinated"] = df["cumulative_people_vaccinated"] / population * 100
+    df["percent_people_fully_vaccinated"] = df["people_fully_vaccinated"] / population * 100
+    df["vaccine_administered_per_people"] = df["total_vaccinations"] / df["cumulative_people_vaccinated"]
+    return df
+
+
+@st.cache_data
+def combined_vaccinations():
+    # Both countries with the first 15 days dropped, as plotted on the vaccination page
+    combined_vac_df = pd.concat([vaccination_df("USA"), vaccination_df("CAN")])
+    return combined_vac_df.groupby("iso_code").tail(-15)
+
+
+@st.cache_data
+def vaccination_status_df(country, index):
+    # Long format of <index>_NonVaccinated / <index>_Vaccinated for one country's NAT_TOTAL rows,
+    # e.g. index="GovernmentResponseIndex" gives a government_response_index value column
+    policy_df = read_oxcgrt(country)
+    policy_df = policy_df[policy_df["Jurisdiction"] == "NAT_TOTAL"].copy()
+    policy_df["date"] = pd.to_datetime(policy_df["Date"], format="%Y%m%d")
+    policy_df.reset_index(drop=True, inplace=True)
+    value_name = {"GovernmentResponseIndex": "government_response_index",
+                  "ContainmentHealthIndex": "containment_health_index"}[index]
+    melted = pd.melt(
+        policy_df,
+        id_vars=["date"],
+        value_vars=[f"{index}_NonVaccinated", f"{index}_Vaccinated"],
+        var_name="vaccination_status",
+        value_name=value_name,
+    )
+    melted["vaccination_status"] = melted["vaccination_status"].replace(
+        {f"{index}_NonVaccinated": "Not Vaccinated", f"{index}_Vaccinated": "Vaccinated"}
+    )
+    return melted
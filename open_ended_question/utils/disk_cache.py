@@ -0,0 +1,235 @@
+"""Persistent on-disk cache of expensive results, shared by processes and restarts.
+
+st.cache_data lives in the server process, so every deploy or restart starts
+cold. Functions decorated with @disk_cache also keep their results in
+data/cache/, under a hash of
+
+    the data version   size and modification time of every data file (utils.data.data_version)
+    the function       module, name, a hash of the source of its module and of every module
+                       of the package it uses, directly or through another, plus an optional
+                       version
+    the arguments      pickled, so Series and frames are hashed by content
+
+so a result is never served for other data, other code or other arguments.
+A change to a helper in another module (e.g. utils.bootstrap behind the
+correlation bands) changes the key as well.
+Setting the DISK_CACHE environment variable to "off" bypasses the cache, in
+this process and in the workers it spawns, e.g. for timings.
+Entries are zlib-compressed pickles. Writers write to a temporary file and
+rename it into place, so a reader sees a whole entry or none, and any number of
+processes (server, compute pool workers, the prerender) can share the
+directory. A hit refreshes the entry's modification time; when the directory
+grows past max_bytes the least recently used entries are removed. Run from the
+open_ended_question directory:
+
+    python -m utils.disk_cache            # entries and size
+    python -m utils.disk_cache --clear
+"""
+import argparse
+import functools
+import hashlib
+import importlib
+import os
+import pickle
+import sys
+import tempfile
+import time
+import types
+import zlib
+
+default_max_bytes = 512 * 2 ** 20
+# Eviction goes down to this share of the cap so it does not run on every write
+evict_to = 0.8
+# Temporary files older than this were left by a writer that died
+stale_seconds = 3600
+suffix = ".pkl.z"
+# Environment variable that turns the cache off when set to "off"
+switch_variable = "DISK_CACHE"
+
+
+def _data():
+    # utils.data itself uses disk_cache, so it is imported on first use
+    from utils import data
+    return data
+
+
+class DiskCache:
+    def __init__(self, directory=None, max_bytes=default_max_bytes):
+        self._directory = directory
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._bytes = None  # this process's estimate of the directory size, refreshed by every scan
+
+    @property
+    def directory(self):
+        return self._directory or os.path.join(_data().DATA_DIR, "cache")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def get(self, key):
+        # (True, value) for a stored entry, (False, None) otherwise
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Unreadable entry (e.g. written by an incompatible library version, or holding a class that has
+            # moved since): recompute and overwrite it
+            self.misses += 1
+            return False, None
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        # Best effort: a cache that cannot be written only costs the recomputation
+        path = self._path(key)
+        try:
+            data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+                f.write(data)
+            os.replace(f.name, path)
+        except OSError:
+            return
+        if self._bytes is None:
+            self._scan()
+        else:
+            self._bytes += len(data)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def _scan(self):
+        # [(mtime, size, path)] of every entry, oldest first; stale temporary files are removed on the way
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith(".tmp") and now - stat.st_mtime > stale_seconds:
+                        os.remove(path)
+                    elif name.endswith(suffix):
+                        entries.append((stat.st_mtime, stat.st_size, path))
+                except FileNotFoundError:
+                    pass  # removed by another process meanwhile
+        entries.sort()
+        self._bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def evict(self):
+        # Remove the least recently used entries until the directory is under evict_to of the cap
+        entries = self._scan()
+        for _, size, path in entries:
+            if self._bytes <= self.max_bytes * evict_to:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._bytes -= size
+
+    def stats(self):
+        entries = self._scan()
+        return {"entries": len(entries), "bytes": self._bytes,
+                "oldest": min((mtime for mtime, _, _ in entries), default=None)}
+
+    def clear(self):
+        for _, _, path in self._scan():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._bytes = 0
+
+
+cache = DiskCache()
+
+
+def enabled():
+    # Read on every call, so setting the variable takes effect without re-importing
+    return os.environ.get(switch_variable, "on") != "off"
+
+
+def code_hash(module_name):
+    # Hash of the source of a module and of every module of its package it reaches through its globals
+    # (imported modules, lazily imported ones included, and imported functions, classes and constants)
+    package = module_name.partition(".")[0]
+    seen, pending = set(), [module_name]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        for value in vars(importlib.import_module(name)).values():
+            owner = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, "__module__", None)
+            if isinstance(owner, str) and owner.partition(".")[0] == package and owner not in seen:
+                pending.append(owner)
+    digest = hashlib.sha256()
+    for name in sorted(seen):
+        with open(sys.modules[name].__file__, "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def _key(func, code, args, kwargs):
+    # Hash of the data version, the function and its arguments
+    payload = pickle.dumps((func.__module__, func.__qualname__, code, _data().data_version(), args,
+                            sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def disk_cache(func=None, *, version=None):
+    # Decorator: results of func kept in the disk cache; bump version when func's behaviour changes without
+    # any source of its package changing (e.g. a library upgrade)
+    def decorate(func):
+        code = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal code
+            if not enabled():
+                return func(*args, **kwargs)
+            # Taken on the first call rather than at decoration, when func's module is still being imported
+            if code is None:
+                code = f"{code_hash(func.__module__)}:{version}"
+            try:
+                key = _key(func, code, args, kwargs)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return func(*args, **kwargs)  # arguments that cannot be hashed are not cached
+            hit, value = cache.get(key)
+            if not hit:
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report or clear the on-disk result cache.")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+    if args.clear:
+        cache.clear()
+    stats = cache.stats()
+    oldest = time.strftime("%Y-%m-%d %H:%M", time.localtime(stats["oldest"])) if stats["oldest"] else "-"
+    print(f"{cache.directory}: {stats['entries']} entries, {stats['bytes'] / 2 ** 20:.1f} MB of "
+          f"{cache.max_bytes / 2 ** 20:.0f} MB, least recently used {oldest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Clustering of the states and provinces by their C1E-H8E policy trajectories.
+
+The distance between two regions is the band-constrained dynamic time warping
+(DTW) distance between their daily trajectories of the 20 indicators, each
+scaled to 0-1. A day may be matched to days at most band_days away. The
+distances feed a k-medoids clustering, and not every distance is needed:
+
+- LB_Keogh bounds every pair from below. It is the distance of one trajectory
+  to the band's min / max envelope of the other, for all pairs in a few array
+  operations.
+- A pair's DTW is only computed when its bound could beat the best distance
+  found so far. That happens when assigning regions to the nearest medoid and
+  when choosing each cluster's medoid.
+- The DTW of the pairs that are needed is computed by walking the
+  anti-diagonals of the banded cost matrices of many pairs at once. Chunks of
+  pairs run on a thread pool.
+
+Computed distances are kept per data version and band, so re-clustering with
+another number of clusters only adds the pairs it is missing. Run from the
+open_ended_question directory for timings against the full matrix:
+
+    python -m utils.dtw
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.data import REGIONS, data_version
+from utils.indicators import index_columns
+from utils.panel import jurisdiction_panel
+
+# C1E_School closing ... H8E_Protection of elderly people
+policy_indicators = index_columns[:20]
+default_band_days = 14
+default_clusters = 4
+chunk_pairs = 128
+default_workers = os.cpu_count() or 1
+
+
+def trajectories():
+    # Regions as (country, region code) and their (regions, days, indicators) trajectories, each indicator
+    # divided by its largest value anywhere so ordinal levels and spending weigh the same
+    units, _, values = jurisdiction_panel(tuple(policy_indicators))
+    keep = [i for i, (_, region) in enumerate(units) if region]
+    x = values[keep]
+    scale = x.max(axis=(0, 2), keepdims=True)
+    x = x / np.where(scale > 0, scale, 1)
+    return [units[i] for i in keep], np.ascontiguousarray(x.transpose(0, 2, 1))
+
+
+def envelopes(x, band):
+    # Lower / upper envelope of every trajectory: min and max of each indicator within band days of each day
+    padded = np.pad(x, ((0, 0), (band, band), (0, 0)), mode="edge")
+    windows = sliding_window_view(padded, 2 * band + 1, axis=1)
+    return windows.min(axis=-1), windows.max(axis=-1)
+
+
+def lb_keogh(x, lower, upper):
+    # Symmetric LB_Keogh matrix: squared distance of each trajectory to the other's envelope, the larger of
+    # the two directions. Never more than the (squared) DTW distance of the pair.
+    bound = np.empty((len(x), len(x)))
+    for b in range(len(x)):
+        excess = np.maximum(x - upper[b], 0) + np.maximum(lower[b] - x, 0)
+        bound[:, b] = np.einsum('rnf,rnf->r', excess, excess)
+    return np.maximum(bound, bound.T)
+
+
+def _diagonals(n, band):
+    # For every anti-diagonal d = i + j of the n x n grid, the cells (i, k = j - i + band) of the band it
+    # crosses, indexed by m = i - j + band, and inf where that cell is off the band or the grid
+    d = np.arange(2 * n - 1)[:, None]
+    m = np.arange(2 * band + 1)[None, :]
+    twice_i = d + m - band
+    i, j = twice_i // 2, d - twice_i // 2
+    valid = (twice_i % 2 == 0) & (i >= 0) & (i < n) & (j >= 0) & (j < n)
+    return np.where(valid, i, 0), np.where(valid, 2 * band - m, 0), np.where(valid, 0, np.inf)
+
+
+def dtw_batch(x, pairs, band):
+    # Squared DTW distance of each (a, b) pair of trajectories, all pairs walked together
+    a, b = x[pairs[:, 0]], x[pairs[:, 1]]
+    n = a.shape[1]
+    # Banded cost: cost[p, i, k] = |a_i - b_(i+k-band)|^2
+    padded = np.pad(b, ((0, 0), (band, band), (0, 0)))
+    windows = sliding_window_view(padded, 2 * band + 1, axis=1)
+    norms = sliding_window_view(np.pad(np.einsum('pnf,pnf->pn', b, b), ((0, 0), (band, band))), 2 * band + 1,
+                                axis=1)
+    cost = np.einsum('pnf,pnf->pn', a, a)[..., None] + norms - 2 * np.einsum('pnf,pnfk->pnk', a, windows)
+    np.maximum(cost, 0, out=cost)
+
+    # Anti-diagonal d needs d - 1 (the cells left of and above it) and d - 2 (the cell diagonally before),
+    # kept with an inf border so the shifted neighbours are plain slices
+    rows, cols, off = _diagonals(n, band)
+    width = 2 * band + 1
+    before, last, current = np.full((3, len(pairs), width + 2), np.inf)
+    before[:, band + 1] = 0
+    best = np.empty((len(pairs), width))
+    for d in range(2 * n - 1):
+        np.minimum(before[:, 1:-1], last[:, :-2], out=best)
+        np.minimum(best, last[:, 2:], out=best)
+        best += off[d]
+        np.add(cost[:, rows[d], cols[d]], best, out=current[:, 1:-1])
+        before, last, current = last, current, before
+    return last[:, band + 1]
+
+
+class PrunedDistances:
+    # DTW distances between the regions, computed only when asked for and kept
+
+    def __init__(self, x, band, workers=default_workers):
+        self.x, self.band, self.workers = x, band, workers
+        self.bound = lb_keogh(x, *envelopes(x, band))
+        self.exact = np.full(self.bound.shape, np.nan)
+        np.fill_diagonal(self.exact, 0)
+        self._lock = threading.Lock()
+
+    def compute(self, rows, cols):
+        # Fill in the exact distances of the (rows[i], cols[i]) pairs that are still missing
+        with self._lock:
+            pairs = np.unique(np.sort(np.column_stack([rows, cols]), axis=1), axis=0)
+            pairs = pairs[np.isnan(self.exact[pairs[:, 0], pairs[:, 1]])]
+            if not len(pairs):
+                return
+            chunks = [pairs[i:i + chunk_pairs] for i in range(0, len(pairs), chunk_pairs)]
+            if self.workers == 1 or len(chunks) == 1:
+                results = [dtw_batch(self.x, chunk, self.band) for chunk in chunks]
+            else:
+                # The array kernels release the GIL, so chunks of pairs run side by side on threads
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    results = list(pool.map(lambda chunk: dtw_batch(self.x, chunk, self.band), chunks))
+            distances = np.concatenate(results)
+            self.exact[pairs[:, 0], pairs[:, 1]] = self.exact[pairs[:, 1], pairs[:, 0]] = distances
+
+    def computed_fraction(self):
+        n = len(self.exact)
+        return (np.isfinite(self.exact).sum() - n) / (n * (n - 1))
+
+    def nearest(self, medoids):
+        # Exact nearest medoid of every region and its distance. Each region's distance to the medoid with the
+        # smallest bound is computed first; only medoids whose bound is below it can still be nearer.
+        regions = np.arange(len(self.x))
+        bound = self.bound[:, medoids]
+        first = medoids[bound.argmin(axis=1)]
+        self.compute(regions, first)
+        best = self.exact[regions, first]
+        rows, cols = np.nonzero(bound < best[:, None])
+        self.compute(rows, medoids[cols])
+        distances = np.where(bound < best[:, None], self.exact[:, medoids], np.inf)
+        distances[regions, bound.argmin(axis=1)] = best
+        return distances.argmin(axis=1), distances.min(axis=1)
+
+    def medoids(self, labels, current, batch=4):
+        # Member of each cluster with the smallest total distance to the others. Members are tried in order of
+        # their summed bounds, a few per cluster per round so one batch covers every cluster; a member whose
+        # bounds already sum past its cluster's best total is never computed.
+        clusters = [np.flatnonzero(labels == c) for c in range(len(current))]
+        best = current.copy()
+        totals = np.array([self.exact[m, members].sum() for m, members in zip(current, clusters)])
+        known = np.where(np.isnan(self.exact), self.bound, self.exact)
+        queues = [members[np.argsort(known[np.ix_(members, members)].sum(axis=1))] for members in clusters]
+        while True:
+            tried = []
+            for c, (members, queue) in enumerate(zip(clusters, queues)):
+                queue = queue[known[np.ix_(queue, members)].sum(axis=1) < totals[c]]
+                tried.append(queue[:batch])
+                queues[c] = queue[batch:]
+            if not any(len(candidates) for candidates in tried):
+                return best
+            rows = [np.repeat(candidates, len(members)) for candidates, members in zip(tried, clusters)]
+            cols = [np.tile(members, len(candidates)) for candidates, members in zip(tried, clusters)]
+            self.compute(np.concatenate(rows), np.concatenate(cols))
+            known = np.where(np.isnan(self.exact), self.bound, self.exact)
+            for c, (candidates, members) in enumerate(zip(tried, clusters)):
+                for candidate in candidates:
+                    total = self.exact[candidate, members].sum()
+                    if total < totals[c]:
+                        best[c], totals[c] = candidate, total
+
+
+def k_medoids(distances, n_clusters, max_iterations=30):
+    # Alternating k-medoids from a farthest-first start: assign every region to its nearest medoid,
+    # move each medoid to the centre of its cluster, until nothing moves
+    medoids = np.array([distances.bound.sum(axis=1).argmin()])
+    while len(medoids) < n_clusters:
+        _, nearest = distances.nearest(medoids)
+        medoids = np.append(medoids, nearest.argmax())
+    for _ in range(max_iterations):
+        labels, _ = distances.nearest(medoids)
+        moved = distances.medoids(labels, medoids)
+        if np.array_equal(moved, medoids):
+            break
+        medoids = moved
+    labels, nearest = distances.nearest(medoids)
+    return medoids, labels, nearest
+
+
+@st.cache_resource
+def distance_store(band_days, version):
+    # Distances computed so far for one band and data version, shared by every session and cluster count
+    _, x = trajectories()
+    return PrunedDistances(x, band_days)
+
+
+@st.cache_data
+def policy_clusters(n_clusters=default_clusters, band_days=default_band_days, version=None):
+    # Cluster of every state / province, numbered by size, with its DTW distance to the cluster's medoid
+    units, x = trajectories()
+    distances = distance_store(band_days, version or data_version())
+    medoids, labels, nearest = k_medoids(distances, n_clusters)
+    ranks = np.argsort(np.argsort(-np.bincount(labels, minlength=n_clusters), kind="stable"))
+    df = pd.DataFrame({
+        "Country": [country for country, _ in units],
+        "RegionCode": [region for _, region in units],
+        "Cluster": (ranks[labels] + 1).astype(str),
+        "Medoid": np.isin(np.arange(len(units)), medoids),
+        "DTW distance to medoid": np.sqrt(nearest),
+        "Mean policy level": x.mean(axis=(1, 2)),
+    })
+    return df, distances.computed_fraction()
+
+
+def country_clusters(clusters, country):
+    # Clusters of one country's regions, named as on the maps
+    info = REGIONS[country]
+    df = clusters[clusters["Country"] == country]
+    return df.assign(**{info["name_column"]: df["RegionCode"].map(info["names"])})
+
+
+@st.cache_data
+def cluster_trajectories(n_clusters=default_clusters, band_days=default_band_days, version=None):
+    # Daily mean level of the scaled indicators, averaged over the regions of each cluster
+    clusters, _ = policy_clusters(n_clusters, band_days, version)
+    _, dates, _ = jurisdiction_panel(tuple(policy_indicators))
+    _, x = trajectories()
+    levels = pd.DataFrame(x.mean(axis=2).T, index=dates)
+    means = levels.T.groupby(clusters["Cluster"].to_numpy()).mean().T
+    return means.rename_axis("Date").reset_index().melt(id_vars="Date", var_name="Cluster",
+                                                        value_name="Mean policy level")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pruned DTW clustering against the full matrix.")
+    parser.add_argument("--clusters", type=int, default=default_clusters)
+    parser.add_argument("--band", type=int, default=default_band_days, help="DTW band (days)")
+    parser.add_argument("--workers", type=int, default=default_workers, help="DTW threads")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    units, x = trajectories()
+    print(f"{len(units)} regions x {x.shape[1]} days x {x.shape[2]} indicators, band {args.band} days")
+    start = time.perf_counter()
+    distances = PrunedDistances(x, args.band, args.workers)
+    print(f"LB_Keogh matrix: {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    _, labels, _ = k_medoids(distances, args.clusters)
+    print(f"pruned k-medoids: {time.perf_counter() - start:.2f}s, "
+          f"{distances.computed_fraction():.0%} of the pairs' DTW computed")
+
+    start = time.perf_counter()
+    full = PrunedDistances(x, args.band, args.workers)
+    full.compute(*np.triu_indices(len(units), 1))
+    print(f"full DTW matrix: {time.perf_counter() - start:.2f}s")
+    _, full_labels, _ = k_medoids(full, args.clusters)
+    print(f"same clusters as with the full matrix: {np.array_equal(labels, full_labels)}; "
+          f"bound never above DTW: {bool((full.bound <= full.exact + 1e-9).all())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Short-term forecasts of the daily case rate of every nation, state and province.
+
+Each jurisdiction gets a damped-trend exponential smoothing model, ETS(A,Ad,N),
+of its 7-day average DailyCaseRate (the raw daily counts follow the weekly
+reporting cycle). Models are not objects per region: the smoothing recursion
+runs once over a (parameter grid, jurisdictions) array, and each jurisdiction
+keeps the parameters with the smallest one-step errors over the last
+fit_days. The fitted models are kept with the state after their last day. When
+the data grows by new days only those days are run through the recursion, and
+the parameters are searched again after refit_after new days. Run from the
+open_ended_question directory for timings:
+
+    python -m utils.forecast
+"""
+import argparse
+import itertools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.panel import jurisdiction_panel
+
+horizon = 14
+smoothing_days = 7
+fit_days = 120
+refit_after = 7
+
+# Candidate (alpha, beta, phi): level and trend smoothing and trend damping
+alphas = [0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
+betas = [0.0, 0.01, 0.05, 0.1, 0.2]
+phis = [0.8, 0.9, 0.95, 0.98]
+parameter_grid = np.array([(a, b, p) for a, b, p in itertools.product(alphas, betas, phis) if b <= a])
+
+# Two-sided prediction interval -> normal quantile
+interval_levels = {80: 1.2816, 95: 1.9600}
+
+
+def smoothed_rates(values):
+    # Trailing 7-day mean of each row, the first days averaging what is available
+    total = np.cumsum(values, axis=-1)
+    total[..., smoothing_days:] = total[..., smoothing_days:] - total[..., :-smoothing_days]
+    return total / np.minimum(np.arange(1, values.shape[-1] + 1), smoothing_days)
+
+
+def _run(y, alpha, beta, phi, level, trend, weights=None):
+    # ETS(A,Ad,N) error-correction recursion over the days of y (..., days), with parameters and
+    # states broadcast over the leading axes. Returns the final states and the weighted squared errors.
+    sse = np.zeros(np.broadcast_shapes(level.shape, alpha.shape))
+    for t in range(y.shape[-1]):
+        error = y[..., t] - (level + phi * trend)
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + beta * error
+        if weights is None or weights[t]:
+            sse = sse + error * error
+    return level, trend, sse
+
+
+class SmoothingModels:
+    # Fitted models of every jurisdiction, with their state after the last day seen
+
+    def __init__(self, units, dates, values):
+        self.units = units
+        self.dates = dates
+        self.values = values
+        y = smoothed_rates(values)
+        n = y.shape[-1]
+        # The level starts at the first value and the trend at 0; only the last fit_days are scored
+        weights = np.arange(n) >= n - fit_days
+        a, b, p = (parameter_grid[:, i, None] for i in range(3))
+        start = np.broadcast_to(y[:, 0], (len(parameter_grid), len(units)))
+        level, trend, sse = _run(y, a, b, p, start, np.zeros_like(start), weights)
+        best = sse.argmin(axis=0)
+        columns = np.arange(len(units))
+        self.alpha, self.beta, self.phi = parameter_grid[best].T
+        self.level, self.trend = level[best, columns], trend[best, columns]
+        self.sse, self.n_errors = sse[best, columns], int(weights.sum())
+        self.updates = 0
+
+    def new_days(self, units, dates, values):
+        # Number of days the data has beyond the fitted days, None unless it is the fitted data plus later days
+        seen = len(self.dates)
+        if units != self.units or len(dates) < seen or not dates[:seen].equals(self.dates) or \
+                not np.array_equal(values[:, :seen], self.values):
+            return None
+        return len(dates) - seen
+
+    def update(self, dates, values):
+        # Run the new days through the recursion with the fitted parameters
+        seen = len(self.dates)
+        y = smoothed_rates(values)[:, seen:]
+        self.level, self.trend, sse = _run(y, self.alpha, self.beta, self.phi, self.level, self.trend)
+        self.sse, self.n_errors = self.sse + sse, self.n_errors + y.shape[-1]
+        self.dates, self.values = dates, values
+        self.updates += y.shape[-1]
+
+    def forecast(self, days=horizon):
+        # Point forecasts and interval bounds, (units, days) arrays, from the state after the last day
+        steps = np.arange(1, days + 1)
+        damped = np.cumsum(self.phi[:, None] ** steps, axis=1)  # phi + ... + phi^h
+        mean = self.level[:, None] + damped * self.trend[:, None]
+        # Var(h) = sigma^2 (1 + sum_{j<h} (alpha + beta (phi + ... + phi^j))^2)
+        weights = (self.alpha[:, None] + self.beta[:, None] * damped[:, :-1]) ** 2
+        variance = (self.sse / self.n_errors)[:, None] * (1 + np.concatenate(
+            [np.zeros((len(self.units), 1)), np.cumsum(weights, axis=1)], axis=1))
+        bounds = {level: (np.clip(mean - z * np.sqrt(variance), 0, None), mean + z * np.sqrt(variance))
+                  for level, z in interval_levels.items()}
+        return np.clip(mean, 0, None), bounds
+
+
+_lock = threading.Lock()
+
+
+@st.cache_resource
+def _model_store():
+    # Single slot holding the latest fitted models, shared by every session
+    return {}
+
+
+def fitted_models():
+    # Models of the current data: fitted once, then advanced by new days and refitted every refit_after days
+    units, dates, values = jurisdiction_panel(('DailyCaseRate',))
+    values = values[:, 0]
+    store = _model_store()
+    with _lock:
+        models = store.get("models")
+        new_days = None if models is None else models.new_days(units, dates, values)
+        if new_days is None or models.updates + new_days >= refit_after:
+            models = store["models"] = SmoothingModels(units, dates, values)
+        elif new_days:
+            models.update(dates, values)
+    return models
+
+
+def forecast_frame(country, region="", days=horizon, history_days=90):
+    # The last history_days of one jurisdiction's 7-day average rate and its forecast with intervals
+    models = fitted_models()
+    unit = models.units.index((country, region))
+    mean, bounds = models.forecast(days)
+    history = pd.DataFrame({"Date": models.dates[-history_days:],
+                            "DailyCaseRate": smoothed_rates(models.values[unit])[-history_days:]})
+    forecast = pd.DataFrame({"Date": models.dates[-1] + pd.to_timedelta(np.arange(1, days + 1), unit="D"),
+                             "Forecast": mean[unit]})
+    for level, (lower, upper) in bounds.items():
+        forecast[f"Lower {level}%"], forecast[f"Upper {level}%"] = lower[unit], upper[unit]
+    parameters = {"alpha": models.alpha[unit], "beta": models.beta[unit], "phi": models.phi[unit]}
+    return history, forecast, parameters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time full and incremental fits of the case rate forecasts.")
+    parser.add_argument("--repeats", type=int, default=5, help="timed full fits")
+    parser.add_argument("--new-days", type=int, default=1, help="days held back and added incrementally")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    units, dates, values = jurisdiction_panel(('DailyCaseRate',))
+    values = values[:, 0]
+    times = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        SmoothingModels(units, dates, values)
+        times.append(time.perf_counter() - start)
+    print(f"full fit: {len(units)} jurisdictions x {len(dates)} days x {len(parameter_grid)} parameter sets "
+          f"in {min(times) * 1000:.1f} ms")
+
+    seen = len(dates) - args.new_days
+    models = SmoothingModels(units, dates[:seen], values[:, :seen])
+    start = time.perf_counter()
+    models.update(dates, values)
+    print(f"incremental update: {args.new_days} new days in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    mean, bounds = models.forecast()
+    print(f"{horizon}-day forecasts with intervals in {(time.perf_counter() - start) * 1000:.2f} ms")
+    lower, upper = bounds[95]
+    print(pd.DataFrame({"Country": [u[0] for u in units], "Region": [u[1] or "National" for u in units],
+                        "Last 7-day mean": smoothed_rates(values)[:, -1], f"Day {horizon}": mean[:, -1],
+                        "95% lower": lower[:, -1], "95% upper": upper[:, -1]}).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
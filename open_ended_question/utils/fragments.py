@@ -0,0 +1,22 @@
+import functools
+
+import streamlit as st
+
+# Set to a dict by utils.rerun_latency: section name -> (function, args, kwargs) of its
+# last call. Sections then run as plain functions so they can be timed without a server
+recorded = None
+
+
+def section(func):
+    # A chart section as an st.fragment: a widget inside it reruns only this function,
+    # with the inputs it was last called with, instead of the whole page script
+    fragment = st.fragment(func)
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        if recorded is None:
+            return fragment(*args, **kwargs)
+        recorded[func.__name__] = (func, args, kwargs)
+        return func(*args, **kwargs)
+
+    return call
@@ -0,0 +1,165 @@
+"""Batched Granger-causality screen of the OxCGRT indices against the daily rates.
+
+For every jurisdiction (each country and each of its states / provinces),
+index, outcome and lag order p, two F-tests are run:
+
+    index -> outcome   do p lags of the index improve an AR(p) model of the outcome?
+    outcome -> index   do p lags of the outcome improve an AR(p) model of the index?
+
+A policy that drives cases shows up in the first direction only, a policy that
+reacts to cases in the second. No regression is fitted one by one: the lagged
+series of every jurisdiction are one strided view of the panel, the
+cross-products every model needs are slices of two einsums over it, and all
+normal equations are solved in one batched np.linalg.solve. Run from the
+open_ended_question directory for timings and the strongest pairs:
+
+    python -m utils.granger
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.indicators import index_columns
+from utils.lazy import lazy_import
+from utils.panel import jurisdiction_panel
+
+stats = lazy_import("scipy.stats")
+
+outcomes = ['DailyCaseRate', 'DailyDeathRate']
+default_lag_orders = (7, 14, 28)
+directions = ["index -> outcome", "outcome -> index"]
+
+
+def _cross_products(series, p):
+    # Cross-products of every jurisdiction's demeaned lags, for all index / outcome pairs at once.
+    # Demeaning over the n fitted days takes the place of the intercept; scaling every series to unit
+    # variance (F is scale free) keeps the death rates and the 0-100 indices equally well conditioned.
+    # The lagged design tensor of all units is one strided view, windows [x(t - p) .. x(t - 1), x(t)], and
+    # every X'X and X'y block is a slice of the Gram matrices of its windows: the outcomes' windows against
+    # every series', and each index's against its own (the index x other index blocks are never needed).
+    scale = series.std(axis=-1, keepdims=True)
+    series = series / np.where(scale > 0, scale, 1)
+    windows = sliding_window_view(series, p + 1, axis=-1)  # (units, variables, n, p + 1), a view
+    windows = windows - windows.mean(axis=2, keepdims=True)
+    k = len(index_columns)
+    outcome = np.einsum('uanp,uvnq->uavpq', windows[:, k:], windows, optimize=True)
+    own = np.einsum('uknp,uknq->ukpq', windows[:, :k], windows[:, :k], optimize=True)
+    n_out = outcome.shape[1]
+    oo = outcome[:, np.arange(n_out), k + np.arange(n_out)]  # each outcome's windows x its own
+    oi = outcome[:, :, :k]                                    # outcome windows x index windows
+    return {
+        "oo": oo[..., :p, :p],       # outcome lags x own lags
+        "ii": own[..., :p, :p],      # index lags x own lags
+        "oi": oi[..., :p, :p],       # outcome lags x index lags
+        "o_yo": oo[..., :p, p],      # outcome lags x outcome
+        "i_yo": oi[..., p, :p],      # index lags x outcome
+        "i_yi": own[..., :p, p],     # index lags x index
+        "o_yi": oi[..., :p, p],      # outcome lags x index
+        "yo": oo[..., p, p],
+        "yi": own[..., p, p],
+    }
+
+
+def _solve_rss(a, b, yy):
+    # Residual sum of squares of the least-squares fits with normal equations a @ beta = b, batched.
+    # A tiny ridge keeps constant series (an index a region never used) solvable; their coefficients are 0.
+    beta = np.linalg.solve(a + 1e-9 * np.eye(a.shape[-1]), b[..., None])[..., 0]
+    return yy - np.einsum('...p,...p->...', b, beta)
+
+
+def granger_tests(series, p):
+    # F statistics and residual degrees of freedom for every (unit, outcome, index, direction) at lag order p
+    n = series.shape[-1] - p
+    c = _cross_products(series, p)
+    units, n_out, k = c["oi"].shape[:3]
+
+    oo = np.broadcast_to(c["oo"][:, :, None], (units, n_out, k, p, p))
+    ii = np.broadcast_to(c["ii"][:, None], (units, n_out, k, p, p))
+    oi = c["oi"]
+    io = np.swapaxes(oi, -1, -2)
+
+    # index -> outcome: outcome on [own lags, index lags]
+    a_fwd = np.block([[oo, oi], [io, ii]])
+    b_fwd = np.concatenate([np.broadcast_to(c["o_yo"][:, :, None], (units, n_out, k, p)), c["i_yo"]], axis=-1)
+    yy_fwd = np.broadcast_to(c["yo"][:, :, None], (units, n_out, k))
+    rss_fwd = _solve_rss(a_fwd, b_fwd, yy_fwd)
+    rss_fwd_r = np.broadcast_to(_solve_rss(c["oo"], c["o_yo"], c["yo"])[:, :, None], (units, n_out, k))
+
+    # outcome -> index: index on [own lags, outcome lags]
+    a_rev = np.block([[ii, io], [oi, oo]])
+    b_rev = np.concatenate([np.broadcast_to(c["i_yi"][:, None], (units, n_out, k, p)), c["o_yi"]], axis=-1)
+    yy_rev = np.broadcast_to(c["yi"][:, None], (units, n_out, k))
+    rss_rev = _solve_rss(a_rev, b_rev, yy_rev)
+    rss_rev_r = np.broadcast_to(_solve_rss(c["ii"], c["i_yi"], c["yi"])[:, None], (units, n_out, k))
+
+    df = n - 2 * p - 1
+    rss = np.stack([rss_fwd, rss_rev], axis=-1)
+    rss_r = np.stack([rss_fwd_r, rss_rev_r], axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f = ((rss_r - rss) / p) / (rss / df)
+    # A target that never changes leaves nothing to explain
+    f[np.stack([yy_fwd, yy_rev], axis=-1) <= 1e-9] = np.nan
+    return np.clip(f, 0, None), df
+
+
+@st.cache_data
+def granger_screen(lag_orders=default_lag_orders):
+    # One row per jurisdiction, index, outcome and lag order with the F test p-value of both directions
+    units, _, series = jurisdiction_panel(tuple(index_columns + outcomes))
+    frames = []
+    for p in lag_orders:
+        f, df = granger_tests(series, p)
+        pvalues = stats.f.sf(f, p, df)
+        u, o, k = np.meshgrid(np.arange(len(units)), np.arange(len(outcomes)), np.arange(len(index_columns)),
+                              indexing='ij')
+        frames.append(pd.DataFrame({
+            "Country": [units[i][0] for i in u.ravel()],
+            "Region": [units[i][1] or "National" for i in u.ravel()],
+            "Index": np.array(index_columns)[k.ravel()],
+            "Outcome": np.array(outcomes)[o.ravel()],
+            "Lags": p,
+            "F (index -> outcome)": f[..., 0].ravel(),
+            "p (index -> outcome)": pvalues[..., 0].ravel(),
+            "F (outcome -> index)": f[..., 1].ravel(),
+            "p (outcome -> index)": pvalues[..., 1].ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def classify(screen, alpha=0.05):
+    # Which way the evidence points for each row at significance level alpha
+    fwd = screen["p (index -> outcome)"] < alpha
+    rev = screen["p (outcome -> index)"] < alpha
+    return pd.Series(np.select([fwd & ~rev, rev & ~fwd, fwd & rev], ["index leads", "outcome leads", "feedback"],
+                               "none"), index=screen.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Granger screen and report its timing.")
+    parser.add_argument("--lags", type=int, nargs="+", default=list(default_lag_orders), help="lag orders (days)")
+    parser.add_argument("--top", type=int, default=10, help="strongest index -> outcome rows to print")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    start = time.perf_counter()
+    units, _, series = jurisdiction_panel.__wrapped__(tuple(index_columns + outcomes))
+    built = time.perf_counter() - start
+    print(f"panel: {series.shape[0]} jurisdictions x {series.shape[1]} series x {series.shape[2]} days "
+          f"in {built:.2f}s")
+    for p in args.lags:
+        start = time.perf_counter()
+        granger_tests(series, p)
+        print(f"lag order {p:3d}: {2 * series.shape[0] * len(outcomes) * len(index_columns)} tests "
+              f"in {time.perf_counter() - start:.2f}s")
+    screen = granger_screen.__wrapped__(tuple(args.lags))
+    screen["Direction"] = classify(screen)
+    print(screen.sort_values("p (index -> outcome)").head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Population-weighted rollups of states and provinces into any grouping of them.
+
+The national series are the NAT_TOTAL rows of the OxCGRT files, and each state
+and province is normalized by its own population, so there has been no way to
+see, e.g., the census regions or "the provinces under a stay-at-home order"
+as one unit. RegionRollup aggregates the subnational regions of the panel
+(utils.panel) over any grouping:
+
+    counts                ConfirmedCases, ConfirmedDeaths and their daily increments, summed
+    rates                 those sums per 100K of the members' total population
+    indices               the members' indices averaged with their populations as weights
+
+A grouping is a sparse (groups, regions) membership matrix G, so regions can
+belong to several groups, and a rollup is one sparse product of G with every
+column at once: G @ X, with X the (regions, dates x columns) array of counts,
+populations and population-weighted indices. Membership can also change from
+day to day: a (dates, regions) mask, e.g. the days a region's C6E level was at
+least 2, zeroes a region's columns on the days it is not a member. Every
+grouping is one product over the same X, a few milliseconds. Each day's value
+aggregates that day's members; days a region did not report carry its last
+report. Run from the open_ended_question directory to check the rollups of
+each country's regions against its NAT_TOTAL rows and time them:
+
+    python -m utils.hierarchy
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import COUNTRIES, data_version, national_index_columns
+from utils.lazy import lazy_import
+from utils.panel import oxcgrt_panel
+
+sparse = lazy_import("scipy.sparse")
+
+count_columns = ['ConfirmedCases', 'ConfirmedDeaths']
+# Count -> its per 100K column and the per 100K column of its daily increments
+rate_columns = {'ConfirmedCases': ('CasesPer100K', 'DailyCaseRate'),
+                'ConfirmedDeaths': ('DeathsPer100K', 'DailyDeathRate')}
+weighted_columns = list(national_index_columns[3:])
+
+# U.S. Census Bureau regions and the usual regions of Canada
+census_regions = {
+    "US": {
+        "Northeast": ['CT', 'ME', 'MA', 'NH', 'RI', 'VT', 'NJ', 'NY', 'PA'],
+        "Midwest": ['IL', 'IN', 'MI', 'OH', 'WI', 'IA', 'KS', 'MN', 'MO', 'NE', 'ND', 'SD'],
+        "South": ['DE', 'FL', 'GA', 'MD', 'NC', 'SC', 'VA', 'WV', 'AL', 'KY', 'MS', 'TN', 'AR', 'LA', 'OK', 'TX'],
+        "West": ['AZ', 'CO', 'ID', 'MT', 'NV', 'NM', 'UT', 'WY', 'AK', 'CA', 'HI', 'OR', 'WA'],
+    },
+    "Canada": {
+        "Atlantic": ['NB', 'NL', 'NS', 'PE'],
+        "Central": ['ON', 'QC'],
+        "Prairies": ['AB', 'MB', 'SK'],
+        "West Coast": ['BC'],
+        "Territories": ['NT', 'NU', 'YT'],
+    },
+}
+
+
+def census_groups():
+    # "<country>: <census region>" -> its (country, region code) members
+    return {f"{country}: {name}": [(country, code) for code in codes]
+            for country, regions in census_regions.items() for name, codes in regions.items()}
+
+
+def country_groups():
+    # Country -> every state / province of it
+    return {country: [(country, code) for regions in census_regions[country].values() for code in regions]
+            for country in COUNTRIES}
+
+
+class RegionRollup:
+    # The subnational regions of a Panel, with their counts, daily increments, populations and indices as
+    # (dates, regions) arrays, last reports carried forward
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.dates = panel.dates
+        ids = panel.region_ids(national=False)
+        self.regions = [panel.regions[i] for i in ids]
+        self._positions = {region: k for k, region in enumerate(self.regions)}
+        filled = panel.filled()[:, ids]
+        population = filled[:, :, panel.metric_id('Population')]
+        self.population = np.where(np.isnan(population).all(axis=0), 0, np.nan_to_num(population).max(axis=0))
+        self.counts = np.nan_to_num(filled[:, :, [panel.metric_id(c) for c in count_columns]])
+        # Corrections below the previous day count as 0, as in data.add_daily_rates
+        self.daily = np.diff(self.counts, axis=0, prepend=self.counts[:1]).clip(min=0)
+        indices = filled[:, :, [panel.metric_id(c) for c in weighted_columns]]
+        self.reported = ~np.isnan(indices)
+        self.indices = np.nan_to_num(indices)
+
+    def matrix(self, groups):
+        # Sparse (groups, regions) membership of {name: [(country, region code), ...]}; members without rows in
+        # the files are left out
+        rows, columns = [], []
+        for row, members in enumerate(groups.values()):
+            for member in members:
+                if member in self._positions:
+                    rows.append(row)
+                    columns.append(self._positions[member])
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(groups), len(self.regions)))
+
+    def aggregate(self, matrix, where=None):
+        # (groups, dates, columns) array of the summed counts, daily increments, member population and the
+        # population-weighted index sums and their weights, from one sparse product
+        member = np.ones(self.counts.shape[:2]) if where is None else np.asarray(where, dtype=float)
+        weights = (self.population * member)[:, :, None]
+        columns = np.concatenate([self.counts * member[:, :, None], self.daily * member[:, :, None], weights,
+                                  self.indices * self.reported * weights, self.reported * weights], axis=2)
+        n_dates, n_regions, n_columns = columns.shape
+        stacked = columns.transpose(1, 0, 2).reshape(n_regions, n_dates * n_columns)
+        return np.asarray(matrix @ stacked).reshape(matrix.shape[0], n_dates, n_columns)
+
+    def rollup(self, groups, where=None):
+        # Long frame of Group, Date, Population, the counts, their per 100K rates and the weighted indices
+        totals = self.aggregate(self.matrix(groups), where)
+        n = len(count_columns)
+        counts, daily, population = totals[:, :, :n], totals[:, :, n:2 * n], totals[:, :, 2 * n]
+        weighted = totals[:, :, 2 * n + 1:2 * n + 1 + len(weighted_columns)]
+        weights = totals[:, :, -len(weighted_columns):]
+        df = pd.DataFrame({'Group': np.repeat(list(groups), len(self.dates)),
+                           'Date': np.tile(self.dates, len(groups)),
+                           'Population': population.ravel()})
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_100k = np.where(population > 0, 100_000 / population, np.nan)
+            for k, column in enumerate(count_columns):
+                cumulative, daily_rate = rate_columns[column]
+                df[column] = counts[:, :, k].ravel()
+                df[cumulative] = (counts[:, :, k] * per_100k).ravel()
+                df[daily_rate] = (daily[:, :, k] * per_100k).ravel()
+            for k, column in enumerate(weighted_columns):
+                df[column] = np.where(weights[:, :, k] > 0, weighted[:, :, k] / weights[:, :, k], np.nan).ravel()
+        return df
+
+    def policy_mask(self, column, level):
+        # (dates, regions) mask of the days each region's column was at least level
+        panel = self.panel
+        values = panel.filled()[:, [panel.region_id(*region) for region in self.regions], panel.metric_id(column)]
+        return np.nan_to_num(values, nan=-np.inf) >= level
+
+
+@st.cache_resource
+def region_rollup(version):
+    # Rollup of the subnational regions of the panel, shared by every session and keyed by the data version
+    return RegionRollup(oxcgrt_panel(version))
+
+
+def policy_split(rollup, column, level, label):
+    # Each country's regions split by whether their column was at least level on each day: every day's regions
+    # at or above it make up "<country>: <label> >= level", the rest "<country>: <label> < level"
+    mask = rollup.policy_mask(column, level)
+    groups = country_groups()
+    above = rollup.rollup(groups, mask).assign(Group=lambda df: df['Group'] + f": {label} ≥ {level:g}")
+    below = rollup.rollup(groups, ~mask).assign(Group=lambda df: df['Group'] + f": {label} < {level:g}")
+    return pd.concat([above, below], ignore_index=True)
+
+
+def validate(rollup):
+    # Rollup of each country's regions against its NAT_TOTAL rows, on the days both have a value: the mean
+    # absolute and the largest relative difference of each column
+    panel = rollup.panel
+    totals = rollup.rollup(country_groups())
+    rows = []
+    for country in COUNTRIES:
+        national = panel.values[:, panel.region_id(country)]
+        rolled = totals[totals['Group'] == country]
+        for column in ['Population'] + count_columns + weighted_columns:
+            reported = national[:, panel.metric_id(column)]
+            summed = rolled[column].to_numpy()
+            both = ~np.isnan(reported) & ~np.isnan(summed)
+            gap = np.abs(summed[both] - reported[both])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                relative = np.where(reported[both] != 0, gap / np.abs(reported[both]), np.nan)
+            rows.append({"Country": country, "Column": column, "Days": int(both.sum()),
+                         "Mean abs diff": gap.mean() if both.any() else np.nan,
+                         "Max rel diff": np.nanmax(relative) if np.isfinite(relative).any() else np.nan})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the regional rollups against NAT_TOTAL and time them.")
+    parser.add_argument("--level", type=float, default=2, help="C6E level of the policy grouping")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    rollup = region_rollup(data_version())
+    print(f"{len(rollup.regions)} states and provinces x {len(rollup.dates)} days")
+    mask = rollup.policy_mask('C6E_Stay at home requirements', args.level)
+    for name, groups, where in [("countries", country_groups(), None), ("census regions", census_groups(), None),
+                                (f"C6E >= {args.level:g}", country_groups(), mask)]:
+        matrix = rollup.matrix(groups)
+        start = time.perf_counter()
+        rollup.aggregate(matrix, where)
+        aggregated = time.perf_counter() - start
+        start = time.perf_counter()
+        rollup.rollup(groups, where)
+        print(f"{name}: {len(groups)} groups, {matrix.nnz} memberships, product {aggregated * 1000:.1f} ms, "
+              f"frame {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(validate(rollup).round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""OxCGRT composite indices recomputed from the policy indicators, and what-if scenarios.
+
+The dashboard reads the four composite indices as reported. This module
+recomputes them with the OxCGRT methodology from the ordinal C, E and H
+indicators and their flags, for every nation, state and province and every day
+at once. Each indicator j gets a sub-index score per day
+
+    100 * (v - 0.5 * (F - f)) / N     (0 when v is 0)
+
+with v the ordinal value, N the indicator's maximum level, F 1 if the indicator
+has a flag (general vs. targeted) and f the flag. A missing flag on a nonzero
+value scores as targeted. A composite index is the mean of its indicators' scores
+over the indicators reported that day. The scores are one (rows, indicators)
+array, and the indices are a single product with the (indicators, indices)
+membership matrix, so the whole panel takes milliseconds.
+
+A scenario is a list of changes, each a dict such as
+
+    {"indicator": "C6E", "cap": 1, "start": "2021-03-01"}
+
+that caps ("cap"), raises ("floor") or replaces ("set") the indicator's value,
+or sets its flag ("flag": 1 for general, 0 for targeted), from start to end
+(both optional), for one country and its regions or all. The indices are
+recomputed with the changed values. The recomputed indices use the indicators
+that apply to everyone (the E columns). The reported _WeightedAverage indices
+average the vaccinated and non-vaccinated indices, so the two agree wherever
+policies do not differ by vaccination status. Run from the open_ended_question
+directory for timings and the gap between recomputed and reported values:
+
+    python -m utils.indices
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import data_version
+from utils.panel import oxcgrt_panel
+
+# Code -> (column, maximum level, has a flag)
+indicators = {
+    "C1E": ("C1E_School closing", 3, True),
+    "C2E": ("C2E_Workplace closing", 3, True),
+    "C3E": ("C3E_Cancel public events", 2, True),
+    "C4E": ("C4E_Restrictions on gatherings", 4, True),
+    "C5E": ("C5E_Close public transport", 2, True),
+    "C6E": ("C6E_Stay at home requirements", 3, True),
+    "C7E": ("C7E_Restrictions on internal movement", 2, True),
+    "C8E": ("C8E_International travel controls", 4, False),
+    "E1": ("E1_Income support", 2, True),
+    "E2": ("E2_Debt/contract relief", 2, False),
+    "H1": ("H1_Public information campaigns", 2, True),
+    "H2": ("H2_Testing policy", 3, False),
+    "H3": ("H3_Contact tracing", 2, False),
+    "H6E": ("H6E_Facial Coverings", 4, True),
+    "H7": ("H7_Vaccination policy", 5, True),
+    "H8E": ("H8E_Protection of elderly people", 3, True),
+}
+
+_containment = ["C1E", "C2E", "C3E", "C4E", "C5E", "C6E", "C7E", "C8E"]
+_health = ["H1", "H2", "H3", "H6E", "H7", "H8E"]
+# Composite index -> the indicators it averages
+composites = {
+    "GovernmentResponseIndex_WeightedAverage": _containment + ["E1", "E2"] + _health,
+    "StringencyIndex_WeightedAverage": _containment + ["H1"],
+    "ContainmentHealthIndex_WeightedAverage": _containment + _health,
+    "EconomicSupportIndex": ["E1", "E2"],
+}
+
+codes = list(indicators)
+maximum = np.array([indicators[code][1] for code in codes], dtype=float)
+has_flag = np.array([indicators[code][2] for code in codes], dtype=float)
+membership = np.array([[code in members for members in composites.values()] for code in codes], dtype=float)
+
+operations = ("cap", "floor", "set", "flag")
+# Changes the what-if scenario of page 3 offers -> their description
+scenario_changes = {"cap": "Capped at", "floor": "Raised to at least", "set": "Set to"}
+
+
+@st.cache_data
+def index_panel():
+    # Every national and regional row of every country as (keys, values, flags, reported): keys a frame of
+    # Country, RegionCode ("" for the nation) and Date, values and flags (rows, indicators) arrays in the
+    # order of codes, reported the (rows, composites) indices as published
+    df = oxcgrt_panel(data_version()).long_frame()
+    keys = df[['Country', 'RegionCode', 'Date']]
+    values = df[[indicators[code][0] for code in codes]].to_numpy(dtype=float)
+    flags = np.column_stack([df[f"{code}_Flag"].to_numpy(dtype=float) if indicators[code][2] and f"{code}_Flag" in df
+                             else np.full(len(df), np.nan) for code in codes])
+    reported = df[list(composites)].to_numpy(dtype=float)
+    return keys, values, flags, reported
+
+
+def compute_indices(values, flags):
+    # (rows, composites) indices of (rows, indicators) values and flags
+    targeted = 0.5 * has_flag * (1 - np.nan_to_num(flags, nan=0.0))
+    scores = np.where(values > 0, 100 * (values - targeted) / maximum, 0.0)
+    reported = ~np.isnan(values)
+    totals = np.where(reported, scores, 0.0) @ membership
+    counts = reported.astype(float) @ membership
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def _rows(keys, change):
+    # Rows a scenario change applies to
+    mask = np.ones(len(keys), dtype=bool)
+    if change.get("start") is not None:
+        mask &= (keys['Date'] >= pd.Timestamp(change["start"])).to_numpy()
+    if change.get("end") is not None:
+        mask &= (keys['Date'] <= pd.Timestamp(change["end"])).to_numpy()
+    if change.get("country") is not None:
+        mask &= (keys['Country'] == change["country"]).to_numpy()
+    if change.get("regions") is not None:
+        mask &= keys['RegionCode'].isin(change["regions"]).to_numpy()
+    return mask
+
+
+def apply_scenario(keys, values, flags, scenario):
+    # Copies of values and flags with every change of the scenario applied in order
+    values, flags = values.copy(), flags.copy()
+    for change in scenario:
+        if change.get("indicator") not in indicators:
+            raise ValueError(f"Unknown indicator {change.get('indicator')!r}, expected one of {', '.join(codes)}")
+        ops = [op for op in operations if op in change]
+        if not ops:
+            raise ValueError(f"A change needs one of {', '.join(operations)}")
+        j = codes.index(change["indicator"])
+        rows = _rows(keys, change)
+        column = values[rows, j]
+        if "cap" in change:
+            column = np.minimum(column, change["cap"])
+        if "floor" in change:
+            column = np.maximum(column, change["floor"])
+        if "set" in change:
+            column = np.full_like(column, change["set"])
+        values[rows, j] = np.clip(column, 0, maximum[j])
+        if "flag" in change:
+            flags[rows, j] = change["flag"]
+    return values, flags
+
+
+@st.cache_data
+def baseline_indices():
+    # Recomputed indices of the panel as reported
+    _, values, flags, _ = index_panel()
+    return compute_indices(values, flags)
+
+
+def what_if(scenario, country=None, region=""):
+    # Frame of Country, RegionCode, Date and, per composite, the recomputed index, "<index> Scenario" and
+    # "<index> Reported", for one country (or all) and one region ("" for the nations, None for all)
+    keys, values, flags, reported = index_panel()
+    baseline = baseline_indices()
+    changed = compute_indices(*apply_scenario(keys, values, flags, scenario))
+    df = keys.copy()
+    for i, index in enumerate(composites):
+        df[index] = baseline[:, i]
+        df[f"{index} Scenario"] = changed[:, i]
+        df[f"{index} Reported"] = reported[:, i]
+    if country is not None:
+        df = df[df['Country'] == country]
+    if region is not None:
+        df = df[df['RegionCode'] == region]
+    return df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the recomputation of the OxCGRT composite indices.")
+    parser.add_argument("--repeats", type=int, default=20, help="timed recomputations")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    keys, values, flags, reported = index_panel()
+    scenario = [{"indicator": "C6E", "cap": 1, "start": "2021-03-01"}]
+    times, scenario_times = [], []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        baseline = compute_indices(values, flags)
+        times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        changed = compute_indices(*apply_scenario(keys, values, flags, scenario))
+        scenario_times.append(time.perf_counter() - start)
+    print(f"{len(keys)} rows x {len(codes)} indicators: recomputed in {min(times) * 1000:.2f} ms, "
+          f"with the scenario {scenario} in {min(scenario_times) * 1000:.2f} ms")
+    rows = []
+    for i, index in enumerate(composites):
+        gap = np.abs(baseline[:, i] - reported[:, i])
+        rows.append({"Index": index, "Mean |recomputed - reported|": np.nanmean(gap),
+                     "Rows within 0.5": (gap[~np.isnan(gap)] <= 0.5).mean(),
+                     "Mean scenario change": np.nanmean(changed[:, i] - baseline[:, i])})
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
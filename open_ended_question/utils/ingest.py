@@ -0,0 +1,251 @@
+"""Bounded-memory ingestion of a full OxCGRT release into per-country Parquet.
+
+The global release with notes runs to several GB, mostly free-text notes
+columns, so it is never loaded whole. It is read in chunks of rows. Only the
+columns the dashboard uses are converted, straight into compact types:
+categorical codes, float32 ordinal indicators and indices, and float64 counts
+and spending. Each chunk's rows are appended to one Parquet file per
+country, Hive-partitioned as CountryCode=<code>/, and folded into per-country
+summary statistics before the next chunk is parsed. Memory therefore depends
+on the chunk size, not the file size. The chunk size starts from --memory-mb
+and the file's bytes per row. The cap is checked against the process's peak
+resident size after each chunk, so it is a post-hoc check rather than a hard
+limit. When a chunk takes the peak past headroom of the cap, the following
+chunks are halved. Ingestion stops with a MemoryError once the peak is past the
+cap. A single chunk can therefore overshoot the cap before it is caught. Run
+from the open_ended_question directory:
+
+    python -m utils.ingest OxCGRT_nat_differentiated_withnotes_2020.csv --memory-mb 256
+
+The output replaces data/global/ in one rename once the whole file is
+ingested, and the SQL page sees it as the oxcgrt_global table.
+"""
+import argparse
+import csv
+import gzip
+import os
+import resource
+import shutil
+import time
+
+import pandas as pd
+
+from utils.data import DATA_DIR, index_to_scale
+from utils.indicators import original_index_columns
+from utils.joins import policy_columns
+from utils.lazy import lazy_import, preload
+
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+pq = lazy_import("pyarrow.parquet")
+
+GLOBAL_DIR = os.path.join(DATA_DIR, "global")
+SUMMARY_FILE = "_summary.csv"
+
+id_columns = ["CountryName", "CountryCode", "RegionName", "RegionCode", "Jurisdiction"]
+count_columns = ["ConfirmedCases", "ConfirmedDeaths"]
+# Composite indices under the names of the USA/CAN extracts and of the global release
+composite_columns = [column for column in original_index_columns if "Index" in column] + \
+                    ["GovernmentResponseIndex_Average", "StringencyIndex_Average",
+                     "ContainmentHealthIndex_Average"] + policy_columns
+wide_columns = count_columns + index_to_scale  # large values that float32 would round
+
+default_memory_mb = 256
+# Share of the cap one chunk's raw rows may take: the parser's copy of the rows, their tokens, the converted
+# frame and the per-country slices being written are in memory together
+chunk_fraction = 8
+# Share of the cap past which the chunk size is halved
+headroom = 0.75
+min_chunk_rows = 100
+sample_bytes = 1 << 20
+
+
+def projection(header):
+    # Columns to keep and their dtypes, for the columns of the dashboard this file has
+    wanted = id_columns + ["Date"] + original_index_columns + count_columns + composite_columns
+    types = {}
+    for column in dict.fromkeys(wanted):
+        if column not in header:
+            continue
+        if column in id_columns:
+            types[column] = "category"
+        elif column == "Date":
+            types[column] = "int32"
+        elif column in wide_columns:
+            types[column] = "float64"
+        else:
+            types[column] = "float32"
+    return types
+
+
+def _open(source):
+    opener = gzip.open if source.endswith(".gz") else open
+    return opener(source, "rt", newline="", encoding="utf-8")
+
+
+def _sample(source):
+    # Header and the average raw bytes per row over the first MB (notes may hold quoted newlines)
+    with _open(source) as f:
+        text = f.read(sample_bytes)
+    rows = list(csv.reader(text.splitlines(keepends=True)))
+    complete = max(len(rows) - 2, 1)  # the last row may be cut off
+    return rows[0], len(text.encode()) / complete
+
+
+def _schema(types):
+    # Arrow schema of a partition file; fixed so every chunk appends to the same file schema
+    arrow_types = {"category": pa.dictionary(pa.int32(), pa.string()), "int32": pa.date32(),
+                   "float32": pa.float32(), "float64": pa.float64()}
+    return pa.schema([(column, arrow_types[dtype]) for column, dtype in types.items() if column != "CountryCode"])
+
+
+def _rss():
+    # Current resident set size in bytes
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss():
+    # Largest resident set size so far, in bytes (ru_maxrss is in KB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class CountrySummary:
+    # Per-country statistics folded in one chunk at a time: rows, regions, date range, peak cumulative
+    # counts and the mean of every composite index present
+
+    def __init__(self, columns):
+        self.means = [column for column in composite_columns if column in columns]
+        self.counts = [column for column in count_columns if column in columns]
+        self.regions = {}
+        self.totals = None
+
+    def add(self, chunk):
+        # Index sums are taken in float64, float32 sums drift with the chunking
+        grouped = chunk.astype({column: "float64" for column in self.means}).groupby("CountryCode", observed=True)
+        part = grouped.agg(Rows=("Date", "size"), FirstDate=("Date", "min"), LastDate=("Date", "max"),
+                           **{f"Peak{column}": (column, "max") for column in self.counts},
+                           **{f"{column}_sum": (column, "sum") for column in self.means},
+                           **{f"{column}_count": (column, "count") for column in self.means})
+        part.index = part.index.astype(str)
+        for code, regions in grouped["RegionCode"].unique().items():
+            self.regions.setdefault(str(code), set()).update(region for region in regions if isinstance(region, str))
+        if self.totals is not None:
+            part = pd.concat([self.totals, part])
+        folds = {"Rows": "sum", "FirstDate": "min", "LastDate": "max"} | \
+                {column: "max" if column.startswith("Peak") else "sum" for column in part.columns[3:]}
+        self.totals = part.groupby(level=0).agg(folds)
+
+    def result(self):
+        df = self.totals.copy() if self.totals is not None else pd.DataFrame(columns=["Rows"])
+        df.insert(1, "Regions", [len(self.regions.get(code, ())) for code in df.index])
+        for column in self.means:
+            df[f"Mean{column}"] = df.pop(f"{column}_sum") / df.pop(f"{column}_count").replace(0, float("nan"))
+        for column in ["FirstDate", "LastDate"]:
+            df[column] = pd.to_datetime(df[column].astype("int64").astype(str), format="%Y%m%d")
+        return df.rename_axis("CountryCode").sort_index().reset_index()
+
+
+def _next_chunk(reader, rows):
+    # The next rows of the reader, or None at the end of the file
+    try:
+        return reader.get_chunk(rows)
+    except StopIteration:
+        return None
+
+
+def ingest(source, out=GLOBAL_DIR, memory_mb=default_memory_mb):
+    # Stream source into out/CountryCode=<code>/part-<n>.parquet and out/_summary.csv; returns the summary and
+    # ingestion statistics
+    cap = memory_mb * 2 ** 20
+    header, row_bytes = _sample(source)
+    types = projection(header)
+    missing = [column for column in ["CountryCode", "Date"] if column not in types]
+    if missing:
+        raise ValueError(f"{source} has no {', '.join(missing)} column")
+    chunk_rows = first_chunk_rows = max(int(cap / chunk_fraction / row_bytes), min_chunk_rows)
+    schema = _schema(types)
+    staging = out + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    writers, files, summary = {}, {}, CountrySummary(types)
+    rows = chunks = 0
+    # The cap is on the data: Arrow and Parquet are loaded before the baseline is taken
+    preload(pa, pc, pq)
+    base = _rss()
+    peak = base
+    start = time.perf_counter()
+    try:
+        with pd.read_csv(source, usecols=list(types), dtype=types, chunksize=chunk_rows) as reader:
+            while (chunk := _next_chunk(reader, chunk_rows)) is not None:
+                summary.add(chunk)
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                dates = pc.strptime(pc.cast(table.column("Date"), pa.string()), format="%Y%m%d", unit="s")
+                table = table.set_column(table.schema.get_field_index("Date"), "Date", pc.cast(dates, pa.date32()))
+                codes = chunk["CountryCode"]
+                present = set(codes.dropna().unique())
+                # Each open writer holds its row group buffers, so only the countries of this chunk keep
+                # theirs; a country seen again later gets its next part file
+                for code in [code for code in writers if code not in present]:
+                    writers.pop(code).close()
+                for code in present:
+                    part = table.filter(pa.array((codes == code).to_numpy())).select(schema.names).cast(schema)
+                    if code not in writers:
+                        path = os.path.join(staging, f"CountryCode={code}")
+                        os.makedirs(path, exist_ok=True)
+                        files[code] = files.get(code, -1) + 1
+                        writers[code] = pq.ParquetWriter(os.path.join(path, f"part-{files[code]}.parquet"), schema)
+                    writers[code].write_table(part)
+                rows += len(chunk)
+                chunks += 1
+                previous, peak = peak, _peak_rss()
+                if peak - base > cap:
+                    raise MemoryError(f"ingestion grew the process by {(peak - base) / 2 ** 20:.0f} MB, over the "
+                                      f"{memory_mb} MB cap")
+                # The peak only moves when a chunk pushes it, so this chunk's size is what took it near the cap
+                if peak > previous and peak - base > cap * headroom:
+                    chunk_rows = max(chunk_rows // 2, min_chunk_rows)
+                del chunk, table
+    except BaseException:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    for writer in writers.values():
+        writer.close()
+
+    df = summary.result()
+    df.to_csv(os.path.join(staging, SUMMARY_FILE), index=False)
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(staging, out)
+    stats = {"rows": rows, "chunks": chunks, "chunk_rows": first_chunk_rows, "last_chunk_rows": chunk_rows,
+             "countries": len(files), "seconds": time.perf_counter() - start, "peak_mb": (peak - base) / 2 ** 20}
+    return df, stats
+
+
+def read_summary(out=GLOBAL_DIR):
+    return pd.read_csv(os.path.join(out, SUMMARY_FILE), keep_default_na=False, na_values=[""],
+                       parse_dates=["FirstDate", "LastDate"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a full OxCGRT CSV into per-country Parquet.")
+    parser.add_argument("source", help="OxCGRT CSV, optionally .gz")
+    parser.add_argument("--out", default=GLOBAL_DIR, help="output directory")
+    parser.add_argument("--memory-mb", type=int, default=default_memory_mb,
+                        help="cap on how far ingestion may grow the process (MB)")
+    args = parser.parse_args()
+
+    size = os.path.getsize(args.source)
+    df, stats = ingest(args.source, args.out, args.memory_mb)
+    print(f"{size / 2 ** 20:.0f} MB source: {stats['rows']} rows of {stats['countries']} countries in "
+          f"{stats['chunks']} chunks of {stats['chunk_rows']} rows (last {stats['last_chunk_rows']}), "
+          f"{stats['seconds']:.1f}s "
+          f"({size / 2 ** 20 / stats['seconds']:.0f} MB/s)")
+    print(f"peak memory growth {stats['peak_mb']:.0f} MB (cap {args.memory_mb} MB)")
+    print(df.iloc[:10, :7].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""As-of join of the vaccination series onto the OxCGRT policy rows.
+
+vaccinations.csv and the OxCGRT extracts report on their own calendars, so
+page 6 used to plot them side by side without aligning them. joined_table()
+aligns them once: every national and state / province policy row of every
+country gets the latest vaccination report of its country on or before that
+day, in a single sorted merge_asof. vaccinations.csv is national only, so a
+region's rows carry its country's coverage. Queries then only filter the
+cached table:
+
+    python -m utils.joins     # build time and query latencies
+"""
+import argparse
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit import logger
+
+from utils.data import COUNTRIES, REGIONS, jurisdiction_df, vaccination_df, vaccination_iso_codes
+
+# Indices reported separately for vaccinated and non-vaccinated people; <index>_Gap is their difference
+split_indexes = ["GovernmentResponseIndex", "ContainmentHealthIndex", "StringencyIndex"]
+policy_columns = [f"{index}_{status}" for index in split_indexes for status in ["NonVaccinated", "Vaccinated"]]
+vaccination_columns = ["percent_people_vaccinated", "percent_people_fully_vaccinated",
+                       "vaccine_administered_per_people", "daily_vaccinations_per_million"]
+
+# Latest vaccination report a policy day may take, older reports leave the day empty
+default_tolerance_days = 14
+
+
+def _policy_rows():
+    # National and regional rows of every country, with daily rates per 100K of the jurisdiction
+    frames = [jurisdiction_df(country)[['Country', 'RegionCode', 'Jurisdiction', 'Date', 'Population',
+                                        'ConfirmedCases', 'ConfirmedDeaths', 'DailyCaseRate', 'DailyDeathRate']
+                                       + policy_columns]
+              for country in COUNTRIES]
+    df = pd.concat(frames, ignore_index=True)
+    for index in split_indexes:
+        df[f"{index}_Gap"] = df[f"{index}_Vaccinated"] - df[f"{index}_NonVaccinated"]
+    return df
+
+
+def _vaccination_rows():
+    frames = [vaccination_df(iso)[['date'] + vaccination_columns].assign(Country=country)
+              for country, iso in vaccination_iso_codes.items()]
+    return pd.concat(frames, ignore_index=True).rename(columns={'date': 'Date'})
+
+
+@st.cache_data
+def joined_table(tolerance_days=default_tolerance_days):
+    # One backward as-of join for all countries and regions: both sides sorted by date, matched within Country
+    policy = _policy_rows().sort_values('Date', kind="stable")
+    vaccinations = _vaccination_rows().sort_values('Date', kind="stable")
+    joined = pd.merge_asof(policy, vaccinations, on='Date', by='Country', direction='backward',
+                           tolerance=pd.Timedelta(days=tolerance_days))
+    return joined.sort_values(['Country', 'RegionCode', 'Date'], kind="stable").reset_index(drop=True)
+
+
+def query(columns, countries=None, regions=None, start=None, end=None, tolerance_days=default_tolerance_days):
+    # Rows of the joined table: national rows unless regions (codes such as "CA" or "ON") are given
+    df = joined_table(tolerance_days)
+    mask = df['Jurisdiction'] == "NAT_TOTAL" if regions is None else df['RegionCode'].isin(regions)
+    if countries is not None:
+        mask &= df['Country'].isin(countries)
+    if start is not None:
+        mask &= df['Date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['Date'] <= pd.Timestamp(end)
+    return df.loc[mask, ['Date', 'Country', 'RegionCode'] + list(columns)].reset_index(drop=True)
+
+
+def index_gap_vs_coverage(index="GovernmentResponseIndex", countries=None, regions=None, start=None, end=None):
+    # Vaccinated-minus-non-vaccinated index against the share of the population fully vaccinated
+    df = query([f"{index}_Gap", "percent_people_fully_vaccinated"], countries, regions, start, end)
+    return df.dropna()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the vaccination / policy join and typical queries.")
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per query")
+    args = parser.parse_args()
+
+    logger.set_log_level("error")
+
+    start = time.perf_counter()
+    table = joined_table()
+    print(f"joined table: {len(table)} rows, built in {time.perf_counter() - start:.3f}s")
+    queries = {
+        "national GR gap vs coverage": lambda: index_gap_vs_coverage(),
+        "US regional CH gap vs coverage": lambda: index_gap_vs_coverage("ContainmentHealthIndex", ["US"],
+                                                                         list(REGIONS["US"]["population"])),
+        "2021 case rate and coverage": lambda: query(["DailyCaseRate", "percent_people_vaccinated"],
+                                                     start="2021-01-01", end="2021-12-31"),
+    }
+    for name, run in queries.items():
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            rows = len(run())
+            times.append(time.perf_counter() - start)
+        print(f"{name:<32} {rows:7d} rows  {min(times) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
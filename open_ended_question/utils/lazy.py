@@ -0,0 +1,42 @@
+import importlib
+import sys
+import time
+import types
+
+# Seconds spent importing each deferred module, recorded on its first use
+import_times = {}
+
+# Modules the pages only import through lazy_import; profile_imports checks they stay deferred
+deferred_modules = ["dcor", "scipy.stats", "scipy.spatial", "scipy.special", "scipy.sparse", "plotly.express",
+                    "plotly.subplots", "plotly.graph_objects", "requests", "duckdb"]
+
+
+class LazyModule(types.ModuleType):
+    # Stand-in for a module that is only imported when one of its attributes is first used
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self.__name__)
+            import_times[self.__name__] = time.perf_counter() - start
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    # Already-imported modules are returned as they are, there is nothing left to defer
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def preload(*modules):
+    # Import lazily imported modules now rather than on first use, e.g. so their cost falls before a measurement
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._load()
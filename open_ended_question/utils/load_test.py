@@ -0,0 +1,99 @@
+"""Concurrent-session load test of the compute pool.
+
+Each simulated session requests every chart page 5 draws and waits for all of
+them, as a browser opening the page would. The sessions run once computing in
+their own script thread, as page 5 did before the compute pool, and once
+submitting to a shared pool that coalesces identical requests. The disk cache
+(utils.disk_cache) is switched off for both, in this process and the pool's
+workers, so every computation is timed rather than read back from data/cache/.
+Run from the open_ended_question directory:
+
+    python -m utils.load_test --sessions 20
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from streamlit import logger
+
+from utils import charts
+from utils.compute import ComputePool
+from utils.correlation import (correlation_bands, default_block_length, default_lags, default_resamples,
+                               lag_analyses, lagged_correlations)
+from utils.data import national_df
+from utils.disk_cache import switch_variable
+
+
+def page_jobs(n_resamples, block_length, workers):
+    # (function, args) of every job page 5 submits with the given sidebar settings
+    jobs = []
+    for method, selected_index in lag_analyses:
+        for rate in ['DailyCaseRate', 'DailyDeathRate']:
+            for country in charts.COUNTRIES:
+                jobs.append((lagged_correlations, (country, selected_index, rate, default_lags, method)))
+                jobs.append((correlation_bands, (country, selected_index, rate, default_lags, method,
+                                                 n_resamples, block_length, workers)))
+    return jobs
+
+
+def script_thread_session(jobs):
+    # Every session computes every chart itself; only the datasets are shared through the cache
+    for func, args in jobs:
+        func.__wrapped__(*args)
+
+
+def pool_session(pool, jobs):
+    wait([pool.submit(func, *args) for func, args in jobs])
+
+
+def run(session, sessions):
+    def timed(_):
+        start = time.perf_counter()
+        session()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as threads:
+        latencies = np.array(list(threads.map(timed, range(sessions))))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test page 5's charts with concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions opening page 5")
+    parser.add_argument("--workers", type=int, default=None, help="compute pool processes")
+    parser.add_argument("--resamples", type=int, default=default_resamples, help="bootstrap resamples per band")
+    args = parser.parse_args()
+
+    logger.set_log_level("error")
+    # The script-thread sessions call dcor from several threads; numba's default TBB layer
+    # then hangs while unloading at interpreter exit
+    os.environ.setdefault("NUMBA_THREADING_LAYER", "omp")
+    # Set before the pool starts, so its spawned workers inherit it
+    os.environ[switch_variable] = "off"
+    jobs = page_jobs(args.resamples, default_block_length, 1)
+    for country in charts.COUNTRIES:
+        national_df(country)
+    pool = ComputePool(args.workers)
+    # Start the workers and load their datasets before timing
+    wait([pool.submit(lagged_correlations, country, lag_analyses[0][1], 'DailyCaseRate', (0,), "spearman")
+          for country in charts.COUNTRIES])
+    pool.requests = pool.computations = 0
+
+    rows = []
+    for mode, session in [("script thread", lambda: script_thread_session(jobs)),
+                          ("compute pool", lambda: pool_session(pool, jobs))]:
+        elapsed, latencies = run(session, args.sessions)
+        rows.append({"Mode": mode, "Sessions": args.sessions,
+                     "Computations": pool.computations if mode == "compute pool" else len(jobs) * args.sessions,
+                     "Wall (s)": round(elapsed, 2), "Mean latency (s)": round(latencies.mean(), 2),
+                     "p95 latency (s)": round(np.percentile(latencies, 95), 2)})
+    pool.shutdown()
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.lazy import lazy_import
+
+spatial = lazy_import("scipy.spatial")
+special = lazy_import("scipy.special")
+
+# Neighbours of the KSG estimator: small k has less bias, larger k less variance
+default_k = 3
+# Relative jitter that breaks the ties of ordinal policy levels, which would give zero neighbour distances
+jitter = 1e-10
+
+
+def _prepare(values, seed):
+    # Series scaled to unit variance with a little noise, so ties between equal values are broken
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    scale = values[finite].std() if finite.any() else 0.0
+    scaled = values / scale if scale > 0 else np.zeros_like(values)
+    return scaled + jitter * np.random.default_rng(seed).standard_normal(len(values))
+
+
+def _count_within(sorted_values, values, eps):
+    # Number of other samples strictly closer than eps to each value, by binary search in the sorted samples
+    return np.searchsorted(sorted_values, values + eps, "left") - \
+        np.searchsorted(sorted_values, values - eps, "right") - 1
+
+
+def ksg_estimate(x, y, sorted_x, k=default_k):
+    # Kraskov-Stogbauer-Grassberger estimate (algorithm 1) of the mutual information of paired samples, in nats:
+    # psi(k) + psi(n) - <psi(n_x + 1) + psi(n_y + 1)>, with n_x / n_y the samples within the max-norm distance
+    # of each point's k-th joint neighbour along each axis. sorted_x is x in sorted order.
+    n = len(x)
+    if n <= k:
+        return np.nan
+    points = np.column_stack([x, y])
+    eps = spatial.cKDTree(points).query(points, k=k + 1, p=np.inf)[0][:, -1]
+    n_x = _count_within(sorted_x, x, eps)
+    n_y = _count_within(np.sort(y), y, eps)
+    mi = special.digamma(k) + special.digamma(n) - np.mean(special.digamma(n_x + 1) + special.digamma(n_y + 1))
+    return max(float(mi), 0.0)
+
+
+def _lag_estimate(x, y, order, lag, k):
+    # Pairs x[t], y[t + lag] without missing values. x's sorted order is taken from the order of the whole
+    # series, so x is never sorted again for a lag.
+    n = len(x) - lag
+    if n <= 0:
+        return np.nan
+    valid = np.zeros(len(x), dtype=bool)
+    valid[:n] = np.isfinite(x[:n]) & np.isfinite(y[lag:])
+    sorted_x = x[order[valid[order]]]
+    return ksg_estimate(x[valid], y[lag:][valid[:n]], sorted_x, k)
+
+
+def lagged_mutual_information(df1, df2, lags, k=default_k, workers=None, seed=0):
+    # Mutual information of df1 and df2 shifted back by each lag, as the other lag curves pair them
+    x = _prepare(df1, seed)
+    y = _prepare(df2, seed + 1)
+    order = np.argsort(x, kind="stable")
+    workers = workers or os.cpu_count() or 1
+    # The tree queries and array kernels release the GIL, so threads spread the lags across cores
+    if workers == 1:
+        return [_lag_estimate(x, y, order, lag, k) for lag in lags]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda lag: _lag_estimate(x, y, order, lag, k), lags))
@@ -0,0 +1,144 @@
+"""Dense date x region x metric panel of the OxCGRT national and regional rows.
+
+Each page and analysis used to build its own frame per country and stack them
+with pd.concat, so frames covering different dates (after dropna) were
+combined on whatever index they had. The Panel holds every nation, state and
+province of every country on one daily date axis, in a single
+(dates, regions, metrics) float64 array:
+
+    values    the metric of a region on a date, NaN when not reported
+    observed  True where values holds a reported number
+    present   (dates, regions): True where the file has a row for the region
+
+A date's offset is its distance in days from the first date, and regions and
+metrics have dict lookups, so any coordinate is found in O(1). Operations
+across countries or regions are array expressions over the region axis,
+aligned by construction. pandas frames are produced from it on demand
+(Panel.frame, Panel.long_frame). The panel is built once per data version and
+shared read-only by every session.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import COUNTRIES, data_version, jurisdiction_df
+
+
+def forward_fill(values, observed, axis=0):
+    # values with every unobserved entry replaced by the last observed one before it along axis
+    # (NaN before the first)
+    positions = np.arange(values.shape[axis]).reshape([-1 if a == axis else 1 for a in range(values.ndim)])
+    last = np.where(observed, positions, 0)
+    np.maximum.accumulate(last, axis=axis, out=last)
+    filled = np.take_along_axis(values, last, axis=axis)
+    return np.where(np.logical_or.accumulate(observed, axis=axis), filled, np.nan)
+
+
+class Panel:
+    # dates a daily DatetimeIndex, regions (country, region code) pairs with "" for the nation, metrics column
+    # names; values / observed (dates, regions, metrics) and present (dates, regions) arrays
+
+    def __init__(self, dates, regions, metrics, values, observed=None, present=None):
+        self.dates = dates
+        self.regions = list(regions)
+        self.metrics = list(metrics)
+        self.values = values
+        self.observed = ~np.isnan(values) if observed is None else observed
+        self.present = self.observed.any(axis=2) if present is None else present
+        self._region_ids = {region: i for i, region in enumerate(self.regions)}
+        self._metric_ids = {metric: i for i, metric in enumerate(self.metrics)}
+        for array in (self.values, self.observed, self.present):
+            array.flags.writeable = False  # shared by every session
+
+    @classmethod
+    def from_frame(cls, df, regions, metrics):
+        # Panel of a frame with Date, the region columns and the metric columns, one row per region and date
+        dates = pd.date_range(df['Date'].min(), df['Date'].max())
+        region_codes, region_index = pd.MultiIndex.from_frame(df[regions]).factorize(sort=True)
+        date_codes = (df['Date'] - dates[0]).dt.days.to_numpy()
+        values = np.full((len(dates), len(region_index), len(metrics)), np.nan)
+        values[date_codes, region_codes] = df[metrics].to_numpy(dtype=float)
+        present = np.zeros(values.shape[:2], dtype=bool)
+        present[date_codes, region_codes] = True
+        return cls(dates, region_index.tolist(), metrics, values, present=present)
+
+    def date_offset(self, date):
+        offset = (pd.Timestamp(date) - self.dates[0]).days
+        if not 0 <= offset < len(self.dates):
+            raise KeyError(date)
+        return offset
+
+    def region_id(self, country, region=""):
+        return self._region_ids[(country, region)]
+
+    def metric_id(self, metric):
+        return self._metric_ids[metric]
+
+    def get(self, date, country, region, metric):
+        return self.values[self.date_offset(date), self.region_id(country, region), self.metric_id(metric)]
+
+    def region_ids(self, country=None, national=None):
+        # Ids of the regions of a country (or all), only the nations (national=True) or only the regions (False)
+        return np.array([i for i, (c, r) in enumerate(self.regions)
+                         if (country is None or c == country) and (national is None or national == (r == ""))],
+                        dtype=int)
+
+    def select(self, metrics=None, regions=None, start=None, end=None):
+        # Sub-panel of some metrics and region ids over start..end (inclusive), sharing no mutable state
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        days = slice(first, last)
+        region_ids = np.arange(len(self.regions)) if regions is None else np.asarray(regions, dtype=int)
+        metric_ids = np.arange(len(self.metrics)) if metrics is None else \
+            np.array([self.metric_id(metric) for metric in metrics], dtype=int)
+        take = np.ix_(np.arange(first, last), region_ids, metric_ids)
+        return Panel(self.dates[days], [self.regions[i] for i in region_ids],
+                     [self.metrics[i] for i in metric_ids], self.values[take], self.observed[take],
+                     self.present[days][:, region_ids])
+
+    def filled(self):
+        # values with each metric's last report carried forward over the days a region did not report it
+        return forward_fill(self.values, self.observed)
+
+    def frame(self, metric):
+        # Wide frame of one metric: dates as rows, (country, region code) as columns
+        columns = pd.MultiIndex.from_tuples(self.regions, names=['Country', 'RegionCode'])
+        return pd.DataFrame(self.values[:, :, self.metric_id(metric)], index=self.dates.rename('Date'),
+                            columns=columns)
+
+    def long_frame(self, metrics=None):
+        # Country, RegionCode, Date and the metrics of every (date, region) the file has a row for,
+        # region by region
+        metric_ids = [self.metric_id(metric) for metric in metrics] if metrics is not None else \
+            list(range(len(self.metrics)))
+        regions, days = np.nonzero(self.present.T)
+        df = pd.DataFrame({'Country': [self.regions[i][0] for i in regions],
+                           'RegionCode': [self.regions[i][1] for i in regions],
+                           'Date': self.dates[days]})
+        values = self.values[days, regions][:, metric_ids]
+        return df.join(pd.DataFrame(values, columns=[self.metrics[i] for i in metric_ids]))
+
+
+@st.cache_resource
+def oxcgrt_panel(version):
+    # Panel of every numeric column of the national and state / province rows of every country, keyed by the
+    # data version
+    df = pd.concat([jurisdiction_df(country) for country in COUNTRIES], ignore_index=True)
+    metrics = list(df.select_dtypes("number").columns)
+    return Panel.from_frame(df, ['Country', 'RegionCode'], metrics)
+
+
+@st.cache_data
+def jurisdiction_panel(columns):
+    # Every jurisdiction of every country on the dates all countries report, as (units, dates, values):
+    # units are (country, region code) pairs with "" for the nation, values a (units, columns, days) array.
+    # Values hold their last report over gaps; anything still missing (before the first report) is 0.
+    panel = oxcgrt_panel(data_version())
+    reported = np.all([panel.present[:, panel.region_ids(country)].any(axis=1) for country in COUNTRIES], axis=0)
+    countries = list(COUNTRIES)
+    order = sorted(range(len(panel.regions)), key=lambda i: (countries.index(panel.regions[i][0]),
+                                                             panel.regions[i][1]))
+    metric_ids = [panel.metric_id(column) for column in columns]
+    take = np.ix_(np.flatnonzero(reported), order, metric_ids)
+    values = np.nan_to_num(forward_fill(panel.values[take], panel.observed[take]))
+    return [panel.regions[i] for i in order], panel.dates[reported], np.ascontiguousarray(values.transpose(1, 2, 0))
@@ -0,0 +1,172 @@
+"""Compact binary encoding of chart payloads and a per-page payload report.
+
+Plotly figures are sent to the browser as JSON, and the daily time series of
+the rate and index charts go out as lists of ISO date strings and full-precision
+floats, again on every rerun. compact() makes a figure serialize its long
+arrays as plotly.js typed arrays instead ({"dtype", "bdata"}, base64 of the raw
+buffer): values as float32 when they are small and finite (int32 when every
+value is a small integer, float64 for large values and arrays with gaps, which
+float32 would round) and dates as epoch milliseconds. An evenly spaced date column (daily or weekly rows)
+becomes just its first date and the step (x0 / dx). The encoding happens
+in to_dict(), which is what st.plotly_chart and the static export serialize, so
+pages pass compact figures to st.plotly_chart as before. The websocket is
+compressed as well (server.enableWebsocketCompression in .streamlit/config.toml).
+Run from the open_ended_question directory for the bytes of every chart before
+and after, raw and deflated:
+
+    python -m utils.payload --pages 1_Deaths_and_Cases_Overall --budget-kb 200
+"""
+import argparse
+import base64
+import datetime
+import functools
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from utils.lazy import lazy_import
+
+go = lazy_import("plotly.graph_objects")
+pio = lazy_import("plotly.io")
+
+# Shorter arrays cost more as base64 and a dtype than as JSON
+min_length = 16
+# Largest integer float32 holds exactly
+float32_exact = 2 ** 24
+
+
+def _typed(values, dtype):
+    return {"dtype": dtype, "bdata": base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode()}
+
+
+def _dates(values):
+    # Epoch milliseconds of an array of dates, or None if it is not one
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ms]").astype(np.int64)
+    if values.dtype == object and isinstance(values[0], (datetime.date, np.datetime64)):
+        dates = pd.to_datetime(values)
+        if not dates.hasnans:
+            return dates.values.astype("datetime64[ms]").astype(np.int64)
+    return None
+
+
+def _numbers(values):
+    # Typed array of a numeric array, or None if it is not one
+    values = np.asarray(values)
+    if values.ndim != 1 or values.dtype == bool or not np.issubdtype(values.dtype, np.number):
+        return None
+    if np.issubdtype(values.dtype, np.integer) or \
+            (np.isfinite(values).all() and np.array_equal(values, np.round(values))):
+        if np.abs(values).max() < float32_exact:
+            return _typed(values, "i4")
+        return _typed(values, "f8")
+    # float32 keeps about 7 significant digits: only small finite values (rates, indices) are shortened, large
+    # ones (cumulative counts, vaccination totals) and arrays with gaps keep float64
+    if np.isfinite(values).all() and np.abs(values).max() < float32_exact:
+        return _typed(values, "f4")
+    return _typed(values, "f8")
+
+
+def encode_trace(trace, layout):
+    # Typed arrays in place of the trace's long arrays; date axes are marked as such since their
+    # values are now numbers
+    encoded = dict(trace)
+    for key, values in trace.items():
+        if not isinstance(values, (np.ndarray, list, tuple, pd.Series)) or len(values) < min_length:
+            continue
+        ms = _dates(values) if key in ("x", "y") else None
+        if ms is not None:
+            steps = np.diff(ms)
+            if steps[0] > 0 and (steps == steps[0]).all():
+                del encoded[key]
+                encoded[f"{key}0"] = str(pd.Timestamp(ms[0], unit="ms"))
+                encoded[f"d{key}"] = int(steps[0])
+            else:
+                encoded[key] = _typed(ms, "f8")
+            axis = trace.get(f"{key}axis", key)
+            layout.setdefault(axis[0] + "axis" + axis[1:], {})["type"] = "date"
+            continue
+        typed = _numbers(values)
+        if typed is not None:
+            encoded[key] = typed
+    return encoded
+
+
+def encode_figure(figure):
+    # Figure dict with typed arrays
+    layout = dict(figure.get("layout", {}))
+    data = [encode_trace(trace, layout) for trace in figure.get("data", [])]
+    return dict(figure, data=data, layout=layout)
+
+
+@functools.cache
+def _compact_class():
+    # Defined on first use so plotly stays a deferred import
+    class CompactFigure(go.Figure):
+        def to_dict(self):
+            return encode_figure(super().to_dict())
+
+    return CompactFigure
+
+
+def compact(fig):
+    # The same figure, serialized with typed arrays. Its class is switched rather than the figure copied:
+    # copying a go.Figure validates every array again.
+    fig.__class__ = _compact_class()
+    return fig
+
+
+def payload_bytes(fig):
+    # Serialized size of a figure as plain JSON (before) and as it is sent (after), each raw and deflated
+    # as the compressed websocket sends it. Figures that are not compact() are sent as plain JSON.
+    before = pio.to_json(go.Figure.to_dict(fig), validate=False).encode()
+    after = pio.to_json(fig.to_dict(), validate=False).encode()
+    return {"Before": len(before), "Before deflated": len(zlib.compress(before)),
+            "After": len(after), "After deflated": len(zlib.compress(after))}
+
+
+def payload_report(pages):
+    # Bytes of every chart of the pages in their default widget state
+    from utils.prerender import PAGES
+    rows = []
+    for page in pages:
+        spec = PAGES[page]
+        state = {key: default for key, (_, _, default) in spec["widgets"].items()}
+        for chart, (_, build) in spec["charts"].items():
+            fig = build(state)
+            if fig is not None:
+                rows.append({"Page": page, "Chart": chart, **payload_bytes(fig)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    from utils.prerender import PAGES
+    parser = argparse.ArgumentParser(description="Report the payload bytes of every chart before and after the "
+                                                 "typed-array encoding.")
+    parser.add_argument("--pages", nargs="*", choices=list(PAGES), help="only report these pages")
+    parser.add_argument("--budget-kb", type=float,
+                        help="exit 1 if a page's deflated payload is over this many KB")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    df = payload_report(args.pages or list(PAGES))
+    sizes = ["Before", "Before deflated", "After", "After deflated"]
+    pages = df.groupby("Page", sort=False)[sizes].sum().reset_index().assign(Chart="(page total)")
+    report = pd.concat([df, pages], ignore_index=True)
+    report[sizes] = (report[sizes] / 1024).round(1)
+    report["Reduction"] = (report["Before"] / report["After deflated"]).round(1).astype(str) + "x"
+    print("Payload per chart (KB):")
+    print(report.sort_values("Page", kind="stable").to_string(index=False))
+    if args.budget_kb is not None:
+        over = pages[pages["After deflated"] > args.budget_kb * 1024]
+        for page, size in zip(over["Page"], over["After deflated"]):
+            print(f"{page}: {size / 1024:.1f} KB deflated, over the {args.budget_kb:g} KB budget")
+        sys.exit(1 if len(over) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""Prerender every widget state of the dashboard into a static bundle.
+
+Run from the open_ended_question directory:
+
+    python -m utils.prerender --out static --workers 4
+
+The bundle holds one figure JSON per (chart, widget state), a manifest describing
+the widgets and where each figure lives, and an index.html that swaps figures in
+as widgets change, so any static file server can host it.
+
+Widgets with continuous or open-ended values are held at one setting, listed
+per page under "fixed" and shown above the page's charts: the sidebar date
+ranges cover all the data, and page 3's serial interval and scenario dates and
+page 5's bootstrap settings keep their defaults. Pages 7-10 are only in the live
+dashboard (dynamic_pages), as their inputs (free-form SQL, pairs of series,
+forecast targets, county selections) cannot be enumerated.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import charts
+from utils.correlation import (correlation_bands, default_block_length, default_lags, default_resamples,
+                               information_analyses, information_lags, lag_analyses, lagged_correlations)
+from utils.data import (canada_geojson, combined_national, data_version, national_case_columns,
+                        national_index_columns, regional_df, us_geojson)
+from utils.dtw import (cluster_trajectories, country_clusters, default_band_days, default_clusters,
+                       policy_clusters)
+from utils.hierarchy import census_groups, policy_split, region_rollup
+from utils.indicators import index_columns
+from utils.indices import indicators, scenario_changes, what_if
+from utils.joins import index_gap_vs_coverage
+from utils.rollups import national_view, vaccination_status_view, vaccination_view
+from utils.rt import default_si_mean, default_si_sd, rt_frame
+
+slider_dates = [d.strftime("%Y-%m-%d") for d in pd.date_range("2020-01-01", "2022-12-31")]
+on_off = [False, True]
+cluster_counts = list(range(2, 9))
+index_options = list(charts.index_names.items())
+rt_indexes = {'Government Response Index': 'GovernmentResponseIndex_WeightedAverage',
+              **{name: index for index, name in index_options}}
+scenario_indicators = {column: code for code, (column, _, _) in indicators.items()}
+scenario_levels = list(range(max(level for _, level, _ in indicators.values()) + 1))
+scenario_start = "2021-03-01"
+whole_range = "whole time range of the data"
+# Text shown for a state with nothing to draw
+placeholders = {"what_if": "The indicator has no such level."}
+default_placeholder = "Please select at least one index to display."
+
+# Pages left out of the export, with the reason shown in its viewer
+dynamic_pages = {
+    "7_SQL_Query": ("SQL Query", "queries are typed in"),
+    "8_Granger_Causality_Screen": ("Granger Causality Screen", "every pair of series and lag is computed on request"),
+    "9_Case_Forecasts": ("Case Forecasts", "forecasts are fitted per chosen country or jurisdiction"),
+    "10_Romania_Counties": ("Romania Counties", "any set of counties can be chosen"),
+}
+
+# Geojson is written once and referenced by URL from every map figure
+geojson_files = {"US": ("geojson/us-states.json", us_geojson), "Canada": ("geojson/canada.json", canada_geojson)}
+
+
+def _overall(column, kind):
+    return lambda state: kind(national_view(national_case_columns, labels={'Canada': 'CAN'}), column)
+
+
+def _overall_box(column):
+    return lambda state: charts.daily_box(combined_national(national_case_columns, labels={'Canada': 'CAN'}), column)
+
+
+def _region_map(country, column, widget):
+    def build(state):
+        df = regional_df(country)
+        chosen_date = pd.to_datetime(state[widget])
+        path, _ = geojson_files[country]
+        return charts.region_map(df[df['Date'] == chosen_date], path, country, column)
+    return build
+
+
+def _cluster_map(country):
+    def build(state):
+        clusters, _ = policy_clusters(state["n_clusters"], default_band_days, data_version())
+        path, _ = geojson_files[country]
+        return charts.cluster_map(country_clusters(clusters, country), path, country)
+    return build
+
+
+def _group_lines(state):
+    rollup = region_rollup(data_version())
+    if state["grouping"] == "Census regions":
+        group_df = rollup.rollup(census_groups())
+    else:
+        group_df = policy_split(rollup, 'C6E_Stay at home requirements', 2, "C6E")
+    return charts.group_lines(group_df, state["group_measure"])
+
+
+def _what_if(state):
+    # The page's scenario applied from scenario_start to the end of the data; levels past the indicator's
+    # maximum are not offered by the page
+    code = scenario_indicators[state["scenario_indicator"]]
+    if state["scenario_level"] > indicators[code][1]:
+        return None
+    change = {description: change for change, description in scenario_changes.items()}[state["scenario_change"]]
+    end = combined_national(national_index_columns)['Date'].max()
+    scenario = [{"indicator": code, change: state["scenario_level"], "start": scenario_start, "end": end}]
+    index = dict((n, i) for i, n in index_options)[state["scenario_index"]]
+    description = f"{state['scenario_indicator']} {state['scenario_change'].lower()} {state['scenario_level']} " \
+                  f"from {scenario_start} to {end:%Y-%m-%d}"
+    return charts.index_scenario(what_if(scenario), index, state["scenario_index"], description)
+
+
+def _selected_indexes(rate, widgets):
+    def build(state):
+        selected = [index for (index, _), widget in zip(index_options, widgets) if state[widget]]
+        if not selected:
+            return None
+        return charts.rate_with_selected_indexes(national_view(national_index_columns), rate, selected)
+    return build
+
+
+def _lag(method, selected_index, rate):
+    def build(state):
+        curves = {c: lagged_correlations(c, selected_index, rate, default_lags, method) for c in charts.COUNTRIES}
+        bands = {c: correlation_bands(c, selected_index, rate, default_lags, method, default_resamples,
+                                      default_block_length, 1)
+                 for c in charts.COUNTRIES}
+        return charts.lag_correlation(method, selected_index, rate, curves, bands)
+    return build
+
+
+def _information(selected_index, rate):
+    def build(state):
+        curves = {c: lagged_correlations(c, selected_index, rate, information_lags, "ksg") for c in charts.COUNTRIES}
+        return charts.lag_correlation("ksg", selected_index, rate, curves)
+    return build
+
+
+def _vaccination_status(country, index, column):
+    return lambda state: charts.vaccination_status_line(vaccination_status_view(country, index), country, column)
+
+
+# Each page lists its widgets (key -> label, options, default) and its charts, with the
+# widgets a chart depends on, so states are enumerated per chart rather than per page.
+# "fixed" gives the setting of each widget the export does not enumerate.
+PAGES = {
+    "1_Deaths_and_Cases_Overall": {
+        "title": "Deaths and Cases Overall",
+        "fixed": {"Dates": whole_range},
+        "widgets": {},
+        "charts": {
+            "cases": ([], _overall('CasesPerCapita', charts.cumulative_line)),
+            "deaths": ([], _overall('DeathsPerCapita', charts.cumulative_line)),
+            "daily_cases": ([], _overall('DailyCaseRate', charts.daily_scatter)),
+            "daily_deaths": ([], _overall('DailyDeathRate', charts.daily_scatter)),
+            "box_cases": ([], _overall_box('DailyCaseRate')),
+            "box_deaths": ([], _overall_box('DailyDeathRate')),
+        },
+    },
+    "2_Deaths_and_Cases_Regionwise": {
+        "title": "Deaths and Cases Regionwise",
+        "widgets": {
+            "slider_for_chosen_date_case": ("Date", slider_dates, "2021-01-01"),
+            "slider_for_chosen_date_death": ("Date", slider_dates, "2021-01-01"),
+            "n_clusters": ("Number of clusters", cluster_counts, default_clusters),
+            "grouping": ("Group the regions by", ["Census regions", "Stay-at-home requirements (C6E) of at least 2"],
+                         "Census regions"),
+            "group_measure": ("Measure", list(charts.group_measures), "CasesPer100K"),
+        },
+        "charts": {
+            "us_case": (["slider_for_chosen_date_case"],
+                        _region_map('US', 'CasesPer100K', "slider_for_chosen_date_case")),
+            "can_case": (["slider_for_chosen_date_case"],
+                         _region_map('Canada', 'CasesPer100K', "slider_for_chosen_date_case")),
+            "us_death": (["slider_for_chosen_date_death"],
+                         _region_map('US', 'DeathsPer100K', "slider_for_chosen_date_death")),
+            "can_death": (["slider_for_chosen_date_death"],
+                          _region_map('Canada', 'DeathsPer100K', "slider_for_chosen_date_death")),
+            "us_clusters": (["n_clusters"], _cluster_map('US')),
+            "can_clusters": (["n_clusters"], _cluster_map('Canada')),
+            "cluster_levels": (["n_clusters"], lambda s: charts.cluster_trajectories(
+                cluster_trajectories(s["n_clusters"], default_band_days, data_version()))),
+            "group_lines": (["grouping", "group_measure"], _group_lines),
+        },
+    },
+    "3_OxCGRT_Index_Overall": {
+        "title": "OxCGRT Index Overall",
+        "fixed": {"Dates": whole_range, "Serial interval": f"mean {default_si_mean} days, sd {default_si_sd} days",
+                  "Applies from / to": f"{scenario_start} to the end of the data"},
+        "widgets": {
+            "stringency": ("Stringency Index", on_off, True),
+            "containment": ("Containment Health Index", on_off, False),
+            "economic": ("Economic Support Index", on_off, False),
+            "stringency_death": ("Stringency Index", on_off, True),
+            "containment_death": ("Containment Health Index", on_off, False),
+            "economic_death": ("Economic Support Index", on_off, False),
+            "box_index": ("Select an Index to Display Boxplot:", [name for _, name in index_options],
+                          "Stringency Index"),
+            "rt_index": ("Index to Display with Rt", list(rt_indexes), "Government Response Index"),
+            "scenario_indicator": ("Indicator", list(scenario_indicators), indicators["C6E"][0]),
+            "scenario_change": ("Change", list(scenario_changes.values()), scenario_changes["cap"]),
+            "scenario_level": ("Level", scenario_levels, 1),
+            "scenario_index": ("Index", [name for _, name in index_options], index_options[0][1]),
+        },
+        "charts": {
+            "cases_gov": ([], lambda s: charts.rate_with_government_response(
+                national_view(national_index_columns), 'DailyCaseRate')),
+            "deaths_gov": ([], lambda s: charts.rate_with_government_response(
+                national_view(national_index_columns), 'DailyDeathRate')),
+            "box_gov": ([], lambda s: charts.index_box(
+                combined_national(national_index_columns), 'GovernmentResponseIndex_WeightedAverage',
+                'Government Response Index')),
+            "cases_indexes": (["stringency", "containment", "economic"],
+                              _selected_indexes('DailyCaseRate', ["stringency", "containment", "economic"])),
+            "deaths_indexes": (["stringency_death", "containment_death", "economic_death"],
+                               _selected_indexes('DailyDeathRate',
+                                                 ["stringency_death", "containment_death", "economic_death"])),
+            "rt_index": (["rt_index"], lambda s: charts.rt_with_index(
+                rt_frame(charts.COUNTRIES), national_view(national_index_columns), rt_indexes[s["rt_index"]],
+                s["rt_index"])),
+            "box_index": (["box_index"], lambda s: charts.index_box(
+                combined_national(national_index_columns), dict((n, i) for i, n in index_options)[s["box_index"]],
+                s["box_index"])),
+            "what_if": (["scenario_indicator", "scenario_change", "scenario_level", "scenario_index"], _what_if),
+        },
+    },
+    "4_OxCGRT_Index_Specific_Policy": {
+        "title": "OxCGRT Index Specific Policy",
+        "fixed": {"Dates": whole_range},
+        "widgets": {
+            "selected_index": ("Select an Index", index_columns, index_columns[0]),
+        },
+        "charts": {
+            "cases_indexes": (["selected_index"], lambda s: charts.rate_with_policy(
+                national_view(national_index_columns), 'DailyCaseRate', s["selected_index"])),
+            "deaths_indexes": (["selected_index"], lambda s: charts.rate_with_policy(
+                national_view(national_index_columns), 'DailyDeathRate', s["selected_index"])),
+            "rt_index": (["selected_index"], lambda s: charts.rt_with_index(
+                rt_frame(charts.COUNTRIES), national_view(national_index_columns), s["selected_index"],
+                s["selected_index"])),
+        },
+    },
+    "5_OxCGRT_Economic_Support_Analysis": {
+        "title": "OxCGRT Economic Support Analysis",
+        "fixed": {"Show 95% block-bootstrap bands": "on", "Bootstrap resamples": default_resamples,
+                  "Block length (days)": default_block_length},
+        "widgets": {},
+        "charts": {
+            f"{method}_{selected_index[:2]}_{rate}": ([], _lag(method, selected_index, rate))
+            for method, selected_index in lag_analyses
+            for rate in ['DailyCaseRate', 'DailyDeathRate']
+        } | {
+            f"ksg_{selected_index[:2]}_{rate}": ([], _information(selected_index, rate))
+            for selected_index in information_analyses
+            for rate in ['DailyCaseRate', 'DailyDeathRate']
+        },
+    },
+    "6_Vaccinations_Analysis": {
+        "title": "Vaccinations Analysis",
+        "fixed": {"Dates": whole_range},
+        "widgets": {},
+        "charts": {
+            **{column: ([], lambda s, column=column: charts.vaccination_line(vaccination_view(), column))
+               for column in charts.vaccination_charts},
+            "gr_canada": ([], _vaccination_status("Canada", "GovernmentResponseIndex", "government_response_index")),
+            "gr_us": ([], _vaccination_status("US", "GovernmentResponseIndex", "government_response_index")),
+            "ch_canada": ([], _vaccination_status("Canada", "ContainmentHealthIndex", "containment_health_index")),
+            "ch_us": ([], _vaccination_status("US", "ContainmentHealthIndex", "containment_health_index")),
+            "gap_gr": ([], lambda s: charts.index_gap_vs_coverage(index_gap_vs_coverage("GovernmentResponseIndex"),
+                                                                  "GovernmentResponseIndex")),
+            "gap_ch": ([], lambda s: charts.index_gap_vs_coverage(index_gap_vs_coverage("ContainmentHealthIndex"),
+                                                                  "ContainmentHealthIndex")),
+        },
+    },
+}
+
+
+def chart_states(page, chart):
+    # Every combination of the chart's own widgets, as (option positions, {key: value})
+    widgets = PAGES[page]["widgets"]
+    keys, _ = PAGES[page]["charts"][chart]
+    domains = [range(len(widgets[key][1])) for key in keys]
+    for positions in itertools.product(*domains):
+        yield positions, {key: widgets[key][1][p] for key, p in zip(keys, positions)}
+
+
+def figure_path(page, chart, positions):
+    slug = "-".join(str(p) for p in positions) or "default"
+    return f"figures/{page}/{chart}/{slug}.json"
+
+
+def render(task):
+    out, page, chart, positions, state = task
+    fig = PAGES[page]["charts"][chart][1](state)
+    if fig is None:
+        return page, chart, positions, 0
+    path = os.path.join(out, figure_path(page, chart, positions))
+    # The default template is shared by every figure, so it is written once as template.json
+    fig.update_layout(template=None)
+    payload = fig.to_json()
+    with open(path, "w") as f:
+        f.write(payload)
+    return page, chart, positions, len(payload)
+
+
+def build_manifest(pages):
+    manifest = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "pages": []}
+    for page in pages:
+        spec = PAGES[page]
+        manifest["pages"].append({
+            "id": page,
+            "title": spec["title"],
+            "fixed": spec.get("fixed", {}),
+            "widgets": {key: {"label": label, "options": options, "default": options.index(default)}
+                        for key, (label, options, default) in spec["widgets"].items()},
+            "charts": [{"name": chart, "widgets": keys, "path": f"figures/{page}/{chart}/{{state}}.json",
+                        "placeholder": placeholders.get(chart, default_placeholder)}
+                       for chart, (keys, _) in spec["charts"].items()],
+        })
+    manifest["dynamic"] = [{"id": page, "title": title, "reason": reason}
+                           for page, (title, reason) in dynamic_pages.items()]
+    return manifest
+
+
+def prerender(out, pages=None, workers=None):
+    pages = pages or list(PAGES)
+    os.makedirs(os.path.join(out, "geojson"), exist_ok=True)
+    for path, loader in geojson_files.values():
+        with open(os.path.join(out, path), "w") as f:
+            json.dump(loader(), f)
+    with open(os.path.join(out, "template.json"), "w") as f:
+        json.dump(json.loads(charts.go.Figure().to_json())["layout"]["template"], f)
+
+    tasks = []
+    for page in pages:
+        for chart in PAGES[page]["charts"]:
+            os.makedirs(os.path.join(out, "figures", page, chart), exist_ok=True)
+            tasks.extend((out, page, chart, positions, state) for positions, state in chart_states(page, chart))
+
+    start = time.perf_counter()
+    manifest = build_manifest(pages)
+    missing = {}
+    total_bytes = 0
+    # Spawned rather than forked workers: numba (pulled in by dcor) can deadlock after a fork.
+    # Each worker loads its datasets once through the st.cache_data loaders.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for page, chart, positions, size in pool.map(render, tasks, chunksize=32):
+            total_bytes += size
+            if size == 0:
+                missing.setdefault((page, chart), []).append("-".join(str(p) for p in positions))
+    elapsed = time.perf_counter() - start
+
+    # States with nothing to draw (e.g. no index ticked) show the chart's placeholder text
+    for page in manifest["pages"]:
+        for chart in page["charts"]:
+            chart["missing"] = missing.get((page["id"], chart["name"]), [])
+    with open(os.path.join(out, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    shutil.copy(os.path.join(os.path.dirname(__file__), "prerender_index.html"), os.path.join(out, "index.html"))
+
+    print(f"{len(tasks)} figures, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({len(tasks) / elapsed:.0f} figures/s) -> {out}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prerender every dashboard widget state to a static bundle.")
+    parser.add_argument("--out", default="static", help="output directory for the bundle")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--pages", nargs="*", choices=list(PAGES), help="only prerender these pages")
+    args = parser.parse_args()
+    prerender(args.out, args.pages, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Per-page import time profiler.
+
+Each page's import statements are replayed in a fresh interpreter under
+``python -X importtime`` and the cost is reported per top-level module. Run from
+the open_ended_question directory:
+
+    python -m utils.profile_imports            # report
+    python -m utils.profile_imports --check    # exit 1 on an import-time regression
+
+--check fails when a page's imports pull in one of the modules that should only
+be loaded on first use (utils.lazy.deferred_modules), or take longer than
+--budget seconds over a bare ``import streamlit, pandas, numpy``.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from utils.lazy import deferred_modules
+
+baseline_imports = "import streamlit, pandas, numpy"
+
+
+def page_files():
+    return ["Home.py"] + sorted(glob.glob(os.path.join("pages", "*.py")))
+
+
+def page_imports(path):
+    # Only the top-level import statements of the page, not the page itself
+    tree = ast.parse(open(path).read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def profile(source):
+    # Run the imports in a fresh interpreter and return (total seconds, {module: seconds}, loaded deferred modules)
+    probe = source + f"\nimport sys, json\nprint(json.dumps([m for m in {deferred_modules!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True,
+                            cwd=os.getcwd(), check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries (no indentation) are the imports made directly by the source
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative) / 1e6
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return sum(modules.values()), modules, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module for every dashboard page.")
+    parser.add_argument("--top", type=int, default=5, help="modules to list per page")
+    parser.add_argument("--check", action="store_true", help="fail on deferred modules or over-budget imports")
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="seconds a page's imports may add on top of streamlit, pandas and numpy")
+    args = parser.parse_args()
+
+    baseline, baseline_modules, already_loaded = profile(baseline_imports)
+    print(f"{'baseline (' + baseline_imports + ')':<45} {baseline:7.3f}s")
+
+    failures = []
+    for path in page_files():
+        total, modules, loaded = profile(baseline_imports + "\n" + page_imports(path))
+        extra = total - baseline
+        print(f"{path:<45} {total:7.3f}s  ({extra:+.3f}s)")
+        own = {name: seconds for name, seconds in modules.items() if name not in baseline_modules}
+        for name, seconds in sorted(own.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:<41} {seconds:7.3f}s")
+        eager = sorted(set(loaded) - set(already_loaded))
+        if eager:
+            print(f"    eagerly imported: {', '.join(eager)}")
+            failures.append(f"{path} imports {', '.join(eager)} at startup")
+        if extra > args.budget:
+            failures.append(f"{path} imports take {extra:.3f}s over the baseline (budget {args.budget}s)")
+
+    # What the deferred modules would cost if they were imported up front
+    print("deferred modules (cost on first use):")
+    for name in deferred_modules:
+        if name in already_loaded:
+            continue
+        seconds, _, _ = profile(baseline_imports + f"\nimport {name}")
+        print(f"    {name:<41} {seconds - baseline:7.3f}s")
+
+    if args.check and failures:
+        print("\n".join(["", "Import-time check failed:"] + failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Batch report of every chart on pages 1-6 as static images and one PDF.
+
+Run from the open_ended_question directory:
+
+    python -m utils.report --out report --formats png svg pdf --workers 4
+
+The charts and their widget states are those of the static export
+(utils.prerender.PAGES). Both countries are drawn on every chart. Page 2's maps
+show every state and province and are rendered on the first of each month, and
+every index of page 4 is covered. Figures are rendered by kaleido, a headless
+Chromium bundled as a Python package, on a process pool. Each worker starts one
+renderer and reuses it for all of its charts. The pdf format is a single
+report.pdf with one chart per page, assembled from the PNGs.
+
+A chart is only rendered again when its inputs change. Its figure, which holds
+the data drawn, the layout and the widget state, is hashed together with the
+content of the geojson its maps reference by URL, and report.json in the output
+directory records the hash of every image from the previous run.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.prerender import PAGES, chart_states, geojson_files, slider_dates
+
+formats = ["png", "svg", "pdf"]
+scale = 2
+default_width = 1000
+default_height = 600
+# Date sliders are sampled on these dates rather than every day
+report_dates = [d for d in slider_dates if d.endswith("-01")]
+
+# Renderer of this worker process, started by _start_renderer
+_renderer = None
+
+
+def _start_renderer():
+    global _renderer
+    from kaleido.scopes.plotly import PlotlyScope
+    import plotly
+
+    # plotly.js from the installed plotly, and no MathJax, so nothing is fetched to render a chart
+    plotlyjs = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+    _renderer = PlotlyScope(plotlyjs=plotlyjs, mathjax=False)
+    _renderer.default_width = default_width
+    _renderer.default_height = default_height
+
+
+def report_states(page, chart):
+    # The chart's widget states, with date sliders limited to report_dates
+    for positions, state in chart_states(page, chart):
+        if all(value in report_dates for value in state.values() if value in slider_dates):
+            yield positions, state
+
+
+def image_path(page, chart, positions, extension):
+    slug = "-".join(str(p) for p in positions) or "default"
+    return f"{page}/{chart}/{slug}.{extension}"
+
+
+def _inline_geojson(fig):
+    # The static export references geojson by URL; the renderer has no server to fetch it from
+    loaders = dict(geojson_files.values())
+    for trace in fig.data:
+        if isinstance(getattr(trace, "geojson", None), str) and trace.geojson in loaders:
+            trace.geojson = loaders[trace.geojson]()
+
+
+@functools.lru_cache(maxsize=None)
+def _geojson_digest(path):
+    # Hash of the geojson behind a URL of the static export, once per worker
+    loader = dict(geojson_files.values())[path]
+    return hashlib.sha256(json.dumps(loader(), sort_keys=True).encode()).hexdigest()
+
+
+def figure_digest(fig):
+    # Hash of everything the image is drawn from: the figure and the geojson it references
+    geojson = sorted({trace.geojson for trace in fig.data if isinstance(getattr(trace, "geojson", None), str)})
+    payload = f"{scale}:{fig.to_json()}:" + ",".join(_geojson_digest(path) for path in geojson)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render(task):
+    # (page, chart, positions, {extension: (path, hash)}, rendered); only images whose hash differs from the
+    # previous run's are written
+    out, page, chart, positions, state, extensions, previous = task
+    fig = PAGES[page]["charts"][chart][1](state)
+    if fig is None:
+        return page, chart, positions, {}, 0
+    digest = figure_digest(fig)
+    images = {extension: (image_path(page, chart, positions, extension), digest) for extension in extensions}
+    stale = [extension for extension, (path, _) in images.items()
+             if previous.get(path) != digest or not os.path.isfile(os.path.join(out, path))]
+    if stale:
+        _inline_geojson(fig)
+        figure = fig.to_dict()
+        for extension in stale:
+            with open(os.path.join(out, images[extension][0]), "wb") as f:
+                f.write(_renderer.transform(figure, format=extension, scale=scale))
+    return page, chart, positions, images, len(stale)
+
+
+def assemble_pdf(out, paths, name="report.pdf"):
+    # One page per PNG, in order
+    from PIL import Image
+
+    pages = [Image.open(os.path.join(out, path)).convert("RGB") for path in paths]
+    if pages:
+        pages[0].save(os.path.join(out, name), save_all=True, append_images=pages[1:], resolution=72 * scale)
+    return len(pages)
+
+
+def report(out, pages=None, requested=None, workers=None):
+    pages = pages or list(PAGES)
+    requested = requested or formats
+    # The PDF is assembled from the PNGs
+    extensions = [extension for extension in ["png", "svg"] if extension in requested or
+                  (extension == "png" and "pdf" in requested)]
+    manifest_path = os.path.join(out, "report.json")
+    previous = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)["images"]
+
+    tasks = []
+    for page in pages:
+        for chart in PAGES[page]["charts"]:
+            os.makedirs(os.path.join(out, page, chart), exist_ok=True)
+            for positions, state in report_states(page, chart):
+                paths = {image_path(page, chart, positions, extension) for extension in extensions}
+                tasks.append((out, page, chart, positions, state, extensions,
+                              {path: digest for path, digest in previous.items() if path in paths}))
+
+    start = time.perf_counter()
+    images, rendered, pngs = {}, 0, []
+    # Spawned rather than forked workers, as in utils.prerender; each starts its renderer once
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_start_renderer) as pool:
+        for page, chart, positions, chart_images, count in pool.map(render, tasks, chunksize=4):
+            rendered += count
+            images.update(dict(chart_images.values()))
+            if chart_images:
+                pngs.append(chart_images.get("png", (None,))[0])
+    elapsed = time.perf_counter() - start
+
+    if "pdf" in requested and (rendered or not os.path.isfile(os.path.join(out, "report.pdf"))):
+        assemble_pdf(out, [path for path in pngs if path])
+    with open(manifest_path, "w") as f:
+        json.dump({"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "images": images}, f)
+
+    print(f"{len(tasks)} charts, {rendered} images rendered, {len(images) - rendered} unchanged in {elapsed:.1f}s "
+          f"({len(tasks) / elapsed:.1f} charts/s) -> {out}")
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every dashboard chart to static images and a PDF.")
+    parser.add_argument("--out", default="report", help="output directory for the report")
+    parser.add_argument("--formats", nargs="*", choices=formats, default=formats, help="formats to write")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--pages", nargs="*", choices=list(PAGES), help="only render these pages")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+    report(args.out, args.pages, args.formats, args.workers)
+
+
+if __name__ == "__main__":
+    main()
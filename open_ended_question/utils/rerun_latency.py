@@ -0,0 +1,67 @@
+"""Rerun latency of a widget change: whole page script vs. its fragment section.
+
+Before the chart sections became fragments, any widget change reran the whole
+page; now it reruns only the section holding the widget. Each page is executed
+once to fill the caches, then timed as a full rerun, and every section it
+declared is timed again on its own with the inputs the page passed it. Run from
+the open_ended_question directory:
+
+    python -m utils.rerun_latency --repeats 5
+"""
+import argparse
+import glob
+import os
+import runpy
+import time
+
+import pandas as pd
+from streamlit import logger
+
+from utils import fragments
+
+
+def _run_page(path):
+    # Bare-mode run: widgets return their defaults and elements are built but not sent
+    runpy.run_path(path, run_name="__main__")
+
+
+def _best(call, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure(path, repeats):
+    fragments.recorded = {}
+    try:
+        _run_page(path)
+        full = _best(lambda: _run_page(path), repeats)
+        sections = dict(fragments.recorded)
+    finally:
+        fragments.recorded = None
+    rows = []
+    for name, (func, args, kwargs) in sections.items():
+        partial = _best(lambda: func(*args, **kwargs), repeats)
+        rows.append({"Page": os.path.basename(path), "Section": name, "Full rerun (s)": round(full, 4),
+                     "Fragment rerun (s)": round(partial, 4), "Speed-up": round(full / partial, 1)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-page and fragment rerun latency for every page.")
+    parser.add_argument("--repeats", type=int, default=5, help="timed reruns per page and section (best is kept)")
+    args = parser.parse_args()
+
+    # Bare mode warns about the missing ScriptRunContext on every widget
+    logger.set_log_level("error")
+    rows = []
+    for path in sorted(glob.glob(os.path.join("pages", "*.py"))):
+        rows += measure(path, args.repeats)
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
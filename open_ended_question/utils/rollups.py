@@ -0,0 +1,127 @@
+"""Weekly and monthly rollups of the daily series, and the choice of level for a date range.
+
+Each daily frame the time-series charts draw from has a pyramid of rollups,
+cached next to it: the daily rows, one row per id and week (Monday to Sunday)
+and one per id and month, each labelled with the period's first day. Columns
+are rolled up by what they hold:
+
+    cumulative counts          the period's last value
+    daily counts and spending  the period's sum
+    daily rates                the mean per day, so charts keep their axes, and "<column> Total"
+    indicators and indices     the mean, and "<column> Max"
+
+plus a Days column with the number of daily rows in the period. A chart or
+query over a date range uses the coarsest level that still has min_points
+periods in the range, so long ranges send and draw a fraction of the points.
+"""
+import pandas as pd
+import streamlit as st
+
+from utils.data import (COUNTRIES, index_to_scale, national_df, regional_df, vaccination_df, vaccination_iso_codes,
+                        vaccination_status_df)
+
+# Level -> pandas period frequency, finest first
+levels = {"daily": "D", "weekly": "W-SUN", "monthly": "M"}
+default_min_points = 100
+
+cumulative_columns = ['ConfirmedCases', 'ConfirmedDeaths', 'CasesPerCapita', 'DeathsPerCapita', 'CasesPer100K',
+                      'DeathsPer100K', 'total_vaccinations', 'people_vaccinated', 'people_fully_vaccinated',
+                      'total_boosters', 'cumulative_people_vaccinated', 'percent_people_vaccinated',
+                      'percent_people_fully_vaccinated', 'vaccine_administered_per_people']
+count_columns = index_to_scale + [idx + " Per 100K Population" for idx in index_to_scale] + \
+                ['daily_vaccinations', 'daily_people_vaccinated']
+rate_columns = ['DailyCaseRate', 'DailyDeathRate', 'daily_vaccinations_per_million']
+
+
+def rollup(df, level, date, ids):
+    # One row per id and period of level, columns rolled up as described above. The listed columns are
+    # rolled up by name and must be numeric; other non-numeric columns are dropped.
+    if level == "daily":
+        return df
+    listed = set(cumulative_columns + count_columns + rate_columns)
+    columns = [column for column in df.columns if column not in ids and column != date and
+               (column in listed or pd.api.types.is_numeric_dtype(df[column]))]
+    aggregations = {"Days": (date, "size")}
+    for column in columns:
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            raise TypeError(f"cannot roll up {column}: it has dtype {df[column].dtype}, not a numeric one")
+        if column in cumulative_columns:
+            aggregations[column] = (column, "last")
+        elif column in count_columns:
+            aggregations[column] = (column, "sum")
+        elif column in rate_columns:
+            aggregations[column] = (column, "mean")
+            aggregations[f"{column} Total"] = (column, "sum")
+        else:
+            aggregations[column] = (column, "mean")
+            aggregations[f"{column} Max"] = (column, "max")
+    period = df[date].dt.to_period(levels[level]).dt.start_time.rename(date)
+    rolled = df.sort_values(date).groupby(ids + [period], sort=True, observed=True).agg(**aggregations)
+    return rolled.reset_index()
+
+
+def pyramid(df, date, ids):
+    return {level: rollup(df, level, date, ids) for level in levels}
+
+
+@st.cache_data
+def national_rollups(country, dropna_columns=None):
+    return pyramid(national_df(country, dropna_columns), 'Date', ['Country'])
+
+
+@st.cache_data
+def regional_rollups(country):
+    return pyramid(regional_df(country), 'Date', ['RegionCode'])
+
+
+@st.cache_data
+def vaccination_rollups(iso_code, skip_days=0):
+    # skip_days drops the first days, as combined_vaccinations does
+    return pyramid(vaccination_df(iso_code).iloc[skip_days:], 'date', ['iso_code'])
+
+
+@st.cache_data
+def vaccination_status_rollups(country, index):
+    return pyramid(vaccination_status_df(country, index), 'date', ['vaccination_status'])
+
+
+def choose_level(start, end, min_points=default_min_points):
+    # Coarsest level with at least min_points periods from start to end (daily if none has)
+    for level, freq in reversed(levels.items()):
+        if len(pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq=freq)) >= min_points:
+            return level
+    return "daily"
+
+
+def in_range(df, date, level, start=None, end=None):
+    # Rows of the periods that overlap start..end
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[date] >= pd.Timestamp(start).to_period(levels[level]).start_time
+    if end is not None:
+        mask &= df[date] <= pd.Timestamp(end)
+    return df[mask]
+
+
+def _view(pyramids, date, start, end, level):
+    # Pyramids stacked at the level (chosen from the range when None) and cut to the range
+    if level is None:
+        daily = pd.concat([p["daily"][date] for p in pyramids])
+        level = choose_level(start or daily.min(), end or daily.max())
+    return pd.concat([in_range(p[level], date, level, start, end) for p in pyramids], ignore_index=True)
+
+
+def national_view(dropna_columns=None, start=None, end=None, level=None, labels=None):
+    # combined_national over a date range at a rollup level
+    df = _view([national_rollups(country, dropna_columns) for country in COUNTRIES], 'Date', start, end, level)
+    return df.assign(Country=df['Country'].replace(labels)) if labels else df
+
+
+def vaccination_view(start=None, end=None, level=None):
+    # combined_vaccinations over a date range at a rollup level
+    return _view([vaccination_rollups(iso_code, 15) for iso_code in vaccination_iso_codes.values()], 'date', start,
+                 end, level)
+
+
+def vaccination_status_view(country, index, start=None, end=None, level=None):
+    return _view([vaccination_status_rollups(country, index)], 'date', start, end, level)
@@ -0,0 +1,147 @@
+"""Effective reproduction number (Rt) of every nation, state and province.
+
+Rt is estimated with the renewal equation of Cori et al. (2013). New cases on
+day t are expected to be Rt times the infectiousness of the earlier cases,
+
+    Lambda_t = sum_s I_(t-s) w_s
+
+with I the daily new cases and w the serial interval distribution: a gamma
+distribution with the given mean and standard deviation, discretized to whole
+days. Rt is assumed constant over a trailing window of window_days. With a
+gamma prior, its posterior is gamma as well:
+
+    shape = prior_shape + sum of I over the window
+    scale = 1 / (1 / prior_scale + sum of Lambda over the window)
+
+There is no loop over regions. The daily new cases of every jurisdiction are
+one (jurisdictions, days) array. Lambda is a single product of its sliding
+windows with w, the window sums are differences of cumulative sums, and the
+posterior quantiles are one vectorized gamma ppf. Windows with fewer than
+min_cases new cases are left out, since their estimates are mostly prior. Run
+from the open_ended_question directory for timings and the latest estimates:
+
+    python -m utils.rt --si-mean 4.7 --si-sd 2.9
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.lazy import lazy_import
+from utils.panel import jurisdiction_panel
+
+stats = lazy_import("scipy.stats")
+
+# Serial interval of SARS-CoV-2 (days), Nishiura et al. (2020)
+default_si_mean = 4.7
+default_si_sd = 2.9
+max_serial_days = 21
+window_days = 7
+prior_shape = 1.0
+prior_scale = 5.0
+min_cases = 12
+# Two-sided posterior interval -> (lower, upper) quantiles
+interval_levels = {50: (0.25, 0.75), 95: (0.025, 0.975)}
+
+
+def serial_interval(mean=default_si_mean, sd=default_si_sd, max_days=max_serial_days):
+    # w_1..w_max_days: probability that the serial interval rounds to each whole day, normalized over them
+    shape, scale = (mean / sd) ** 2, sd ** 2 / mean
+    edges = stats.gamma.cdf(np.arange(0.5, max_days + 1), shape, scale=scale)
+    w = np.diff(edges)
+    return w / w.sum()
+
+
+def daily_incidence(cumulative):
+    # New cases per day of (units, days) cumulative counts; corrections below the previous day count as 0, and so
+    # does the first report, whose total is not a single day's cases
+    previous = np.concatenate([cumulative[..., :1], cumulative[..., :-1]], axis=-1)
+    return np.where(previous > 0, cumulative - previous, 0).clip(min=0)
+
+
+def infectiousness(incidence, w):
+    # Lambda_t = sum_s I_(t-s) w_s for every unit and day: each day's window of the previous len(w) days
+    # (zero before the first) times the reversed serial interval
+    padded = np.pad(incidence, [(0, 0)] * (incidence.ndim - 1) + [(len(w), 0)])
+    return sliding_window_view(padded[..., :-1], len(w), axis=-1) @ w[::-1]
+
+
+def _window_sums(values, window):
+    total = np.cumsum(values, axis=-1)
+    total[..., window:] = total[..., window:] - total[..., :-window]
+    return total
+
+
+def estimate_rt(incidence, w, window=window_days):
+    # Posterior mean and {level: (lower, upper)} intervals of Rt, (units, days) arrays, NaN where the window has
+    # fewer than min_cases cases or no earlier cases to cause them
+    cases = _window_sums(incidence, window)
+    pressure = _window_sums(infectiousness(incidence, w), window)
+    shape = prior_shape + cases
+    with np.errstate(divide="ignore"):
+        scale = 1 / (1 / prior_scale + pressure)
+    defined = (cases >= min_cases) & (pressure > 0)
+    defined[..., :window] = False
+    mean = np.where(defined, shape * scale, np.nan)
+    intervals = {}
+    for level, (lower, upper) in interval_levels.items():
+        bounds = stats.gamma.ppf(np.reshape([lower, upper], (2,) + (1,) * shape.ndim), shape, scale=scale)
+        intervals[level] = tuple(np.where(defined, bound, np.nan) for bound in bounds)
+    return mean, intervals
+
+
+@st.cache_data
+def rt_panel(si_mean=default_si_mean, si_sd=default_si_sd, window=window_days):
+    # (units, dates, mean, intervals) for every jurisdiction of jurisdiction_panel
+    units, dates, values = jurisdiction_panel(('ConfirmedCases',))
+    mean, intervals = estimate_rt(daily_incidence(values[:, 0]), serial_interval(si_mean, si_sd), window)
+    return units, dates, mean, intervals
+
+
+def rt_frame(countries, region="", start=None, end=None, si_mean=default_si_mean, si_sd=default_si_sd):
+    # Country, Date, Rt and its interval bounds ("Lower 95%", "Upper 95%", ...) of one region ("" for the
+    # nation) of each country over start..end
+    units, dates, mean, intervals = rt_panel(si_mean, si_sd)
+    days = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        days &= dates >= pd.Timestamp(start)
+    if end is not None:
+        days &= dates <= pd.Timestamp(end)
+    frames = []
+    for country in countries:
+        unit = units.index((country, region))
+        df = pd.DataFrame({"Country": country, "Date": dates[days], "Rt": mean[unit, days]})
+        for level, (lower, upper) in intervals.items():
+            df[f"Lower {level}%"], df[f"Upper {level}%"] = lower[unit, days], upper[unit, days]
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Rt estimation of every jurisdiction.")
+    parser.add_argument("--si-mean", type=float, default=default_si_mean, help="serial interval mean (days)")
+    parser.add_argument("--si-sd", type=float, default=default_si_sd, help="serial interval standard deviation")
+    parser.add_argument("--window", type=int, default=window_days, help="days Rt is held constant over")
+    args = parser.parse_args()
+    from streamlit import logger
+    logger.set_log_level("error")
+
+    units, dates, values = jurisdiction_panel.__wrapped__(('ConfirmedCases',))
+    incidence = daily_incidence(values[:, 0])
+    w = serial_interval(args.si_mean, args.si_sd)
+    estimate_rt(incidence, w, args.window)  # scipy's first call is not timed
+    start = time.perf_counter()
+    mean, intervals = estimate_rt(incidence, w, args.window)
+    print(f"Rt of {len(units)} jurisdictions x {len(dates)} days with 50% and 95% intervals "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    lower, upper = intervals[95]
+    print(pd.DataFrame({"Country": [u[0] for u in units], "Region": [u[1] or "National" for u in units],
+                        "Rt": mean[:, -1], "95% lower": lower[:, -1], "95% upper": upper[:, -1]})
+          .round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Embedded SQL over the OxCGRT and vaccination data.
+
+The CSVs are converted once into Parquet stores (data/parquet/, rebuilt when a
+CSV changes), sorted by date so each row group covers a narrow date range.
+DuckDB queries them in place: only the columns a query uses are read, and WHERE
+filters and GROUP BYs run inside the scan, so a query returns its result set
+instead of a whole frame. Tables:
+
+    oxcgrt        every row of both OxCGRT extracts, with a Country column and Date as a DATE
+    vaccinations  vaccinations.csv with date as a DATE
+    oxcgrt_global the per-country Parquet of a full release, once utils.ingest has written data/global/
+
+    from utils.sql import sql
+    sql("SELECT RegionCode, max(ConfirmedCases) FROM oxcgrt "
+        "WHERE Country = 'Canada' AND Jurisdiction = 'STATE_TOTAL' GROUP BY RegionCode")
+"""
+import os
+import threading
+
+import streamlit as st
+
+from utils.data import COUNTRIES, DATA_DIR, data_version
+from utils.ingest import GLOBAL_DIR
+from utils.lazy import lazy_import
+
+duckdb = lazy_import("duckdb")
+
+STORE_DIR = os.path.join(DATA_DIR, "parquet")
+
+example_queries = {
+    "Peak daily national cases per country":
+        "SELECT Country, max(ConfirmedCases - prev) AS peak_daily_cases\n"
+        "FROM (SELECT Country, ConfirmedCases,\n"
+        "             lag(ConfirmedCases) OVER (PARTITION BY Country ORDER BY Date) AS prev\n"
+        "      FROM oxcgrt WHERE Jurisdiction = 'NAT_TOTAL')\n"
+        "GROUP BY Country",
+    "Regions with the highest average stringency in 2021":
+        "SELECT Country, RegionName, avg(StringencyIndex_WeightedAverage) AS avg_stringency\n"
+        "FROM oxcgrt\n"
+        "WHERE Jurisdiction = 'STATE_TOTAL' AND Date BETWEEN DATE '2021-01-01' AND DATE '2021-12-31'\n"
+        "GROUP BY Country, RegionName\n"
+        "ORDER BY avg_stringency DESC\n"
+        "LIMIT 10",
+    "Monthly vaccinated vs. non-vaccinated government response gap":
+        "SELECT Country, date_trunc('month', Date) AS month,\n"
+        "       avg(GovernmentResponseIndex_Vaccinated - GovernmentResponseIndex_NonVaccinated) AS gap\n"
+        "FROM oxcgrt\n"
+        "WHERE Jurisdiction = 'NAT_TOTAL' AND GovernmentResponseIndex_Vaccinated IS NOT NULL\n"
+        "GROUP BY ALL ORDER BY Country, month",
+    "Fully vaccinated share at the end of each year":
+        "SELECT iso_code, year(date) AS year, max(people_fully_vaccinated) AS people_fully_vaccinated\n"
+        "FROM vaccinations GROUP BY ALL ORDER BY iso_code, year",
+}
+
+
+def _stale(store, source):
+    return not os.path.exists(store) or os.path.getmtime(store) < os.path.getmtime(source)
+
+
+def _build_stores(con):
+    # CSV -> Parquet, sorted by date; only stores older than their CSV are rewritten
+    os.makedirs(STORE_DIR, exist_ok=True)
+    stores = {}
+    for country, info in COUNTRIES.items():
+        source = os.path.join(DATA_DIR, info["file"])
+        store = os.path.join(STORE_DIR, f"oxcgrt_{country}.parquet")
+        if _stale(store, source):
+            con.execute(f"""
+                COPY (SELECT '{country}' AS Country,
+                             * REPLACE (strptime(CAST(Date AS VARCHAR), '%Y%m%d')::DATE AS Date)
+                      FROM read_csv('{source}', header = true, sample_size = -1)
+                      ORDER BY Date)
+                TO '{store}' (FORMAT parquet)""")
+        stores.setdefault("oxcgrt", []).append(store)
+    source = os.path.join(DATA_DIR, "vaccinations.csv")
+    store = os.path.join(STORE_DIR, "vaccinations.parquet")
+    if _stale(store, source):
+        con.execute(f"""
+            COPY (SELECT * REPLACE (CAST(date AS DATE) AS date)
+                  FROM read_csv('{source}', header = true, sample_size = -1)
+                  ORDER BY date)
+            TO '{store}' (FORMAT parquet)""")
+    stores["vaccinations"] = [store]
+    return stores
+
+
+@st.cache_resource
+def connection(version):
+    # In-memory database whose tables are views over the Parquet stores, so nothing is loaded up front.
+    # Keyed by the data version, so replacing a CSV rebuilds its store and opens a new database.
+    con = duckdb.connect()
+    for table, files in _build_stores(con).items():
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet({files!r}, union_by_name = true)")
+    if os.path.isdir(GLOBAL_DIR):
+        files = os.path.join(GLOBAL_DIR, "*", "*.parquet")
+        con.execute(f"CREATE VIEW oxcgrt_global AS SELECT * FROM read_parquet('{files}', hive_partitioning = true)")
+    return con
+
+
+_local = threading.local()
+
+
+def _cursor():
+    # DuckDB connections are not shared between threads; each thread gets its own cursor on the database
+    con = connection(data_version())
+    if getattr(_local, "con", None) is not con:
+        _local.con = con
+        _local.cursor = con.cursor()
+    return _local.cursor
+
+
+def sql(query, params=None):
+    # Result of one query as a DataFrame
+    return _cursor().execute(query, params).df()
+
+
+def explain(query):
+    # Physical plan, showing the projections and filters pushed into the Parquet scans
+    return "\n".join(row[1] for row in _cursor().execute(f"EXPLAIN {query}").fetchall())
+
+
+def tables():
+    # Table -> [(column, type)]
+    rows = _cursor().execute("SELECT table_name, column_name, data_type FROM information_schema.columns "
+                             "ORDER BY table_name, ordinal_position").fetchall()
+    schema = {}
+    for table, column, dtype in rows:
+        schema.setdefault(table, []).append((column, dtype))
+    return schema
@@ -0,0 +1,71 @@
+"""Box plot statistics computed on the server in one grouped pass.
+
+px.box sends every row to the browser, which then sorts them to draw the
+quartiles, so a box plot's payload grows with the data. box_summary() computes
+what the browser would, for every group at once: all values are sorted by
+(group, value) once, and each group's quartiles, whiskers and outliers are read
+off its slice of the sorted array by index arithmetic. The box plots are drawn
+from these statistics (charts.summary_box), so only five numbers per box and the
+outliers are sent. Groups are any columns: country, region, year...
+
+Quartiles interpolate at position p * n - 0.5 of the sorted values, as
+plotly.js does; whiskers reach the furthest values within 1.5 IQR of the box,
+and everything beyond them is an outlier.
+"""
+import numpy as np
+import pandas as pd
+
+whisker_iqr = 1.5
+# Outliers kept per group, evenly spaced in rank and always including the extremes, so heavy tails of
+# regional or global data do not bring the raw rows back
+max_outliers = 250
+
+
+def _interpolate(values, starts, counts, p):
+    # p-quantile of every group's sorted slice values[starts:starts + counts]
+    position = np.clip(p * counts - 0.5, 0, counts - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.ceil(position).astype(int)
+    frac = position - lower
+    return (1 - frac) * values[starts + lower] + frac * values[starts + upper]
+
+
+def box_summary(df, value, by):
+    # (summary, outliers): one row per group with Count, Min, Q1, Median, Q3, Max and the whisker ends
+    # LowerFence / UpperFence, and the outlier rows as (by..., value)
+    by = [by] if isinstance(by, str) else list(by)
+    data = df[by + [value]].dropna(subset=[value])
+    if data.empty:
+        return (pd.DataFrame(columns=by + ["Count", "Min", "Q1", "Median", "Q3", "Max", "LowerFence", "UpperFence"]),
+                pd.DataFrame(columns=by + [value]))
+    codes, groups = pd.MultiIndex.from_frame(data[by]).factorize(sort=True)
+    values = data[value].to_numpy(dtype=float)
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=len(groups))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    q1 = _interpolate(values, starts, counts, 0.25)
+    median = _interpolate(values, starts, counts, 0.5)
+    q3 = _interpolate(values, starts, counts, 0.75)
+    iqr = q3 - q1
+    low, high = q1 - whisker_iqr * iqr, q3 + whisker_iqr * iqr
+    inside = (values >= low[codes]) & (values <= high[codes])
+    # Sorted within each group, so the whisker ends are the first / last inside value of the group
+    lower_fence = np.minimum.reduceat(np.where(inside, values, np.inf), starts)
+    upper_fence = np.maximum.reduceat(np.where(inside, values, -np.inf), starts)
+
+    summary = pd.DataFrame(groups.tolist(), columns=by)
+    summary = summary.assign(Count=counts, Min=values[starts], Q1=q1, Median=median, Q3=q3,
+                             Max=values[starts + counts - 1], LowerFence=lower_fence, UpperFence=upper_fence)
+
+    out = np.flatnonzero(~inside)
+    out_codes = codes[out]
+    # Rank of each outlier within its group's outliers, to thin groups with more than max_outliers
+    n_out = np.bincount(out_codes, minlength=len(groups))
+    rank = np.arange(len(out)) - np.repeat(np.concatenate([[0], np.cumsum(n_out)[:-1]]), n_out)
+    # Ranks 0, step, 2 step ... n_out - 1 (rounded up): max_outliers of them, from one extreme to the other
+    step = np.maximum((n_out - 1) / max(max_outliers - 1, 1), 1)[out_codes]
+    keep = (np.floor(rank / step) != np.floor((rank - 1) / step)) | (rank == n_out[out_codes] - 1)
+    outliers = pd.DataFrame(groups[out_codes[keep]].tolist(), columns=by).assign(**{value: values[out[keep]]})
+    return summary, outliers
@@ -0,0 +1,182 @@
+"""Background warm-up of every page's cached datasets.
+
+Home.py starts the warm-up once per server process; each task calls the same
+st.cache_data loaders, with the same arguments, as the page it belongs to, so
+the page finds its data already cached. Once every page is loaded, the loaders
+are run once more to time the warm pages, and that report is kept for every
+later visit of the home page. Run it directly to print the time-to-first-chart
+report without Streamlit:
+
+    python -m utils.warmup --workers 4
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+import streamlit as st
+
+from utils import charts
+from utils.compute import compute_pool
+from utils.counties import county_cube
+from utils.correlation import (correlation_bands, default_block_length, default_lags, default_resamples,
+                               default_workers, information_analyses, information_lags, lag_analyses,
+                               lagged_correlations)
+from utils.data import (canada_geojson, combined_national, combined_vaccinations, data_version,
+                        national_case_columns, national_index_columns, regional_df, us_geojson)
+from utils.dtw import cluster_trajectories, default_band_days, default_clusters
+from utils.forecast import fitted_models
+from utils.granger import default_lag_orders as granger_lag_orders, granger_screen
+from utils.hierarchy import region_rollup
+from utils.indices import baseline_indices
+from utils.joins import joined_table
+from utils.rollups import national_view, vaccination_status_view, vaccination_view
+from utils.rt import rt_panel
+from utils.sql import tables
+
+
+def _page_tasks():
+    # Page -> the loader calls it makes before its first chart can be drawn
+    tasks = {
+        "1_Deaths_and_Cases_Overall": [
+            lambda: combined_national(national_case_columns, labels={'Canada': 'CAN'}),
+            lambda: national_view(national_case_columns, labels={'Canada': 'CAN'}),
+        ],
+        "2_Deaths_and_Cases_Regionwise": [
+            lambda: regional_df('US'),
+            lambda: regional_df('Canada'),
+            us_geojson,
+            canada_geojson,
+            lambda: cluster_trajectories(default_clusters, default_band_days, data_version()),
+            lambda: region_rollup(data_version()),
+        ],
+        "3_OxCGRT_Index_Overall": [
+            lambda: combined_national(national_index_columns),
+            lambda: national_view(national_index_columns),
+            baseline_indices,
+            rt_panel,
+        ],
+        "4_OxCGRT_Index_Specific_Policy": [
+            lambda: combined_national(national_index_columns),
+            lambda: national_view(national_index_columns),
+            rt_panel,
+        ],
+        "5_OxCGRT_Economic_Support_Analysis": [],
+        "6_Vaccinations_Analysis": [
+            combined_vaccinations,
+            vaccination_view,
+            *[lambda c=c, i=i: vaccination_status_view(c, i)
+              for c in charts.COUNTRIES for i in ["GovernmentResponseIndex", "ContainmentHealthIndex"]],
+            joined_table,
+        ],
+        "7_SQL_Query": [
+            tables,
+        ],
+        "8_Granger_Causality_Screen": [
+            lambda: compute_pool().submit(granger_screen, granger_lag_orders).result(),
+        ],
+        "9_Case_Forecasts": [
+            fitted_models,
+        ],
+        "10_Romania_Counties": [
+            lambda: county_cube(data_version()),
+        ],
+    }
+    for method, selected_index in lag_analyses:
+        for rate in ['DailyCaseRate', 'DailyDeathRate']:
+            for country in charts.COUNTRIES:
+                # Page 5 reads its results from the compute pool, so that is what gets warmed
+                tasks["5_OxCGRT_Economic_Support_Analysis"] += [
+                    lambda a=(country, selected_index, rate, default_lags, method):
+                        compute_pool().submit(lagged_correlations, *a).result(),
+                    lambda a=(country, selected_index, rate, default_lags, method, default_resamples,
+                              default_block_length, default_workers):
+                        compute_pool().submit(correlation_bands, *a).result(),
+                ]
+    for selected_index in information_analyses:
+        for rate in ['DailyCaseRate', 'DailyDeathRate']:
+            for country in charts.COUNTRIES:
+                tasks["5_OxCGRT_Economic_Support_Analysis"].append(
+                    lambda a=(country, selected_index, rate, information_lags, "ksg"):
+                        compute_pool().submit(lagged_correlations, *a).result())
+    return tasks
+
+
+class Warmup:
+    def __init__(self, workers=None):
+        self.tasks = _page_tasks()
+        self.total = sum(len(calls) for calls in self.tasks.values())
+        self.completed = 0
+        self.cold = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+        self._pages = [self._pool.submit(self._run_page, page, calls) for page, calls in self.tasks.items()]
+        # Queued after the pages, so it starts once they have all been picked up
+        self._report = self._pool.submit(self._measure_warm)
+
+    def _run_page(self, page, calls):
+        # Loaders of one page run back to back so its cold time is the page's own cost;
+        # the pages themselves run concurrently
+        start = time.perf_counter()
+        for call in calls:
+            try:
+                call()
+            except Exception as e:
+                self.errors[page] = str(e)
+            with self._lock:
+                self.completed += 1
+        self.cold[page] = time.perf_counter() - start
+
+    def fraction(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def done(self):
+        # Every page is loaded and the report is ready
+        return self._report.done()
+
+    def wait(self):
+        self._report.result()
+
+    def report(self):
+        # Cold and warm time-to-first-chart of each page, measured once
+        return self._report.result()
+
+    def _measure_warm(self):
+        # Rerun each page's loaders once they are all cached to get its warm time-to-first-chart
+        wait(self._pages)
+        rows = []
+        for page, calls in self.tasks.items():
+            start = time.perf_counter()
+            for call in calls:
+                try:
+                    call()
+                except Exception:
+                    pass
+            rows.append({"Page": page, "Cold (s)": round(self.cold.get(page, float("nan")), 3),
+                         "Warm (s)": round(time.perf_counter() - start, 3)})
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource
+def start_warmup():
+    # Shared by every session of the server process, so the warm-up only runs once
+    return Warmup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm every page's cached datasets and report load times.")
+    parser.add_argument("--workers", type=int, default=None, help="number of warm-up threads")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    warmup = Warmup(args.workers)
+    warmup.wait()
+    print(f"Warm-up finished in {time.perf_counter() - start:.1f}s")
+    for page, error in warmup.errors.items():
+        print(f"{page}: {error}")
+    print(warmup.report().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()